@@ -0,0 +1,305 @@
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from storage import ConnectionPool, QueryCache
+
+#The tables the reports are computed from, and the tables each one refers to by rowid once it is loaded.
+#A table is reloaded along with any table it refers to, since the rowids it holds may have changed.
+TABLES = {
+    "Class": (),
+    "CCA": (),
+    "Student": ("Class",),
+    "Activity": ("CCA",),
+    "StudentActivity": ("Student", "Activity"),
+}
+
+#Stands in for a NULL year, so students without one are left out of the cohorts
+_NULL = "\x00"
+
+#Every reference is resolved to the rowid of the row it refers to by sqlite, so the joins and group-bys below only ever see integers.
+#A reference that does not resolve loads as rowid 0, which sqlite never hands out on its own.
+_QUERIES = {
+    "Class": '''SELECT "rowid", CAST("id" AS TEXT), COALESCE("name", '')
+                FROM "Class"
+                WHERE "id" IS NOT NULL
+                ORDER BY ABS("id"), "id";''',
+    "CCA": '''SELECT "rowid", CAST("id" AS TEXT), COALESCE("name", '')
+              FROM "CCA"
+              WHERE "id" IS NOT NULL
+              ORDER BY ABS("id"), "id";''',
+    "Student": '''SELECT "Student"."rowid", COALESCE("Class"."rowid", 0),
+                         COALESCE(CAST("Student"."year_enrolled" AS TEXT), char(0)),
+                         COALESCE(CAST("Student"."graduating_year" AS TEXT), char(0)),
+                         CAST("Student"."id" AS TEXT), COALESCE("Student"."name", '')
+                  FROM "Student"
+                  LEFT JOIN "Class"
+                      ON "Class"."id" = "Student"."class_id"
+                  WHERE "Student"."id" IS NOT NULL
+                  ORDER BY ABS("Student"."id"), "Student"."id";''',
+    "Activity": '''SELECT "Activity"."rowid", COALESCE("CCA"."rowid", 0), COALESCE(CAST("Activity"."hours" AS REAL), 0)
+                   FROM "Activity"
+                   LEFT JOIN "CCA"
+                       ON "CCA"."id" = "Activity"."cca_id"
+                   WHERE "Activity"."id" IS NOT NULL;''',
+    "StudentActivity": '''SELECT "Student"."rowid", "Activity"."rowid"
+                          FROM "StudentActivity"
+                          INNER JOIN "Student"
+                              ON "Student"."id" = "StudentActivity"."student_id"
+                          INNER JOIN "Activity"
+                              ON "Activity"."id" = "StudentActivity"."activity_id";''',
+}
+
+#The columns of each query, and the type they are loaded as
+_COLUMNS = {
+    "Class": (("rowid", np.int64), ("id", str), ("name", str)),
+    "CCA": (("rowid", np.int64), ("id", str), ("name", str)),
+    "Student": (("rowid", np.int64), ("class", np.int64), ("year_enrolled", str), ("graduating_year", str), ("id", str), ("name", str)),
+    "Activity": (("rowid", np.int64), ("cca", np.int64), ("hours", np.float64)),
+    "StudentActivity": (("student", np.int64), ("activity", np.int64)),
+}
+
+#The groupings a report can be made by, and the heading of their group column
+GROUPINGS = {
+    "student": "Student",
+    "class": "Class",
+    "cca": "CCA",
+    "year_enrolled": "Year Enrolled",
+    "graduating_year": "Graduating Year",
+}
+
+#The statistics of every group in a report, in the order they are shown
+STATISTICS = ("students", "participations", "hours", "mean", "min", "p25", "median", "p75", "max")
+
+def _positions(rowids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    '''
+    Codes each rowid in values as the position of the loaded row it refers to, so joins and group-bys are plain array indexing.
+
+    Parameter:
+    rowids: np.ndarray -> The rowids of the table being referenced, in the order it was loaded
+    values: np.ndarray -> The rowids to look up
+
+    Return:
+    Returns an integer array the length of values, holding -1 wherever the value is not one of the rowids
+    '''
+    lookup = np.full(max(int(rowids.max(initial=0)), int(values.max(initial=0))) + 1, -1, dtype=np.intp)
+    lookup[rowids] = np.arange(len(rowids))
+    return lookup[values]
+
+def _distribution(codes: np.ndarray, values: np.ndarray, groups: int) -> dict[str, np.ndarray]:
+    '''
+    Computes the size, total, mean, minimum, quartiles and maximum of the values in every group, with one sort for all groups.
+    Quartiles are interpolated linearly, the same way as np.percentile.
+
+    Parameter:
+    codes: np.ndarray -> The group of each value, from 0 to groups - 1
+    values: np.ndarray -> The values to summarise
+    groups: int -> The number of groups
+
+    Return:
+    Returns a dictionary of arrays indexed by group. Empty groups have a size and every statistic of 0.
+    '''
+    counts = np.bincount(codes, minlength=groups)
+    totals = np.bincount(codes, weights=values, minlength=groups)
+    ordered = values[np.lexsort((values, codes))]
+    starts = np.cumsum(counts) - counts
+    present = counts > 0
+
+    stats = {
+        "students": counts,
+        "hours": totals,
+        "mean": np.divide(totals, counts, out=np.zeros(groups), where=present),
+    }
+    for name, quantile in (("min", 0.0), ("p25", 0.25), ("median", 0.5), ("p75", 0.75), ("max", 1.0)):
+        position = quantile * (counts[present] - 1)
+        low = np.floor(position).astype(np.intp)
+        high = np.ceil(position).astype(np.intp)
+        lower = ordered[starts[present] + low]
+        upper = ordered[starts[present] + high]
+        stats[name] = np.zeros(groups)
+        stats[name][present] = lower + (position - low) * (upper - lower)
+    return stats
+
+#===========================================================================================================================================
+
+class HoursAnalytics:
+    """
+    Totals and distributions of activity hours per student, class, CCA and enrolment cohort.
+    Student, StudentActivity and Activity are loaded into columnar NumPy arrays with integer-coded keys, and every report is
+    a handful of vectorized group-bys over them instead of one query per student.
+    A table is only reloaded after a write has touched it, which the engine hears about from the QueryCache, and the join
+    and per-student totals every report starts from are only recomputed after a reload.
+    Attributes:
+    (-) pool: ConnectionPool -> The connection pool used to reach the database.
+    (-) max_age: float -> Seconds after which every table is reloaded anyway, to pick up writes made outside the app.
+    (-) columns: dict -> The loaded columns of each table, as NumPy arrays.
+    (-) dirty: set -> The tables that have been written to since they were loaded.
+    (-) joined: dict -> The coded participations and each student's totals, as NumPy arrays.
+    (-) reports: dict -> The reports computed since the last reload, by grouping.
+    Methods:
+    (+) refresh() -> Reloads the tables that have changed, returning their names.
+
+    (+) report(by) -> Returns the hour statistics of every group of a grouping.
+    """
+
+    def __init__(self, pool: ConnectionPool, cache: Optional[QueryCache] = None, max_age: float = 300.0) -> None:
+        self._pool = pool
+        self._max_age = max_age
+        self._columns = {}
+        self._dirty = set(TABLES)
+        self._loaded = 0.0
+        self._joined = {}
+        self._reports = {}
+        self._lock = threading.Lock()
+        if cache is not None:
+            cache.subscribe(self._invalidate)
+
+    def _invalidate(self, tags: set) -> None:
+        '''
+        A helper function subscribed to the QueryCache, which marks the tables a write touched as needing a reload
+        '''
+        tables = {tag[0] for tag in tags} & TABLES.keys()
+        if tables:
+            with self._lock:
+                self._dirty |= tables
+
+    def _load(self, tables: set) -> None:
+        '''
+        A helper function that reads the given tables into columnar arrays. The tables are read in one transaction, so they
+        are always consistent with each other.
+        '''
+        with self._pool.connection() as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            cur.execute('BEGIN;')
+            try:
+                for table in TABLES:
+                    if table not in tables:
+                        continue
+                    rows = cur.execute(_QUERIES[table]).fetchall()
+                    columns = list(zip(*rows)) if rows else [()] * len(_COLUMNS[table])
+                    self._columns[table] = {
+                        name: np.array(values, dtype=dtype)
+                        for (name, dtype), values in zip(_COLUMNS[table], columns)
+                    }
+            finally:
+                conn.rollback()
+
+    def refresh(self) -> set:
+        '''
+        Reloads every table that has been written to since it was last loaded along with the tables that refer to it,
+        or every table once max_age has passed
+
+        Return:
+        Returns the names of the tables that were reloaded
+        '''
+        with self._lock:
+            if time.monotonic() - self._loaded > self._max_age:
+                self._dirty = set(TABLES)
+            tables = set(self._dirty)
+            if not tables:
+                return tables
+            for table, references in TABLES.items():
+                if tables.intersection(references):
+                    tables.add(table)
+            self._dirty = set()
+            try:
+                self._load(tables)
+            except Exception:
+                self._dirty |= tables
+                raise
+            if tables == TABLES.keys():
+                self._loaded = time.monotonic()
+            self._join()
+            self._reports = {}
+            return tables
+
+    def _join(self) -> None:
+        '''
+        A helper function that joins StudentActivity to Student and Activity on their integer codes, keeping every participation
+        whose student and activity both exist, and totals each student's activities and hours
+        '''
+        students = self._columns["Student"]
+        activities = self._columns["Activity"]
+        participations = self._columns["StudentActivity"]
+        student = _positions(students["rowid"], participations["student"])
+        activity = _positions(activities["rowid"], participations["activity"])
+        joined = (student >= 0) & (activity >= 0)
+        student, activity = student[joined], activity[joined]
+        hours = activities["hours"][activity]
+        count = len(students["rowid"])
+        self._joined = {
+            "student": student,
+            "hours": hours,
+            "cca": _positions(self._columns["CCA"]["rowid"], activities["cca"])[activity],
+            "class": _positions(self._columns["Class"]["rowid"], students["class"]),
+            "totals": np.bincount(student, weights=hours, minlength=count),
+            "activities": np.bincount(student, minlength=count),
+        }
+
+    def _group(self, by: str) -> list[dict]:
+        '''
+        A helper function that computes the report of one grouping from the loaded arrays
+        '''
+        students = self._columns["Student"]
+        joined = self._joined
+
+        if by == "student":
+            classnames = np.append(self._columns["Class"]["name"], "")[joined["class"]]
+            return [
+                {"id": id, "name": name, "class": classname, "activities": number, "hours": total}
+                for id, name, classname, number, total in zip(students["id"].tolist(), students["name"].tolist(), classnames.tolist(),
+                                                               joined["activities"].tolist(), joined["totals"].tolist())
+            ]
+
+        if by == "cca":
+            ccas = self._columns["CCA"]
+            keys, names = ccas["id"], ccas["name"]
+            cca = joined["cca"]
+            member = cca >= 0
+            #every (student, CCA) pair is one member of the CCA, holding the hours of all their activities in it
+            pairs, pair = np.unique(joined["student"][member] * len(keys) + cca[member], return_inverse=True)
+            stats = _distribution(pairs % max(len(keys), 1), np.bincount(pair, weights=joined["hours"][member]), len(keys))
+            stats["participations"] = np.bincount(cca[member], minlength=len(keys))
+        else:
+            if by == "class":
+                classes = self._columns["Class"]
+                keys, names = classes["id"], classes["name"]
+                group = joined["class"]
+            else:
+                keys, group = np.unique(students[by], return_inverse=True)
+                group = np.where(keys[group] == _NULL, -1, group)
+                names = keys
+            #every student of a group counts towards its distribution, including those without any activities
+            grouped = group >= 0
+            stats = _distribution(group[grouped], joined["totals"][grouped], len(keys))
+            stats["participations"] = np.bincount(group[grouped], weights=joined["activities"][grouped], minlength=len(keys)).astype(np.intp)
+
+        return [
+            {"id": key, "name": name, **{statistic: stats[statistic][index].item() for statistic in STATISTICS}}
+            for index, (key, name) in enumerate(zip(keys.tolist(), names.tolist()))
+            if key != _NULL
+        ]
+
+    def report(self, by: str = "class") -> list[dict]:
+        '''
+        Returns the activity hours of every group of a grouping, reloading any table that has changed first
+
+        Parameter:
+        by: str -> One of GROUPINGS. "student" gives each student's number of activities and total hours; the other
+                   groupings give the number of students, participations and hours of each group, along with the mean,
+                   minimum, quartiles and maximum of the hours of the students in it.
+
+        Return:
+        Returns a list with one dictionary per group, in the same order as the groups are listed elsewhere
+        '''
+        if by not in GROUPINGS:
+            raise ValueError(f'Cannot group activity hours by {by!r}.')
+        self.refresh()
+        with self._lock:
+            report = self._reports.get(by)
+            if report is None:
+                report = self._reports[by] = self._group(by)
+            return [dict(row) for row in report]
@@ -0,0 +1,205 @@
+from typing import Any, Callable, NoReturn, Optional
+
+from flask import Blueprint, Response, abort, jsonify, request
+
+from importer import SCHEMAS
+from storage import Collection, Junctiontable
+
+#The most records a single batch request may read or write, which is also the most written in one transaction
+MAX_BATCH = 1000
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+#The outcome of a record in a batch write that failed validation and never reached the database
+INVALID = "invalid"
+
+def _fail(status: int, message: str) -> NoReturn:
+    '''
+    Ends the request with a JSON error instead of the HTML error page
+    '''
+    response = jsonify({"error": message})
+    response.status_code = status
+    abort(response)
+
+def _fields(kind: str) -> list[str]:
+    '''
+    Reads the columns a client asked for from ?fields=a,b, checking them against the kind's columns
+
+    Return:
+    Returns the columns, or ["*"] for every column when no fields were given
+    '''
+    fields = [field.strip(" ") for field in request.args.get("fields", "").split(",") if field.strip(" ")]
+    unknown = [field for field in fields if field not in SCHEMAS[kind].columns]
+    if unknown:
+        _fail(400, f'{kind} has no field {unknown[0]!r}.')
+    return fields or ["*"]
+
+def _batch() -> list:
+    '''
+    Reads the JSON list of items in the body of a batch write
+
+    Return:
+    Returns the items, failing the request if the body is not a list or holds more than MAX_BATCH items
+    '''
+    items = request.get_json(silent=True)
+    if not isinstance(items, list):
+        _fail(400, "Expected a JSON list.")
+    if len(items) > MAX_BATCH:
+        _fail(413, f'A batch holds at most {MAX_BATCH} items.')
+    return items
+
+def _key(value: Any) -> Optional[str]:
+    '''
+    Reads a key sent as a JSON string or number, the way the tables store it, or None if it cannot be a key
+    '''
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        return None
+    return str(value)
+
+def _written(outcomes: list[str], errors: list[dict]) -> Response:
+    '''
+    The response of every batch write, which holds the outcome of each item in the order they were sent and why any invalid item was rejected
+    '''
+    return jsonify({"outcomes": outcomes, "errors": errors})
+
+def create_api(collections: dict[str, Collection | Junctiontable]) -> Blueprint:
+    '''
+    Creates the JSON API over the collections and junction tables. Every batch write is validated the same way as an import
+    and written in one transaction, and every read selects only the fields the client asked for.
+
+    Parameter:
+    collections: dict -> The collection or junction table of every kind in importer.SCHEMAS
+
+    Return:
+    Returns the blueprint, to be registered under a versioned prefix such as /api/v1
+    '''
+    api = Blueprint("api", __name__)
+
+    def resolve(kind: str, junction: Optional[bool] = None) -> Collection | Junctiontable:
+        '''
+        Returns the collection of a kind, failing the request if there is none or it is the wrong sort of table for the endpoint
+        '''
+        collection = collections.get(kind)
+        if collection is None or (junction is not None and isinstance(collection, Junctiontable) != junction):
+            _fail(404, f'There is no {"junction table" if junction else "collection"} {kind!r}.')
+        return collection
+
+    def validate(kind: str, rows: list, references: bool = True) -> tuple[list, list[dict]]:
+        '''
+        Validates rows against the kind's schema, looking up only the keys they refer to
+
+        Parameter:
+        kind: str -> One of importer.SCHEMAS
+        rows: list -> The rows sent by the client
+        references: bool -> Whether the keys the rows refer to must exist
+
+        Return:
+        Returns the record of every row, None for invalid rows, along with the index and reason of every invalid row
+        '''
+        schema = SCHEMAS[kind]
+        keys = schema.referenced(rows)
+        if references:
+            #every referenced table is the table of the kind with the same name
+            keys = {table: set(resolve(table.lower(), False).find_many(referenced, ["id"])) for table, referenced in keys.items()}
+        records, errors = [], []
+        for index, row in enumerate(rows):
+            record, reason = schema.validate(row, keys)
+            records.append(record)
+            if record is None:
+                errors.append({"index": index, "error": reason})
+        return records, errors
+
+    def apply(write: Callable[[list, int], list[str]], items: list) -> list[str]:
+        '''
+        Writes every valid item in one transaction and returns the outcome of every item, in order
+
+        Parameter:
+        write: Callable -> The bulk method of the collection, such as insert_many
+        items: list -> The arguments of the bulk method, with None in place of every invalid item
+        '''
+        valid = [item for item in items if item is not None]
+        applied = iter(write(valid, max(len(valid), 1)))
+        return [next(applied) if item is not None else INVALID for item in items]
+
+    @api.route('/<kind>', methods=['GET'])
+    def find_many(kind):
+        if isinstance(collections.get(kind), Junctiontable):
+            #?student_id=1&activity_id=2&student_id=3&activity_id=4 asks whether each pair exists
+            left, right = SCHEMAS[kind].columns
+            pairs = list(zip(request.args.getlist(left), request.args.getlist(right)))
+            if len(pairs) > MAX_BATCH:
+                _fail(413, f'A batch holds at most {MAX_BATCH} items.')
+            found = collections[kind].find_many({left: l, right: r} for l, r in pairs)
+            return jsonify({"records": [{left: l, right: r} for l, r in pairs if (l, r) in found],
+                            "missing": [{left: l, right: r} for l, r in pairs if (l, r) not in found]})
+
+        collection = resolve(kind, False)
+        fields = _fields(kind)
+        ids = request.args.getlist("id")
+        if ids:
+            if len(ids) > MAX_BATCH:
+                _fail(413, f'A batch holds at most {MAX_BATCH} items.')
+            found = collection.find_many(ids, fields)
+            return jsonify({"records": found, "missing": [id for id in dict.fromkeys(ids) if id not in found]})
+
+        limit = min(max(request.args.get("limit", PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        return jsonify(collection.findpage(fields, request.args.get("after"), request.args.get("before"), limit))
+
+    @api.route('/<kind>/<key>', methods=['GET'])
+    def find(kind, key):
+        collection = resolve(kind, False)
+        record = collection.find(key, _fields(kind))
+        if record is None:
+            _fail(404, f'{kind} {key!r} not found.')
+        return jsonify({"record": record})
+
+    @api.route('/<kind>/<key>/detail', methods=['GET'])
+    def detail(kind, key):
+        collection = resolve(kind, False)
+        if not hasattr(collection, "viewdetail"):
+            _fail(404, f'{kind} has no detail.')
+        detail = collection.viewdetail(key)
+        if detail is None:
+            _fail(404, f'{kind} {key!r} not found.')
+        return jsonify(detail)
+
+    @api.route('/<kind>', methods=['POST'])
+    def insert_many(kind):
+        #[{...}, ...] inserts each record
+        collection = resolve(kind)
+        records, errors = validate(kind, _batch())
+        return _written(apply(collection.insert_many, records), errors)
+
+    @api.route('/<kind>', methods=['PUT'])
+    def update_many(kind):
+        collection = resolve(kind)
+        items = [item if isinstance(item, dict) else {} for item in _batch()]
+        if isinstance(collection, Junctiontable):
+            #[{"old": {...}, "new": {...}}, ...] moves each pair to a new one. The old pair only has to exist in the junction table.
+            olds, olderrors = validate(kind, [item.get("old") for item in items], references = False)
+            news, errors = validate(kind, [item.get("new") for item in items])
+            changes = [(old, new) if old is not None and new is not None else None for old, new in zip(olds, news)]
+            errors = olderrors + [error for error in errors if olds[error["index"]] is not None]
+        else:
+            #[{"key": ..., "record": {...}}, ...] replaces the record with each key
+            keys = [_key(item.get("key")) for item in items]
+            news, errors = validate(kind, [item.get("record") for item in items])
+            changes = [(key, new) if key is not None and new is not None else None for key, new in zip(keys, news)]
+            errors += [{"index": index, "error": '"key" is required'} for index, key in enumerate(keys) if key is None and news[index] is not None]
+        errors.sort(key = lambda error: error["index"])
+        return _written(apply(collection.update_many, changes), errors)
+
+    @api.route('/<kind>', methods=['DELETE'])
+    def delete_many(kind):
+        collection = resolve(kind)
+        items = _batch()
+        if isinstance(collection, Junctiontable):
+            #[{...}, ...] deletes each pair, which may refer to rows that no longer exist
+            records, errors = validate(kind, items, references = False)
+        else:
+            #["1", "2", ...] deletes the record with each key
+            records = [_key(item) for item in items]
+            errors = [{"index": index, "error": "key is not a string"} for index, key in enumerate(records) if key is None]
+        return _written(apply(collection.delete_many, records), errors)
+
+    return api
@@ -0,0 +1,54 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+#Runs in a fresh interpreter, so every run pays for the imports and the connections the way a newly forked worker does
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app(sys.argv[1])
+created = time.perf_counter()
+response = app.test_client().get("/healthz")
+served = time.perf_counter()
+assert response.status_code == 200, response.get_data(as_text = True)
+print(json.dumps({"import": imported - start, "create_app": created - imported, "first_request": served - created, "total": served - start}))
+'''
+
+def run(dbname: str, runs: int, parallel: int = 1) -> dict[str, list[float]]:
+    '''
+    Starts the app in new interpreters the given number of times and times each stage of getting to the first response
+
+    Parameter:
+    dbname: str -> The database the app is started on
+    runs: int -> The number of times the app is started
+    parallel: int -> The number of interpreters started together, the way a server forks its workers
+
+    Return:
+    Returns the seconds each start took for every stage: importing main, create_app, the first request, and all of them
+    '''
+    timings = {}
+    for _ in range(runs):
+        probes = [subprocess.Popen([sys.executable, "-c", PROBE, os.path.abspath(dbname)], cwd = os.path.dirname(os.path.abspath(__file__)),
+                                   stdout = subprocess.PIPE, text = True) for _ in range(parallel)]
+        for probe in probes:
+            output, _ = probe.communicate()
+            if probe.returncode != 0:
+                raise RuntimeError(f'The app failed to start on {dbname}.')
+            for stage, seconds in json.loads(output.splitlines()[-1]).items():
+                timings.setdefault(stage, []).append(seconds)
+    return timings
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Time importing main, building the app and serving its first request, each in a new interpreter.")
+    parser.add_argument("--db", default = "MyWebApp.db")
+    parser.add_argument("--runs", type = int, default = 20)
+    parser.add_argument("--parallel", type = int, default = 1, help = "the number of interpreters started together in each run")
+    args = parser.parse_args()
+
+    for stage, seconds in run(args.db, max(args.runs, 1), max(args.parallel, 1)).items():
+        print(f'{stage:>14}: median {statistics.median(seconds) * 1000:7.1f} ms, min {min(seconds) * 1000:7.1f} ms')
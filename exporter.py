@@ -0,0 +1,182 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from typing import Iterator, Optional
+
+from migrations import migrate
+from storage import ConnectionPool
+
+class Export:
+    """
+    One table or join that can be exported, and the query that reads it.
+    Attributes:
+    (-) columns: tuple -> The columns of every exported row, in order.
+    (-) query: str -> The SELECT that reads every row, in the order they are exported.
+    Methods:
+    (+) rows(pool, batchsize) -> Yields the rows in batches straight off a cursor.
+    """
+
+    def __init__(self, columns: tuple, query: str) -> None:
+        self.columns = columns
+        self.query = query
+
+    def rows(self, pool: ConnectionPool, batchsize: int = 5000, query: Optional[str] = None) -> Iterator[list[tuple]]:
+        '''
+        Streams the rows of the export from a single read transaction, so every batch comes from the same snapshot of the
+        database however long the export takes, and only one batch is ever held in memory
+
+        Parameter:
+        pool: ConnectionPool -> The pool of the database to export from
+        batchsize: int -> The number of rows fetched from sqlite at a time
+        query: str -> Reads the rows through another query over self.query instead, with one column per row
+
+        Return:
+        Yields lists of at most batchsize rows, each row a tuple in the order of self.columns
+        '''
+        with pool.connection(pin=False) as conn:
+            cur = conn.cursor()
+            cur.row_factory = None
+            began = not conn.in_transaction
+            if began:
+                cur.execute('BEGIN;')
+            try:
+                cur.execute(query or self.query)
+                while True:
+                    rows = cur.fetchmany(batchsize)
+                    if not rows:
+                        break
+                    yield rows
+            finally:
+                cur.close()
+                if began:
+                    conn.rollback()
+
+def _table(tblname: str, columns: tuple) -> Export:
+    '''
+    Exports every row of a table in the order sqlite stores them, which needs no sort however large the table is
+    '''
+    return Export(columns, f'''SELECT {", ".join(f'"{column}"' for column in columns)} FROM "{tblname}";''')
+
+#Every table and join view that can be exported. The views have the columns of StudentCollection.viewall, viewcca and
+#viewactivity, with the student's id added to every row of the last two so one export covers every student.
+EXPORTS = {
+    "student": _table("Student", ("id", "name", "student_age", "year_enrolled", "graduating_year", "class_id")),
+    "class": _table("Class", ("id", "name", "level")),
+    "subject": _table("Subject", ("id", "name", "level")),
+    "cca": _table("CCA", ("id", "name", "type")),
+    "activity": _table("Activity", ("id", "name", "start_date", "end_date", "description", "category", "role", "award", "hours", "cca_id")),
+    "studentcca": _table("StudentCCA", ("student_id", "cca_id")),
+    "studentactivity": _table("StudentActivity", ("student_id", "activity_id")),
+    "studentsubject": _table("StudentSubject", ("student_id", "subject_id")),
+    "viewall": Export(("student_id", "student_name", "student_age", "student_year_enrolled", "student_graduating_year", "class_id", "class_name"),
+                      '''SELECT "Student"."id", "Student"."name", "Student"."student_age", "Student"."year_enrolled",
+                                "Student"."graduating_year", "Class"."id", "Class"."name"
+                         FROM "Student"
+                         INNER JOIN "Class"
+                                ON "Class"."id" = "Student"."class_id"
+                         ORDER BY ABS("Student"."id"), "Student"."id";'''),
+    #the joins over the junction tables are left in the order sqlite walks them, since sorting a million rows would need them all at once
+    "viewcca": Export(("student_id", "CCA_id", "CCA_name"),
+                      '''SELECT "StudentCCA"."student_id", "CCA"."id", "CCA"."name"
+                         FROM "StudentCCA"
+                         INNER JOIN "Student"
+                                ON "StudentCCA"."student_id" = "Student"."id"
+                         INNER JOIN "CCA"
+                                ON "StudentCCA"."cca_id" = "CCA"."id";'''),
+    "viewactivity": Export(("student_id", "activity_id", "activity_name", "start_date", "end_date", "hours"),
+                           '''SELECT "StudentActivity"."student_id", "Activity"."id", "Activity"."name", "Activity"."start_date",
+                                     "Activity"."end_date", "Activity"."hours"
+                              FROM "StudentActivity"
+                              INNER JOIN "Student"
+                                     ON "StudentActivity"."student_id" = "Student"."id"
+                              INNER JOIN "Activity"
+                                     ON "StudentActivity"."activity_id" = "Activity"."id";'''),
+}
+
+#===========================================================================================================================================
+
+def _csv(export: Export, pool: ConnectionPool, batchsize: int) -> Iterator[str]:
+    '''
+    Encodes the export as CSV with a header, one batch of rows at a time
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(export.columns)
+    for rows in export.rows(pool, batchsize):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _jsonl(export: Export, pool: ConnectionPool, batchsize: int) -> Iterator[str]:
+    '''
+    Encodes the export as one JSON object per row. Sqlite builds the objects itself, which is several times faster than
+    turning every row into a dictionary and encoding it here.
+    '''
+    #the columns of the export are renamed column1, column2, ... so every export can be wrapped the same way
+    values = ", ".join(f'"column{index}"' for index in range(1, len(export.columns) + 1))
+    fields = ", ".join(f"'{column}', \"column{index}\"" for index, column in enumerate(export.columns, start = 1))
+    query = f'''WITH "rows"({values}) AS ({export.query.rstrip(" ;")})
+                SELECT json_object({fields}) FROM "rows";'''
+    for rows in export.rows(pool, batchsize, query):
+        yield "\n".join([row for (row,) in rows]) + "\n"
+
+def _columnar(export: Export, pool: ConnectionPool, batchsize: int) -> Iterator[str]:
+    '''
+    Encodes the export as one JSON object per batch holding a list of values per column, the way columnar formats such
+    as Parquet lay out their row groups, so a reader can load each column straight into an array
+    '''
+    for rows in export.rows(pool, batchsize):
+        yield json.dumps({"rows": len(rows), "columns": dict(zip(export.columns, map(list, zip(*rows))))}) + "\n"
+
+#Every format an export can be written in, with its encoder, mimetype and file extension
+FORMATS = {
+    "csv": (_csv, "text/csv", "csv"),
+    "jsonl": (_jsonl, "application/x-ndjson", "jsonl"),
+    "columnar": (_columnar, "application/x-ndjson", "columns.jsonl"),
+}
+
+def export(name: str, pool: ConnectionPool, format: str = "csv", batchsize: int = 5000) -> Iterator[str]:
+    '''
+    Streams a table or join view in the given format, in memory that stays bounded by batchsize however many rows there are
+
+    Parameter:
+    name: str -> One of EXPORTS
+    pool: ConnectionPool -> The pool of the database to export from
+    format: str -> One of FORMATS
+    batchsize: int -> The number of rows read and encoded together
+
+    Return:
+    Returns an iterator of text chunks which, joined together, are the whole export
+    '''
+    if name not in EXPORTS:
+        raise ValueError(f'Cannot export {name!r}, expected one of {", ".join(EXPORTS)}.')
+    if format not in FORMATS:
+        raise ValueError(f'Cannot export as {format!r}, expected one of {", ".join(FORMATS)}.')
+    return FORMATS[format][0](EXPORTS[name], pool, batchsize)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Export a table or join view as CSV, JSON Lines or columnar JSON Lines.")
+    parser.add_argument("name", choices = EXPORTS)
+    parser.add_argument("--db", default = "MyWebApp.db")
+    parser.add_argument("--format", choices = FORMATS, default = "csv")
+    parser.add_argument("--output", "-o", help = "the file to write to, instead of standard output")
+    parser.add_argument("--batchsize", type = int, default = 5000)
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db)
+    migrate(pool)
+    start = time.perf_counter()
+    try:
+        with (open(args.output, "w", newline = "", encoding = "utf-8") if args.output else
+              open(sys.stdout.fileno(), "w", newline = "", encoding = "utf-8", closefd = False)) as file:
+            for chunk in export(args.name, pool, args.format, max(args.batchsize, 1)):
+                file.write(chunk)
+    finally:
+        pool.close()
+    if args.output:
+        print(f'Exported {args.name} to {args.output} in {time.perf_counter() - start:.2f} s.')
@@ -0,0 +1,401 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from migrations import migrate
+from storage import (DUPLICATE, FAILED, INSERTED, ActivityCollection, CCACollection, ClassCollection, ConnectionPool,
+                     StudentActivity, StudentCCA, StudentCollection, StudentSubject, SubjectCollection)
+
+class Schema:
+    """
+    How the rows of one kind of record are checked before they are imported.
+    Attributes:
+    (-) collection: type -> The collection or junction table the records are written through.
+    (-) columns: tuple -> The columns of a record, in the order the collection stores them.
+    (-) required: tuple -> The columns that must have a value.
+    (-) types: dict -> The columns that hold something other than text, and the function that parses them.
+    (-) references: dict -> The columns that must hold the key of a row in another table, and that table.
+    Methods:
+    (+) validate(row, keys) -> Returns the record a row describes, or why it cannot be imported.
+
+    (+) referenced(rows) -> Returns the keys that some rows refer to in other tables.
+    """
+
+    def __init__(self, collection: type, columns: tuple, required: tuple, types: dict = {}, references: dict = {}) -> None:
+        self.collection = collection
+        self.columns = columns
+        self.required = required
+        self.types = types
+        self.references = references
+
+    def validate(self, row: dict, keys: dict[str, set]) -> tuple[Optional[dict], Optional[str]]:
+        '''
+        Checks a row against the schema and turns it into a record laid out the way its collection expects
+
+        Parameter:
+        row: dict -> The row as read from the file, with a value for every column it has
+        keys: dict[str, set] -> The keys of every table the schema references
+
+        Return:
+        Returns (record, None) if the row is valid, otherwise (None, the reason it was rejected)
+        '''
+        if not isinstance(row, dict):
+            return None, "row is not an object"
+        unknown = row.keys() - set(self.columns)
+        if unknown:
+            return None, f'unknown columns: {", ".join(sorted(map(str, unknown)))}'
+
+        record = {}
+        for column in self.columns:
+            value = row.get(column)
+            if isinstance(value, str):
+                value = value.strip(" ")
+            if value is None or value == "":
+                if column in self.required:
+                    return None, f'"{column}" is required'
+                record[column] = None
+                continue
+            try:
+                record[column] = self.types.get(column, str)(value)
+            except (TypeError, ValueError) as error:
+                return None, f'"{column}" is invalid: {error}'
+
+        for column, table in self.references.items():
+            if record[column] is not None and record[column] not in keys[table]:
+                return None, f'"{column}" {record[column]} is not in {table}'
+        return record, None
+
+    def referenced(self, rows: Iterable) -> dict[str, set]:
+        '''
+        Collects the keys that rows refer to in other tables, parsed the same way as self.validate parses them, so only those
+        keys have to be looked up before a handful of rows is validated
+
+        Parameter:
+        rows: Iterable -> The rows as read, which may be malformed
+
+        Return:
+        Returns the keys referenced in every table the schema references
+        '''
+        keys = {table: set() for table in self.references.values()}
+        for row in rows:
+            if not isinstance(row, dict):
+                continue
+            for column, table in self.references.items():
+                value = row.get(column)
+                if isinstance(value, str):
+                    value = value.strip(" ")
+                if value is None or value == "":
+                    continue
+                try:
+                    keys[table].add(self.types.get(column, str)(value))
+                except (TypeError, ValueError):
+                    continue
+        return keys
+
+def _integer(value) -> int:
+    '''
+    Parses a whole number, which JSON may hold as a number and CSV as text
+    '''
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f'{value!r} is not a whole number')
+    return int(value)
+
+def _hours(value) -> int:
+    '''
+    Parses a number of hours, which cannot be negative
+    '''
+    hours = _integer(value)
+    if hours < 0:
+        raise ValueError(f'{hours} is negative')
+    return hours
+
+def _date(value) -> str:
+    '''
+    Checks that a date is a real date written as YYYYMMDD, the way the activity forms take it
+    '''
+    value = str(value)
+    if len(value) != 8 or not value.isdigit():
+        raise ValueError(f'{value!r} is not YYYYMMDD')
+    datetime.datetime.strptime(value, "%Y%m%d")
+    return value
+
+def _key(value) -> str:
+    '''
+    Turns a key into text, the way the tables store it, so 12 in JSON and "12" in CSV are the same key
+    '''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (dict, list, bool)):
+        raise ValueError(f'{value!r} is not a key')
+    return str(value)
+
+#Every kind of record that can be imported
+SCHEMAS = {
+    "student": Schema(StudentCollection, ("id", "name", "student_age", "year_enrolled", "graduating_year", "class_id"), ("id",),
+                      {"id": _key, "student_age": _integer, "year_enrolled": _integer, "graduating_year": _integer, "class_id": _key},
+                      {"class_id": "Class"}),
+    "class": Schema(ClassCollection, ("id", "name", "level"), ("id",), {"id": _key}),
+    "subject": Schema(SubjectCollection, ("id", "name", "level"), ("id",), {"id": _key}),
+    "cca": Schema(CCACollection, ("id", "name", "type"), ("id",), {"id": _key}),
+    "activity": Schema(ActivityCollection, ("id", "name", "start_date", "end_date", "description", "category", "role", "award", "hours", "cca_id"),
+                       ("id",), {"id": _key, "start_date": _date, "end_date": _date, "hours": _hours, "cca_id": _key},
+                       {"cca_id": "CCA"}),
+    "studentcca": Schema(StudentCCA, ("student_id", "cca_id"), ("student_id", "cca_id"),
+                         {"student_id": _key, "cca_id": _key}, {"student_id": "Student", "cca_id": "CCA"}),
+    "studentactivity": Schema(StudentActivity, ("student_id", "activity_id"), ("student_id", "activity_id"),
+                              {"student_id": _key, "activity_id": _key}, {"student_id": "Student", "activity_id": "Activity"}),
+    "studentsubject": Schema(StudentSubject, ("student_id", "subject_id"), ("student_id", "subject_id"),
+                             {"student_id": _key, "subject_id": _key}, {"student_id": "Student", "subject_id": "Subject"}),
+}
+
+#===========================================================================================================================================
+
+#The keys of every referenced table, loaded once by each validating process
+_KEYS = {}
+
+def _load_keys(dbname: str, tables: list[str]) -> dict[str, set]:
+    '''
+    Reads the keys of the given tables, through a read-only connection so validation can never write to the database
+    '''
+    conn = sqlite3.connect(f'file:{dbname}?mode=ro', uri=True)
+    try:
+        return {table: {key for (key,) in conn.execute(f'SELECT "id" FROM "{table}" WHERE "id" IS NOT NULL;')} for table in tables}
+    finally:
+        conn.close()
+
+def _start_worker(dbname: str, tables: list[str]) -> None:
+    '''
+    Runs once in every validating process, before it validates any rows
+    '''
+    _KEYS.update(_load_keys(dbname, tables))
+
+def _validate(kind: str, chunk: list[tuple[int, object]]) -> tuple[list[tuple[int, dict]], list[tuple[int, object, str]]]:
+    '''
+    Parses and validates one chunk of rows. Lines of JSON arrive as text, so they are parsed here, in parallel, too.
+
+    Return:
+    Returns the (line, record) of every valid row and the (line, row, reason) of every rejected row
+    '''
+    schema = SCHEMAS[kind]
+    valid, rejected = [], []
+    for line, row in chunk:
+        if isinstance(row, str):
+            try:
+                row = json.loads(row)
+            except ValueError as error:
+                rejected.append((line, row, f'invalid JSON: {error}'))
+                continue
+        record, reason = schema.validate(row, _KEYS)
+        if record is None:
+            rejected.append((line, row, reason))
+        else:
+            valid.append((line, record))
+    return valid, rejected
+
+def read_rows(path: str, format: str, skip: int = 0) -> Iterator[tuple[int, object]]:
+    '''
+    Streams the rows of a CSV file with a header, or of a JSON Lines file, without reading the whole file into memory
+
+    Parameter:
+    path: str -> The file to read
+    format: str -> "csv" or "jsonl"
+    skip: int -> The number of rows to skip, when resuming an import
+
+    Return:
+    Yields (line, row) for every row, where row is a dictionary for CSV and the unparsed line for JSON Lines
+    '''
+    with open(path, newline = "", encoding = "utf-8-sig") as file:
+        if format == "csv":
+            #short rows are padded with None, and extra cells are collected under a column that no schema has
+            reader = csv.DictReader(file, restkey = "(extra cells)")
+            for index, row in enumerate(reader):
+                if index >= skip:
+                    yield reader.line_num, row
+        else:
+            index = 0
+            for line, text in enumerate(file, start = 1):
+                if text.strip():
+                    if index >= skip:
+                        yield line, text
+                    index += 1
+
+def _chunks(rows: Iterator, size: int) -> Iterator[list]:
+    '''
+    Splits the rows into lists of at most size rows, reading only one list at a time
+    '''
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _validated(kind: str, rows: Iterator, dbname: str, workers: int, chunksize: int) -> Iterator[tuple[int, list, list]]:
+    '''
+    A helper function that validates chunks of rows in a pool of processes, keeping only a few chunks in flight so the file
+    is still streamed, and yields the results in the order the chunks were read
+
+    Return:
+    Yields (rows, valid, rejected) for every chunk, where rows is the number of rows the chunk held
+    '''
+    tables = sorted(set(SCHEMAS[kind].references.values()))
+    if workers <= 1:
+        _start_worker(dbname, tables)
+        for chunk in _chunks(rows, chunksize):
+            yield (len(chunk), *_validate(kind, chunk))
+        return
+
+    with ProcessPoolExecutor(workers, initializer = _start_worker, initargs = (dbname, tables)) as executor:
+        pending = deque()
+        for chunk in _chunks(rows, chunksize):
+            pending.append((len(chunk), executor.submit(_validate, kind, chunk)))
+            if len(pending) > workers * 2:
+                size, future = pending.popleft()
+                yield (size, *future.result())
+        while pending:
+            size, future = pending.popleft()
+            yield (size, *future.result())
+
+#===========================================================================================================================================
+
+class Checkpoint:
+    """
+    Records how far an import has got, so an interrupted import resumes after the last chunk that was committed.
+    Attributes:
+    (-) path: str -> The file the checkpoint is kept in.
+    (-) state: dict -> The source file, the kind of record and the number of rows read, inserted and rejected so far.
+    Methods:
+    (+) load(source, kind) -> Returns the saved progress of an import of the same file, or a fresh one.
+
+    (+) save() -> Writes the progress to disk, atomically.
+
+    (+) clear() -> Removes the checkpoint once the import is complete.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.state = {}
+
+    def load(self, source: str, kind: str) -> dict:
+        '''
+        Returns the saved progress of an import of the same file of the same kind, or fresh progress if there is none
+        '''
+        fresh = {"source": os.path.abspath(source), "size": os.path.getsize(source), "kind": kind, "rows": 0, "inserted": 0, "rejected": 0}
+        try:
+            with open(self.path, encoding = "utf-8") as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            state = None
+        #a checkpoint of another file, or of the same file since it was changed, cannot be resumed from
+        if state is None or any(state.get(name) != fresh[name] for name in ("source", "size", "kind")):
+            state = fresh
+        self.state = state
+        return state
+
+    def save(self) -> None:
+        '''
+        Writes the progress to a temporary file and moves it over the checkpoint, so a crash never leaves half a checkpoint behind
+        '''
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding = "utf-8") as file:
+            json.dump(self.state, file)
+        os.replace(temporary, self.path)
+
+    def clear(self) -> None:
+        '''
+        Removes the checkpoint, if there is one
+        '''
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def import_file(kind: str, path: str, pool: ConnectionPool, dbname: str, format: Optional[str] = None, workers: int = 1,
+                chunksize: int = 5000, checkpoint: Optional[str] = None, rejects: Optional[str] = None, restart: bool = False) -> dict:
+    '''
+    Imports every row of a file, resuming from its checkpoint if an earlier import of the same file was interrupted.
+    Rows are validated in parallel and written one chunk per transaction through the kind's collection.
+    Every rejected row is written to the rejects file along with its line and the reason it was rejected.
+
+    Parameter:
+    kind: str -> One of SCHEMAS
+    path: str -> The CSV or JSON Lines file to import
+    pool: ConnectionPool -> The pool of the database to import into
+    dbname: str -> The database file, which the validating processes read the referenced keys from
+    format: str -> "csv" or "jsonl". Defaults to the file's extension.
+    workers: int -> The number of validating processes, or 1 to validate in this process
+    chunksize: int -> The number of rows validated and written together
+    checkpoint: str -> The checkpoint file. Defaults to the file's path followed by ".checkpoint".
+    rejects: str -> The rejects report. Defaults to the file's path followed by ".rejects.csv".
+    restart: bool -> Ignores any checkpoint and imports the file from the start
+
+    Return:
+    Returns the number of rows read, inserted and rejected, over every run of the import, and the seconds this run took
+    '''
+    if kind not in SCHEMAS:
+        raise ValueError(f'Cannot import {kind!r}, expected one of {", ".join(SCHEMAS)}.')
+    if format is None:
+        format = "csv" if path.lower().endswith(".csv") else "jsonl"
+    schema = SCHEMAS[kind]
+    collection = schema.collection(pool)
+    checkpoint = Checkpoint(checkpoint or path + ".checkpoint")
+    if restart:
+        checkpoint.clear()
+    state = checkpoint.load(path, kind)
+    rejects = rejects or path + ".rejects.csv"
+
+    start = time.perf_counter()
+    resumed = state["rows"] > 0
+    with open(rejects, "a" if resumed else "w", newline = "", encoding = "utf-8") as report:
+        writer = csv.writer(report)
+        if not resumed:
+            writer.writerow(["line", "reason", "row"])
+
+        for size, valid, rejected in _validated(kind, read_rows(path, format, state["rows"]), dbname, workers, chunksize):
+            outcomes = collection.insert_many([record for _, record in valid], chunksize = len(valid) or 1)
+            for (line, record), outcome in zip(valid, outcomes):
+                if outcome == DUPLICATE:
+                    rejected.append((line, record, "already exists"))
+                elif outcome == FAILED:
+                    rejected.append((line, record, "rejected by the database"))
+            for line, row, reason in sorted(rejected, key = lambda rejection: rejection[0]):
+                writer.writerow([line, reason, row if isinstance(row, str) else json.dumps(row)])
+            report.flush()
+
+            state["rows"] += size
+            state["inserted"] += outcomes.count(INSERTED)
+            state["rejected"] += len(rejected)
+            checkpoint.save()
+
+    checkpoint.clear()
+    return {**state, "rejects": rejects, "seconds": time.perf_counter() - start}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Import records from a CSV or JSON Lines file.")
+    parser.add_argument("kind", choices = SCHEMAS)
+    parser.add_argument("file")
+    parser.add_argument("--db", default = "MyWebApp.db")
+    parser.add_argument("--format", choices = ("csv", "jsonl"))
+    parser.add_argument("--workers", type = int, default = os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type = int, default = 5000)
+    parser.add_argument("--checkpoint")
+    parser.add_argument("--rejects")
+    parser.add_argument("--restart", action = "store_true", help = "ignore the checkpoint and import from the first row")
+    args = parser.parse_args()
+
+    pool = ConnectionPool(args.db)
+    migrate(pool)
+    try:
+        result = import_file(args.kind, args.file, pool, args.db, args.format, args.workers, max(args.chunksize, 1),
+                             args.checkpoint, args.rejects, args.restart)
+    finally:
+        pool.close()
+    print(f'{result["rows"]} rows read, {result["inserted"]} inserted, {result["rejected"]} rejected '
+          f'in {result["seconds"]:.2f} s. Rejected rows are in {result["rejects"]}.')
+    sys.exit(1 if result["rejected"] else 0)
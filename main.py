@@ -1,30 +1,261 @@
-from flask import Flask, render_template, request
-from storage import StudentCollection, SubjectCollection, CCACollection, ClassCollection, ActivityCollection, StudentActivity, StudentCCA, StudentSubject
+import atexit
+import functools
+import sqlite3
+import uuid
+from typing import Optional
 
-studentCollection = StudentCollection()
-subjectCollection = SubjectCollection()
-ccaCollection = CCACollection()
-classCollection = ClassCollection()
-activityCollection = ActivityCollection()
-studentActivityCollection = StudentActivity()
-studentCCACollection = StudentCCA()
-studentSubjectCollection = StudentSubject()
+from flask import Blueprint, Flask, Response, abort, current_app, jsonify, make_response, render_template, request, stream_template
+from markupsafe import Markup, escape
+from werkzeug.local import LocalProxy
+from analytics import GROUPINGS, HoursAnalytics
+from api import create_api
+from exporter import EXPORTS, FORMATS, export
+from metrics import Metrics, instrument
+from migrations import SCHEMA_VERSION, bootstrap, schema_version
+from storage import HIGHLIGHT, ConnectionPool, NameIndex, QueryCache, SearchIndex, StudentCollection, TableVersions, SubjectCollection, CCACollection, ClassCollection, ActivityCollection, StudentActivity, StudentCCA, StudentSubject
 
-app = Flask(__name__)
+views = Blueprint("views", __name__)
 
-@app.route('/')
+def _resource(name: str) -> LocalProxy:
+    '''
+    Stands in for one of the objects create_app builds, resolving to the one of the app handling the current request
+    '''
+    return LocalProxy(lambda: current_app.extensions["mywebapp"][name])
+
+pool = _resource("pool")
+cache = _resource("cache")
+pageCache = _resource("pageCache")
+studentCollection = _resource("studentCollection")
+subjectCollection = _resource("subjectCollection")
+ccaCollection = _resource("ccaCollection")
+classCollection = _resource("classCollection")
+activityCollection = _resource("activityCollection")
+studentActivityCollection = _resource("studentActivityCollection")
+studentCCACollection = _resource("studentCCACollection")
+studentSubjectCollection = _resource("studentSubjectCollection")
+analytics = _resource("analytics")
+searchIndex = _resource("searchIndex")
+tableVersions = _resource("tableVersions")
+metrics = _resource("metrics")
+nameIndexes = _resource("nameIndexes")
+
+def create_app(dbname: str = "MyWebApp.db", request_timeout: Optional[float] = 30.0, startup: Optional[str] = None) -> Flask:
+    '''
+    Builds the app and everything it holds open on the database, so each server process can build its own after it starts
+    instead of sharing connections inherited from the process that imported this module
+
+    Parameter:
+    dbname: str -> The path of the database
+    request_timeout: float -> The seconds a request's queries may run for before they are interrupted, or None for no limit
+    startup: str -> Identifies this release of the app in the validators of pages. Processes serving the same release must be
+                    given the same one, or a page validated by one would never match in another. Defaults to a new one.
+
+    Return:
+    Returns the app
+    '''
+    pool = ConnectionPool(dbname)
+    atexit.register(pool.close)
+    cache = QueryCache()
+    #Rendered pages, evicted by the same writes that evict the rows they were rendered from, in at most 64 MB of HTML
+    pageCache = QueryCache(maxsize = 512, maxbytes = 64 * 1024 * 1024, sizeof = lambda page: len(page[0]))
+    cache.subscribe(pageCache.invalidate)
+
+    resources = {
+        "pool": pool,
+        "cache": cache,
+        "pageCache": pageCache,
+        "studentCollection": StudentCollection(pool, cache),
+        "subjectCollection": SubjectCollection(pool, cache),
+        "ccaCollection": CCACollection(pool, cache),
+        "classCollection": ClassCollection(pool, cache),
+        "activityCollection": ActivityCollection(pool, cache),
+        "studentActivityCollection": StudentActivity(pool, cache),
+        "studentCCACollection": StudentCCA(pool, cache),
+        "studentSubjectCollection": StudentSubject(pool, cache),
+    }
+    #nothing touches the database until the first request, which brings the schema up to date if it is behind
+    migrated = bootstrap(pool)
+    tableVersions = TableVersions(pool)
+    atexit.register(tableVersions.close)
+    tableVersions.subscribe(cache.invalidate_tables)
+    tableVersions.subscribe(pageCache.invalidate_tables)
+    metrics = Metrics()
+    queries = metrics.histogram("mywebapp_query_duration_seconds", "Time taken by the queries of each collection method.",
+                                ("collection", "method"))
+    pool.observe(lambda table, method, seconds: queries.observe((table, method), seconds))
+    caches = {"queries": cache, "pages": pageCache}
+    for stat, type, help in (("hits", "counter", "Lookups answered from the cache."),
+                             ("misses", "counter", "Lookups that were not in the cache."),
+                             ("evictions", "counter", "Entries dropped to stay within the size and byte bounds."),
+                             ("invalidations", "counter", "Entries dropped because a write changed what they were read from."),
+                             ("size", "gauge", "Entries in the cache."),
+                             ("bytes", "gauge", "Bytes held by the cache, for caches with a byte bound.")):
+        metrics.collect(f'mywebapp_cache_{stat}{"_total" if type == "counter" else ""}', type, help, ("cache",),
+                        lambda stat = stat: {(name,): caches[name].stats()[stat] for name in caches})
+    resources.update({
+        "metrics": metrics,
+        "analytics": HoursAnalytics(pool, cache),
+        "searchIndex": SearchIndex(pool),
+        "tableVersions": tableVersions,
+        "nameIndexes": {
+            "cca": NameIndex(resources["ccaCollection"], cache, tableVersions),
+            "activity": NameIndex(resources["activityCollection"], cache, tableVersions),
+        },
+    })
+
+    app = Flask(__name__)
+    app.extensions["mywebapp"] = resources
+    app.config["STARTUP"] = startup or uuid.uuid4().hex[:12]
+    app.register_blueprint(views)
+    app.register_blueprint(create_api({
+        "student": resources["studentCollection"],
+        "class": resources["classCollection"],
+        "subject": resources["subjectCollection"],
+        "cca": resources["ccaCollection"],
+        "activity": resources["activityCollection"],
+        "studentcca": resources["studentCCACollection"],
+        "studentactivity": resources["studentActivityCollection"],
+        "studentsubject": resources["studentSubjectCollection"],
+    }), url_prefix = '/api/v1')
+
+    @app.before_request
+    def begin_request():
+        migrated()
+        pool.set_deadline(request_timeout)
+        #the collections only evict the rows they write, so the caches drop whole tables that changed some other way, such as
+        #by an import or another worker. This costs one PRAGMA read unless something has committed.
+        tableVersions.refresh()
+
+    @app.teardown_request
+    def end_request(error):
+        pool.set_deadline(None)
+
+    instrument(app, metrics)
+
+    return app
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+TYPEAHEAD_SIZE = 10
+MAX_TYPEAHEAD_SIZE = 50
+
+def page_args() -> tuple:
+    '''
+    Reads the keyset pagination arguments of a /view_all page from the query string
+
+    Return:
+    Returns (after, before, limit), where limit is clamped to between 1 and MAX_PAGE_SIZE
+    '''
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    return request.args.get('after'), request.args.get('before'), limit
+
+def conditional(*tables: str):
+    '''
+    Decorates a page that is only read from the given tables. Its validator is built from the versions of those tables, so
+    a GET whose If-None-Match still matches is answered with 304 Not Modified before the page is queried or rendered.
+    '''
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            #the release is part of the validator, so a page rendered by an older version of the app is never revalidated
+            etag = f'{current_app.config["STARTUP"]}-{"-".join(map(str, tableVersions.get(tables)))}'
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status = 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak = True)
+                #the browser has to check back every time, but only gets the page again when it has changed
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def cached_page(*tables: str):
+    '''
+    Decorates a page so its rendered HTML is kept in pageCache, keyed on its path and query string. The page is tagged with
+    any change to the given tables and with every cached row it read while rendering, so a write through the collections
+    evicts exactly the pages it affects. Streamed pages are captured as they are sent, and only cached once they are complete.
+    '''
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            key = (request.path, tuple(sorted(request.args.items(multi = True))))
+            #a streamed page is put in the cache after the request has ended, so it holds on to the cache itself
+            pages = pageCache._get_current_object()
+            page, token = pages.lookup(key)
+            if isinstance(page, tuple):
+                body, headers = page
+                return Response(body, headers = headers)
+
+            with cache.record() as tags:
+                response = make_response(view(*args, **kwargs))
+            tags |= {(table,) for table in tables}
+            if response.status_code != 200:
+                return response
+            #every header the view set is kept with the page, apart from the length of the body, which is set again on a hit
+            headers = [(name, value) for name, value in response.headers if name.lower() != 'content-length']
+            if not response.is_streamed:
+                pages.put(key, (response.get_data(), headers), tags, token)
+                return response
+
+            def capture(chunks):
+                parts = []
+                for chunk in chunks:
+                    parts.append(chunk.encode() if isinstance(chunk, str) else chunk)
+                    yield chunk
+                pages.put(key, (b"".join(parts), headers), tags, token)
+            response.response = capture(response.response)
+            return response
+        return wrapper
+    return decorator
+
+@views.app_template_filter('highlight')
+def highlight(text: str) -> Markup:
+    '''
+    Escapes a search hit's title or snippet, then marks the matched terms that the search index wrapped in HIGHLIGHT
+    '''
+    start, end = HIGHLIGHT
+    return Markup(str(escape(text)).replace(start, '<mark>').replace(end, '</mark>'))
+
+@views.route('/')
 def index():
     return render_template("index.html")
 
-@app.errorhandler(404)
+@views.app_errorhandler(404)
 def page_not_found(error):
     return render_template("404.html")
 
-@app.errorhandler(500)
+@views.app_errorhandler(500)
 def internal_server_error(error):
     return render_template("500.html") 
 
-@app.route('/add_cca', methods=['GET', 'POST'])
+@views.app_errorhandler(sqlite3.OperationalError)
+def database_error(error):
+    #a request that ran past its deadline had its query interrupted, which is the server being too busy rather than a bug
+    if str(error) != "interrupted":
+        raise error
+    return render_template("500.html"), 503
+
+@views.route('/healthz')
+def healthz():
+    #ready once the database can be read and is at the schema this release expects
+    try:
+        with pool.connection(pin=False) as conn:
+            version = schema_version(conn)
+            conn.execute('SELECT 1 FROM "Student" LIMIT 1;').fetchall()
+    except sqlite3.Error as error:
+        return jsonify({"status": "unavailable", "error": str(error)}), 503
+    if version != SCHEMA_VERSION:
+        return jsonify({"status": "unavailable", "error": f'schema version {version}, expected {SCHEMA_VERSION}'}), 503
+    return jsonify({"status": "ok", "schema_version": version})
+
+@views.route('/add_cca', methods=['GET', 'POST'])
 def add_cca():
     title = "Add a new CCA"
     span1 = "Register a new CCA"
@@ -91,7 +322,7 @@ def add_cca():
                            }  
                           )
 
-@app.route('/add_activity', methods=['GET', 'POST'])
+@views.route('/add_activity', methods=['GET', 'POST'])
 def add_activity():
     title = "Add a new Activity"
     span1 = "Register a new Activity"
@@ -108,27 +339,30 @@ def add_activity():
                   "hours": "Hours",
                   "cca" : "CCA"
     }
-    ccalist = ccaCollection.findall(["id","name"])
     error = " "
         
     if 'confirm' in request.args:
-        cca_name = ccaCollection.find(request.form['cca'], ["name"])["name"]
-        form_header["cca"] = "CCA ID"
-        span1 = "Register a new Activity(Submission)"
-        span2 = "Please confirm the following details below:"
-        return render_template("add.html",
-                           page_type = 'confirm_activity',
-                           title = title,
-                           span1 = span1,
-                           span2 = span2,
-                           form_header = form_header,
-                           form_meta={
-                               'action': '/add_activity?attempted',
-                               'method': 'post'
-                           },
-                           form_data = dict(request.form),
-                           cca_name = cca_name
-                          )
+        cca = ccaCollection.find(request.form['cca'].strip(" "), ["name"])
+        if cca is None:
+            error = f'CCA ID {request.form["cca"]} not found! Try again!'
+        else:
+            cca_name = cca["name"]
+            form_header["cca"] = "CCA ID"
+            span1 = "Register a new Activity(Submission)"
+            span2 = "Please confirm the following details below:"
+            return render_template("add.html",
+                               page_type = 'confirm_activity',
+                               title = title,
+                               span1 = span1,
+                               span2 = span2,
+                               form_header = form_header,
+                               form_meta={
+                                   'action': '/add_activity?attempted',
+                                   'method': 'post'
+                               },
+                               form_data = dict(request.form),
+                               cca_name = cca_name
+                              )
     if 'attempted' in request.args:
 
         record = dict(request.form)
@@ -164,7 +398,6 @@ def add_activity():
                            span2 = span2,
                            error = error,
                            form_header = form_header,
-                           ccalist = ccalist,
                            form_meta = {
                                'action': '/add_activity?confirm',
                                'method': 'post'
@@ -184,7 +417,9 @@ def add_activity():
                           )
 
 
-@app.route('/view/student', methods=['GET', 'POST'])
+@views.route('/view/student', methods=['GET', 'POST'])
+@conditional("Student", "Class", "StudentActivity", "Activity", "StudentCCA", "CCA")
+@cached_page()
 def view_student():
     title = "View a Student"
     span1 = "View a Student"
@@ -194,12 +429,9 @@ def view_student():
     
     if request.args:
         id = request.args['id'].strip(" ")
-        record = studentCollection.find(id)
+        detail = studentCollection.viewdetail(id)
         
-        if record != None:
-            studentClass = studentCollection.viewclass(id)
-            studentCCAs = studentCollection.viewcca(id)
-            studentActivities = studentCollection.viewactivity(id)
+        if detail != None:
             span1 = "View a Student(Success)"
             span2 = "Here are the students details:"
             form_header = {
@@ -229,12 +461,7 @@ def view_student():
                                form_header = form_header,
                                table_header = table_header,
                                table_header2 = table_header2,
-                               form_data ={
-                                   'record':record,
-                                   'class':studentClass,
-                                   'activities':studentActivities,
-                                   'ccas':studentCCAs,
-                               }
+                               form_data = detail
                               )
         else:
             error = f'Student ID {request.args["id"]} not found! Try again!' 
@@ -255,7 +482,9 @@ def view_student():
                             }
                           )
 
-@app.route('/view/class', methods = ["GET", 'POST'])
+@views.route('/view/class', methods = ["GET", 'POST'])
+@conditional("Class", "Student")
+@cached_page()
 def view_class():
     title = 'View a Class'
     span1 = "View a Class"
@@ -265,9 +494,8 @@ def view_class():
 
     if request.args:
         id = request.args["id"].strip(" ")
-        record = classCollection.find(id)
-        if record != None:
-            students = classCollection.viewstudent(id)
+        detail = classCollection.viewdetail(id)
+        if detail != None:
             span1 = "View a Class(Success)"
             span2 = "Here are the Class details:"
             form_header = {
@@ -287,10 +515,7 @@ def view_class():
                                span2 = span2,
                                form_header = form_header,
                                table_header = table_header,
-                               form_data = {
-                                   'record':record,
-                                   'students':students
-                               }
+                               form_data = detail
                               )
         else: 
             error = f'Class ID {request.args["id"]} not found! Try again!'
@@ -311,7 +536,9 @@ def view_class():
                             }
                           )
 
-@app.route('/view/cca', methods = ["GET", 'POST'])
+@views.route('/view/cca', methods = ["GET", 'POST'])
+@conditional("CCA", "StudentCCA", "Student", "Class", "Activity")
+@cached_page()
 def view_cca():
     title = 'View a CCA'
     span1 = "View a CCA"
@@ -320,10 +547,8 @@ def view_cca():
     error = ' '
     if request.args:
         id = request.args["id"].strip(" ")
-        record = ccaCollection.find(id)
-        if record != None:
-            students = ccaCollection.viewstudent(id)
-            activities = ccaCollection.viewactivity(id)
+        detail = ccaCollection.viewdetail(id)
+        if detail != None:
             span1 = "View a CCA(Success)"
             span2 = "Here are the CCA details:"
             form_header = {
@@ -351,11 +576,7 @@ def view_cca():
                                form_header = form_header,
                                table_header = table_header,
                                table_header2 = table_header2,
-                               form_data = {
-                                   'record':record,
-                                   'students':students,
-                                   'activities':activities
-                               }
+                               form_data = detail
                               )
         else:
             error = f'CCA ID {request.args["id"]} not found! Try again!'
@@ -377,7 +598,9 @@ def view_cca():
                           )
 
 
-@app.route('/view/activity', methods = ['GET', 'POST']) 
+@views.route('/view/activity', methods = ['GET', 'POST']) 
+@conditional("Activity", "StudentActivity", "Student", "Class")
+@cached_page()
 def view_activity():
     title = 'View an Activity'
     span1 = "View an Activity"
@@ -388,11 +611,9 @@ def view_activity():
 
     if request.args:
         id = request.args["id"].strip(" ")
-        record = activityCollection.find(id)
+        detail = activityCollection.viewdetail(id)
 
-        if record != None: 
-            cca = ccaCollection.find(record["cca_id"],["id","name"])
-            students = activityCollection.viewstudent(id)
+        if detail != None: 
             span1 = "View an Activity(Submission)"
             span2 = "Here are the details:"
             form_header = {
@@ -420,11 +641,7 @@ def view_activity():
                                span2 = span2,
                                form_header = form_header,
                                table_header = table_header,
-                               form_data = {
-                                   'record':record,
-                                   'students':students,
-                                   'cca':cca
-                               }
+                               form_data = detail
                               )
         else:
             error = f'Activity {request.args["id"]} not found! Try again!'
@@ -444,7 +661,9 @@ def view_activity():
                                 "id": " "
                             }
                           )
-@app.route('/view_all/student')
+@views.route('/view_all/student')
+@conditional("Student", "Class")
+@cached_page("Student", "Class")
 def view_all_student():
     title = 'View all Students'
     span1 = 'Here are the details of all students'
@@ -457,16 +676,21 @@ def view_all_student():
                     'Class Name',
                    ]
 
-    records = studentCollection.viewall()
+    after, before, limit = page_args()
+    page = studentCollection.iter_viewall(after, before, limit, compact = True)
 
-    return render_template("view_all.html",
-                           page_type = "view_all_students",
-                           title = title,
-                           span1 = span1,
-                           table_header = table_header,
-                           table_data = records
-                          )
-@app.route('/view_all/class')
+    return Response(stream_template("view_all.html",
+                               page_type = "view_all_students",
+                               title = title,
+                               span1 = span1,
+                               table_header = table_header,
+                               table_data = page,
+                               page = page,
+                               limit = limit
+                              ))
+@views.route('/view_all/class')
+@conditional("Class")
+@cached_page("Class")
 def view_all_class():
     title = 'View all Class'
     span1 = 'Here are the details of all Classes'
@@ -475,16 +699,21 @@ def view_all_class():
                     'Class Level',
                    ]
 
-    records = classCollection.findall()
+    after, before, limit = page_args()
+    page = classCollection.iterfind(after = after, before = before, limit = limit, compact = True)
 
-    return render_template("view_all.html",
-                           page_type = "view_all_class",
-                           title = title,
-                           span1 = span1,
-                           table_header = table_header,
-                           table_data = records
-                          )
-@app.route('/view_all/cca')
+    return Response(stream_template("view_all.html",
+                               page_type = "view_all_class",
+                               title = title,
+                               span1 = span1,
+                               table_header = table_header,
+                               table_data = page,
+                               page = page,
+                               limit = limit
+                              ))
+@views.route('/view_all/cca')
+@conditional("CCA")
+@cached_page("CCA")
 def view_all_cca():
     title = 'View all CCA'
     span1 = 'Here are the details of all CCAs'
@@ -493,17 +722,22 @@ def view_all_cca():
                     'CCA Type',
                    ]
 
-    records = ccaCollection.findall()
+    after, before, limit = page_args()
+    page = ccaCollection.iterfind(after = after, before = before, limit = limit, compact = True)
 
-    return render_template("view_all.html",
-                           page_type = "view_all_cca",
-                           title = title,
-                           span1 = span1,
-                           table_header = table_header,
-                           table_data = records
-                          )
+    return Response(stream_template("view_all.html",
+                               page_type = "view_all_cca",
+                               title = title,
+                               span1 = span1,
+                               table_header = table_header,
+                               table_data = page,
+                               page = page,
+                               limit = limit
+                              ))
       
-@app.route('/view_all/activity')
+@views.route('/view_all/activity')
+@conditional("Activity")
+@cached_page("Activity")
 def view_all_activity():
     title = 'View all Activities'
     span1 = 'Here are the details of all Activities'
@@ -514,17 +748,92 @@ def view_all_activity():
                     'Hours'
                    ]
     columns = ['id', 'name', 'start_date', 'end_date', 'hours']
-    records = activityCollection.findall(columns)
+    after, before, limit = page_args()
+    page = activityCollection.iterfind(columns, after, before, limit, compact = True)
+
+    return Response(stream_template("view_all.html",
+                               page_type = 'view_all_activities',
+                               title = title,
+                               span1 = span1,
+                               table_header = table_header,
+                               table_data = page,
+                               page = page,
+                               limit = limit
+                              ))
+
+@views.route('/typeahead/<kind>')
+def typeahead(kind):
+    if kind not in nameIndexes:
+        abort(404)
+    limit = min(max(request.args.get('limit', TYPEAHEAD_SIZE, type=int), 1), MAX_TYPEAHEAD_SIZE)
+    return jsonify(nameIndexes[kind].lookup(request.args.get('q', ''), limit))
 
-    return render_template("view_all.html",
-                           page_type = 'view_all_activities',
+@views.route('/search')
+def search():
+    title = 'Search'
+    query = request.args.get('q', '').strip(" ")
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    page = searchIndex.search(query, offset, limit)
+    if not query:
+        span1 = 'Search students, classes, CCAs and activities'
+    elif page["records"] or offset:
+        span1 = f'Results for "{query}"'
+    else:
+        span1 = f'No results for "{query}"'
+
+    return render_template("search.html",
                            title = title,
                            span1 = span1,
+                           query = query,
+                           table_data = page["records"],
+                           page = page,
+                           limit = limit
+                          )
+
+@views.route('/reports')
+@conditional("Class", "CCA", "Student", "Activity", "StudentActivity")
+def reports():
+    by = request.args.get('by', 'class')
+    if by not in GROUPINGS:
+        abort(404)
+    title = 'Activity Hours Report'
+    span1 = f'Activity hours by {GROUPINGS[by]}'
+    if by == 'student':
+        table_header = ['Student ID', 'Student Name', 'Class', 'Activities', 'Hours']
+    else:
+        table_header = [f'{GROUPINGS[by]}', 'Name', 'Students', 'Participations', 'Hours',
+                        'Mean', 'Min', '25th Percentile', 'Median', '75th Percentile', 'Max']
+
+    return render_template("reports.html",
+                           title = title,
+                           span1 = span1,
+                           by = by,
+                           groupings = GROUPINGS,
                            table_header = table_header,
-                           table_data = records
+                           table_data = analytics.report(by)
                           )
 
-@app.route('/edit/cca', methods = ['POST', 'GET'])
+@views.route('/export/<name>')
+def export_table(name):
+    format = request.args.get('format', 'csv')
+    if name not in EXPORTS or format not in FORMATS:
+        abort(404)
+    _, mimetype, extension = FORMATS[format]
+    #the rows are encoded as they are read, so the export is never held in memory whole
+    return Response(export(name, pool._get_current_object(), format),
+                    mimetype = mimetype,
+                    headers = {'Content-Disposition': f'attachment; filename="{name}.{extension}"'})
+
+@views.route('/stats/cache')
+def cache_stats():
+    return jsonify({"queries": cache.stats(), "pages": pageCache.stats()})
+
+@views.route('/metrics')
+def export_metrics():
+    return Response(metrics.render(), content_type = 'text/plain; version=0.0.4; charset=utf-8')
+
+@views.route('/edit/cca', methods = ['POST', 'GET'])
 def edit_cca():
     title = "Update CCA Membership"
     span1 = "Update a CCA Membership"
@@ -534,15 +843,17 @@ def edit_cca():
                    'name': 'Name',
                    'CCA_id': 'CCA ID',
                    'CCA_name': 'CCA Name'}
-    ccalist = ccaCollection.findall(["id","name"])
     error = " "
     updateSuccess = True
     insertSuccess = True
     if 'addattempted' in request.args:
         new_record = {"student_id":request.form["student_id"],
-                      "cca_id":request.form["cca_id"]}
-        insertSuccess = studentCCACollection.insert(new_record)
-        if insertSuccess is False:
+                      "cca_id":request.form["cca_id"].strip(" ")}
+        if ccaCollection.find(new_record["cca_id"], ["id"]) is None:
+            insertSuccess = False
+            error = f'CCA ID {request.form["cca_id"]} not found! Try again!'
+        elif studentCCACollection.insert(new_record) is False:
+            insertSuccess = False
             error = "Error: The new record already exists in the database!"
         else:
             ccaRecord = ccaCollection.find(request.form['cca_id'])
@@ -581,20 +892,21 @@ def edit_cca():
                        },
                        form_data =  {
                            'studentRecord': studentRecord,
-                       },
-                       ccalist = ccalist
+                       }
                       )
     if 'updateattempted' in request.args:
         old_record = {"student_id":request.form["student_id"], 
                       "cca_id":request.form["old_cca_id"]}
         new_record = {"student_id":request.form["student_id"], 
-                      "cca_id":request.form["new_cca_id"]}
-        updateSuccess = studentCCACollection.update(old_record, new_record)
-
-        if updateSuccess is False:
+                      "cca_id":request.form["new_cca_id"].strip(" ")}
+        if ccaCollection.find(new_record["cca_id"], ["id"]) is None:
+            updateSuccess = False
+            error = f'CCA ID {request.form["new_cca_id"]} not found! Try again!'
+        elif studentCCACollection.update(old_record, new_record) is False:
+            updateSuccess = False
             error = "Error: The new record already exists in the database!"
         else:
-            ccaRecord = ccaCollection.find(request.form['new_cca_id'])
+            ccaRecord = ccaCollection.find(new_record['cca_id'])
             
             span1 = "Update a CCA Membership (Success)"
             span2 = "The CCA Membership has been successfully updated!"
@@ -632,8 +944,7 @@ def edit_cca():
                        form_data =  {
                            'studentRecord': studentRecord,
                            'ccaRecord': ccaRecord
-                       },
-                       ccalist = ccalist
+                       }
                       )
     
     if 'check' in request.args or updateSuccess is False or insertSuccess is False:
@@ -679,7 +990,7 @@ def edit_cca():
                            }
                           )
 
-@app.route('/edit/activity', methods = ['POST', 'GET'])
+@views.route('/edit/activity', methods = ['POST', 'GET'])
 def edit_activity():
     title = "Update an Activity "
     span1 = "Update an Activity participation"
@@ -695,16 +1006,18 @@ def edit_activity():
     error = " "
     updateSuccess = True
     insertSuccess = True
-    activitylist = activityCollection.findall(['id','name'])
     
     if 'addattempted' in request.args:
         new_record = {"student_id":request.form["student_id"],
-                      "activity_id":request.form["activity_id"]}
-        insertSuccess = studentActivityCollection.insert(new_record)
-        if insertSuccess is False:
+                      "activity_id":request.form["activity_id"].strip(" ")}
+        if activityCollection.find(new_record["activity_id"], ["id"]) is None:
+            insertSuccess = False
+            error = f'Activity ID {request.form["activity_id"]} not found! Try again!'
+        elif studentActivityCollection.insert(new_record) is False:
+            insertSuccess = False
             error = "Error: The new record already exists in the database!"
         else:
-            activityRecord = activityCollection.find(request.form['activity_id'])
+            activityRecord = activityCollection.find(new_record['activity_id'])
             span1 = "Add an Activity Participation (Success)"
             span2 = "The Activity Participation has been successfully added!"
             form_header = {
@@ -739,20 +1052,22 @@ def edit_activity():
                        },
                        form_data =  {
                            'studentRecord': studentRecord,
-                       },
-                       activitylist = activitylist
+                       }
                       )
     
     if 'updateattempted' in request.args:
         old_record = {"student_id":request.form["student_id"], 
                       "cca_id":request.form["old_activity_id"]}
         new_record = {"student_id":request.form["student_id"], 
-                      "cca_id":request.form["new_activity_id"]}
-        updateSuccess = studentActivityCollection.update(old_record, new_record)
-        if updateSuccess is False:
+                      "cca_id":request.form["new_activity_id"].strip(" ")}
+        if activityCollection.find(new_record["cca_id"], ["id"]) is None:
+            updateSuccess = False
+            error = f'Activity ID {request.form["new_activity_id"]} not found! Try again!'
+        elif studentActivityCollection.update(old_record, new_record) is False:
+            updateSuccess = False
             error = "Error: The new record already exists in the database!"
         else:
-            activityRecord = activityCollection.find(request.form['new_activity_id'])
+            activityRecord = activityCollection.find(new_record['cca_id'])
             
             span1 = "Update an Activity Participation (Success)"
             span2 = "The Activity Participation has been successfully updated!"
@@ -791,8 +1106,7 @@ def edit_activity():
                        form_data =  {
                            'studentRecord': studentRecord,
                            'activityRecord': activityRecord
-                       },
-                       activitylist = activitylist
+                       }
                       )
 
     if 'check' in request.args or updateSuccess is False or insertSuccess is False:
@@ -838,4 +1152,4 @@ def edit_activity():
                           )
     
 if __name__ == '__main__':
-    app.run('0.0.0.0')
\ No newline at end of file
+    create_app().run('0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,218 @@
+import bisect
+import threading
+import time
+from typing import Callable, Iterable, Iterator
+
+from flask import Flask, Response, before_render_template, g, request, template_rendered
+
+#Upper bounds of the latency buckets in seconds, from a cached read to a request that is about to time out
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+#Upper bounds of the response size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+def _escape(value: str) -> str:
+    '''
+    Escapes a label value for the text exposition format
+    '''
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    '''
+    Formats the labels of a series for the text exposition format, followed by any extra label such as the le of a bucket
+    '''
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    '''
+    Formats a sample value, writing whole numbers without a decimal point
+    '''
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Histogram:
+    """
+    A histogram with one series per combination of label values, counting observations into fixed buckets.
+    Attributes:
+    (-) name: str -> The metric name.
+    (-) help: str -> The description exported with the metric.
+    (-) labelnames: tuple -> The name of every label, in the order values are given to observe.
+    (-) buckets: tuple -> The upper bound of every bucket, in increasing order.
+    (-) series: dict -> The bucket counts and sum of the observations of every combination of label values.
+    Methods:
+    (+) observe(labels, value) -> Records one observation.
+
+    (+) render() -> Returns the histogram in the text exposition format.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: tuple, buckets: tuple) -> None:
+        self.name = name
+        self.help = help
+        self._labelnames = labelnames
+        self._buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        '''
+        Records one observation, which only finds its bucket and adds to two numbers, so it can be left on in production
+
+        Parameter:
+        labels: tuple -> The value of every label, in the order of labelnames
+        value: float -> The observed value
+        '''
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self._buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        '''
+        Returns the lines of the histogram in the text exposition format, with cumulative buckets
+        '''
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self._buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{"+Inf" if bound == float("inf") else _number(bound)}"'
+                lines.append(f'{self.name}_bucket{_labels(self._labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self._labelnames, labels)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self._labelnames, labels)} {cumulative}')
+        return lines
+
+class Metrics:
+    """
+    The metrics of one app, exported together on /metrics.
+    Histograms are updated as things happen, while the values of counters and gauges that are already kept elsewhere, such
+    as the counters of the caches, are read when the metrics are scraped.
+    Attributes:
+    (-) metrics: list -> Every histogram, and the name, type, help, label names and reader of every other metric.
+    Methods:
+    (+) histogram(name, help, labelnames, buckets) -> Creates a histogram.
+
+    (+) collect(name, type, help, labelnames, read) -> Adds a counter or gauge whose values are read at every scrape.
+
+    (+) render() -> Returns every metric in the text exposition format.
+    """
+
+    def __init__(self) -> None:
+        self._metrics = []
+
+    def histogram(self, name: str, help: str, labelnames: tuple, buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        '''
+        Creates a histogram and adds it to the exported metrics
+
+        Parameter:
+        name: str -> The metric name
+        help: str -> The description exported with the metric
+        labelnames: tuple -> The name of every label
+        buckets: tuple -> The upper bound of every bucket, in increasing order
+
+        Return:
+        Returns the histogram
+        '''
+        histogram = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(histogram)
+        return histogram
+
+    def collect(self, name: str, type: str, help: str, labelnames: tuple, read: Callable[[], dict[tuple, float]]) -> None:
+        '''
+        Adds a metric whose values are read when the metrics are scraped, so keeping it costs nothing in between
+
+        Parameter:
+        name: str -> The metric name
+        type: str -> "counter" or "gauge"
+        help: str -> The description exported with the metric
+        labelnames: tuple -> The name of every label
+        read: Callable -> Returns the value of every combination of label values
+        '''
+        self._metrics.append((name, type, help, labelnames, read))
+
+    def render(self) -> str:
+        '''
+        Returns every metric in the Prometheus text exposition format
+        '''
+        lines = []
+        for metric in self._metrics:
+            if isinstance(metric, Histogram):
+                lines.extend(metric.render())
+                continue
+            name, type, help, labelnames, read = metric
+            lines.extend([f'# HELP {name} {help}', f'# TYPE {name} {type}'])
+            lines.extend(f'{name}{_labels(labelnames, labels)} {_number(value)}' for labels, value in sorted(read().items()))
+        return "\n".join(lines) + "\n"
+
+#===========================================================================================================================================
+
+def _counted(chunks: Iterable, done: Callable[[int], None]) -> Iterator:
+    '''
+    Passes a streamed body through, calling done with the number of bytes sent once it has all been sent
+    '''
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        done(size)
+
+def instrument(app: Flask, metrics: Metrics) -> None:
+    '''
+    Records the latency and response size of every request to the app, labelled by route, and how long every template took
+    to render. A streamed response is measured once its last chunk has been sent.
+
+    Parameter:
+    app: Flask -> The app to instrument
+    metrics: Metrics -> The metrics the measurements are added to
+    '''
+    requests = metrics.histogram("mywebapp_request_duration_seconds", "Time from receiving a request to sending the last byte of its response.",
+                                 ("route", "method", "status"))
+    sizes = metrics.histogram("mywebapp_response_size_bytes", "Size of response bodies.", ("route",), SIZE_BUCKETS)
+    renders = metrics.histogram("mywebapp_template_render_seconds", "Time spent rendering templates, including streaming them.",
+                                ("template",))
+
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+    #runs before every other before_request hook, so the time they take counts too
+    app.before_request_funcs.setdefault(None, []).insert(0, start_timer)
+
+    @app.after_request
+    def record_request(response: Response) -> Response:
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        labels = (route, request.method, str(response.status_code))
+
+        def done(size: int) -> None:
+            requests.observe(labels, time.perf_counter() - start)
+            sizes.observe((route,), size)
+
+        if response.is_streamed and not response.direct_passthrough:
+            response.response = _counted(response.response, done)
+        else:
+            done(response.content_length or 0)
+        return response
+
+    def start_render(sender, template, context, **extra) -> None:
+        g.setdefault("metrics_renders", []).append(time.perf_counter())
+
+    def record_render(sender, template, context, **extra) -> None:
+        starts = g.get("metrics_renders")
+        if starts:
+            renders.observe((template.name or "<string>",), time.perf_counter() - starts.pop())
+
+    #blinker only keeps weak references to receivers, so the app holds on to them
+    app.extensions["metrics_receivers"] = (start_render, record_render)
+    before_render_template.connect(start_render, app)
+    template_rendered.connect(record_render, app)
@@ -0,0 +1,566 @@
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable
+
+class Migration:
+    """
+    A versioned schema change made up of named steps.
+    Attributes:
+    (-) version: int -> The PRAGMA user_version the database is at once this migration has been applied.
+    (-) description: str -> A short description of the change.
+    (-) steps: list[tuple[str, list[str]]] -> (description, statements) pairs that are run in order.
+    Methods:
+    (+) apply(conn) -> Runs every step on the connection and returns how long each one took.
+    """
+
+    def __init__(self, version: int, description: str, steps: list[tuple[str, list[str]]]) -> None:
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+    def apply(self, conn: sqlite3.Connection) -> list[dict]:
+        '''
+        Runs every step of the migration on the given connection, then records the new schema version.
+        The caller is responsible for the surrounding transaction.
+
+        Parameter:
+        conn: sqlite3.Connection -> the connection to run the migration on
+
+        Return:
+        Returns a list with one report per step, holding the step's description, the rows it changed and the seconds it took
+        '''
+        report = []
+        for description, statements in self.steps:
+            start = time.perf_counter()
+            changes = conn.total_changes
+            for statement in statements:
+                conn.execute(statement)
+            report.append({
+                "version": self.version,
+                "step": description,
+                "rows": conn.total_changes - changes,
+                "seconds": time.perf_counter() - start,
+            })
+        conn.execute(f'PRAGMA user_version = {self.version};')
+        return report
+
+#===========================================================================================================================================
+
+def _rekey_junction(tblname: str, left_key: str, left_table: str, right_key: str, right_table: str) -> list[tuple[str, list[str]]]:
+    '''
+    Builds the steps that rebuild a junction table as a WITHOUT ROWID table keyed on both of its columns,
+    dropping duplicate and incomplete rows on the way, and index it for lookups from the right-hand side.
+    '''
+    return [
+        (f'Deduplicate "{tblname}" into a table keyed on ("{left_key}", "{right_key}")', [
+            f'''CREATE TABLE "{tblname}_new"(
+                "{left_key}" TEXT NOT NULL,
+                "{right_key}" TEXT NOT NULL,
+                Primary Key("{left_key}", "{right_key}")
+                Foreign Key("{left_key}") REFERENCES {left_table}("id")
+                Foreign Key("{right_key}") REFERENCES {right_table}("id")
+                ) WITHOUT ROWID;''',
+            f'''INSERT INTO "{tblname}_new"
+                SELECT DISTINCT "{left_key}", "{right_key}" FROM "{tblname}"
+                WHERE "{left_key}" IS NOT NULL and "{right_key}" IS NOT NULL;''',
+            f'DROP TABLE "{tblname}";',
+            f'ALTER TABLE "{tblname}_new" RENAME TO "{tblname}";',
+        ]),
+        (f'Index "{tblname}" on ("{right_key}", "{left_key}")', [
+            f'''CREATE INDEX IF NOT EXISTS "{tblname}_{right_key}"
+                ON "{tblname}"("{right_key}", "{left_key}");''',
+        ]),
+    ]
+
+#The summary tables the v4 triggers keep up to date, with their count columns and the query that recomputes them from scratch.
+#A summary row is dropped as soon as its counts are back to zero, so a rebuild always gives back exactly the same rows.
+SUMMARIES = {
+    "ClassSummary": (("students",),
+        '''SELECT "class_id", COUNT(*)
+           FROM "Student"
+           WHERE "class_id" IS NOT NULL
+           GROUP BY "class_id";'''),
+    "CCASummary": (("students", "activities"),
+        '''SELECT "cca_id", SUM("students"), SUM("activities")
+           FROM (SELECT "cca_id", 1 as "students", 0 as "activities" FROM "StudentCCA"
+                 UNION ALL
+                 SELECT "cca_id", 0, 1 FROM "Activity" WHERE "cca_id" IS NOT NULL)
+           GROUP BY "cca_id";'''),
+    "StudentSummary": (("activities", "hours"),
+        '''SELECT "StudentActivity"."student_id", COUNT(*), TOTAL(CAST("Activity"."hours" AS REAL))
+           FROM "StudentActivity"
+           INNER JOIN "Activity"
+               ON "Activity"."id" = "StudentActivity"."activity_id"
+           GROUP BY "StudentActivity"."student_id";'''),
+}
+
+#Class sizes follow Student."class_id"
+_CLASS_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS "Student_insert_summary"
+        AFTER INSERT ON "Student" WHEN new."class_id" IS NOT NULL
+        BEGIN
+            INSERT INTO "ClassSummary" VALUES (new."class_id", 1)
+                ON CONFLICT("id") DO UPDATE SET "students" = "students" + 1;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Student_delete_summary"
+        AFTER DELETE ON "Student" WHEN old."class_id" IS NOT NULL
+        BEGIN
+            UPDATE "ClassSummary" SET "students" = "students" - 1 WHERE "id" = old."class_id";
+            DELETE FROM "ClassSummary" WHERE "id" = old."class_id" and "students" = 0;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Student_update_summary"
+        AFTER UPDATE OF "class_id" ON "Student" WHEN old."class_id" IS NOT new."class_id"
+        BEGIN
+            UPDATE "ClassSummary" SET "students" = "students" - 1 WHERE "id" = old."class_id";
+            DELETE FROM "ClassSummary" WHERE "id" = old."class_id" and "students" = 0;
+            INSERT INTO "ClassSummary" SELECT new."class_id", 1 WHERE new."class_id" IS NOT NULL
+                ON CONFLICT("id") DO UPDATE SET "students" = "students" + 1;
+        END;''',
+]
+
+#CCA memberships follow StudentCCA, and the activities a CCA organises follow Activity."cca_id"
+_CCA_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS "StudentCCA_insert_summary"
+        AFTER INSERT ON "StudentCCA"
+        BEGIN
+            INSERT INTO "CCASummary" VALUES (new."cca_id", 1, 0)
+                ON CONFLICT("id") DO UPDATE SET "students" = "students" + 1;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "StudentCCA_delete_summary"
+        AFTER DELETE ON "StudentCCA"
+        BEGIN
+            UPDATE "CCASummary" SET "students" = "students" - 1 WHERE "id" = old."cca_id";
+            DELETE FROM "CCASummary" WHERE "id" = old."cca_id" and "students" = 0 and "activities" = 0;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "StudentCCA_update_summary"
+        AFTER UPDATE OF "cca_id" ON "StudentCCA" WHEN old."cca_id" IS NOT new."cca_id"
+        BEGIN
+            UPDATE "CCASummary" SET "students" = "students" - 1 WHERE "id" = old."cca_id";
+            DELETE FROM "CCASummary" WHERE "id" = old."cca_id" and "students" = 0 and "activities" = 0;
+            INSERT INTO "CCASummary" VALUES (new."cca_id", 1, 0)
+                ON CONFLICT("id") DO UPDATE SET "students" = "students" + 1;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Activity_insert_cca_summary"
+        AFTER INSERT ON "Activity" WHEN new."cca_id" IS NOT NULL
+        BEGIN
+            INSERT INTO "CCASummary" VALUES (new."cca_id", 0, 1)
+                ON CONFLICT("id") DO UPDATE SET "activities" = "activities" + 1;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Activity_delete_cca_summary"
+        AFTER DELETE ON "Activity" WHEN old."cca_id" IS NOT NULL
+        BEGIN
+            UPDATE "CCASummary" SET "activities" = "activities" - 1 WHERE "id" = old."cca_id";
+            DELETE FROM "CCASummary" WHERE "id" = old."cca_id" and "students" = 0 and "activities" = 0;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Activity_update_cca_summary"
+        AFTER UPDATE OF "cca_id" ON "Activity" WHEN old."cca_id" IS NOT new."cca_id"
+        BEGIN
+            UPDATE "CCASummary" SET "activities" = "activities" - 1 WHERE "id" = old."cca_id";
+            DELETE FROM "CCASummary" WHERE "id" = old."cca_id" and "students" = 0 and "activities" = 0;
+            INSERT INTO "CCASummary" SELECT new."cca_id", 0, 1 WHERE new."cca_id" IS NOT NULL
+                ON CONFLICT("id") DO UPDATE SET "activities" = "activities" + 1;
+        END;''',
+]
+
+#A student's activities and hours only count participations in an activity that exists, the same as every join on StudentActivity,
+#so they follow both StudentActivity and the "id" and "hours" of Activity
+_STUDENT_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS "StudentActivity_insert_summary"
+        AFTER INSERT ON "StudentActivity"
+        BEGIN
+            INSERT INTO "StudentSummary"
+                SELECT new."student_id", 1, COALESCE(CAST("hours" AS REAL), 0) FROM "Activity" WHERE "id" = new."activity_id"
+                ON CONFLICT("id") DO UPDATE SET "activities" = "activities" + 1, "hours" = "hours" + excluded."hours";
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "StudentActivity_delete_summary"
+        AFTER DELETE ON "StudentActivity"
+        BEGIN
+            UPDATE "StudentSummary"
+                SET "activities" = "StudentSummary"."activities" - 1, "hours" = "StudentSummary"."hours" - "Activity"."hours"
+                FROM (SELECT COALESCE(CAST("hours" AS REAL), 0) as "hours" FROM "Activity" WHERE "id" = old."activity_id") as "Activity"
+                WHERE "StudentSummary"."id" = old."student_id";
+            DELETE FROM "StudentSummary" WHERE "id" = old."student_id" and "activities" = 0;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "StudentActivity_update_summary"
+        AFTER UPDATE ON "StudentActivity" WHEN old."student_id" IS NOT new."student_id" or old."activity_id" IS NOT new."activity_id"
+        BEGIN
+            UPDATE "StudentSummary"
+                SET "activities" = "StudentSummary"."activities" - 1, "hours" = "StudentSummary"."hours" - "Activity"."hours"
+                FROM (SELECT COALESCE(CAST("hours" AS REAL), 0) as "hours" FROM "Activity" WHERE "id" = old."activity_id") as "Activity"
+                WHERE "StudentSummary"."id" = old."student_id";
+            DELETE FROM "StudentSummary" WHERE "id" = old."student_id" and "activities" = 0;
+            INSERT INTO "StudentSummary"
+                SELECT new."student_id", 1, COALESCE(CAST("hours" AS REAL), 0) FROM "Activity" WHERE "id" = new."activity_id"
+                ON CONFLICT("id") DO UPDATE SET "activities" = "activities" + 1, "hours" = "hours" + excluded."hours";
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Activity_insert_student_summary"
+        AFTER INSERT ON "Activity" WHEN new."id" IS NOT NULL
+        BEGIN
+            INSERT INTO "StudentSummary"
+                SELECT "student_id", 1, COALESCE(CAST(new."hours" AS REAL), 0) FROM "StudentActivity" WHERE "activity_id" = new."id"
+                ON CONFLICT("id") DO UPDATE SET "activities" = "activities" + 1, "hours" = "hours" + excluded."hours";
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Activity_delete_student_summary"
+        AFTER DELETE ON "Activity" WHEN old."id" IS NOT NULL
+        BEGIN
+            UPDATE "StudentSummary"
+                SET "activities" = "activities" - 1, "hours" = "hours" - COALESCE(CAST(old."hours" AS REAL), 0)
+                WHERE "id" IN (SELECT "student_id" FROM "StudentActivity" WHERE "activity_id" = old."id");
+            DELETE FROM "StudentSummary"
+                WHERE "id" IN (SELECT "student_id" FROM "StudentActivity" WHERE "activity_id" = old."id") and "activities" = 0;
+        END;''',
+    '''CREATE TRIGGER IF NOT EXISTS "Activity_update_student_summary"
+        AFTER UPDATE OF "id", "hours" ON "Activity" WHEN old."id" IS NOT new."id" or old."hours" IS NOT new."hours"
+        BEGIN
+            UPDATE "StudentSummary"
+                SET "activities" = "activities" - 1, "hours" = "hours" - COALESCE(CAST(old."hours" AS REAL), 0)
+                WHERE "id" IN (SELECT "student_id" FROM "StudentActivity" WHERE "activity_id" = old."id");
+            DELETE FROM "StudentSummary"
+                WHERE "id" IN (SELECT "student_id" FROM "StudentActivity" WHERE "activity_id" = old."id") and "activities" = 0;
+            INSERT INTO "StudentSummary"
+                SELECT "student_id", 1, COALESCE(CAST(new."hours" AS REAL), 0) FROM "StudentActivity" WHERE "activity_id" = new."id"
+                ON CONFLICT("id") DO UPDATE SET "activities" = "activities" + 1, "hours" = "hours" + excluded."hours";
+        END;''',
+]
+
+def _search_index(tblname: str, kind: str, title: str, body: list[str]) -> tuple[list[str], list[str]]:
+    '''
+    Builds the triggers that keep an entity's name and descriptive columns in the "Search" index, and the statements that
+    index the entity's existing rows. Each entity row is one "SearchDocument", whose docid is the rowid of its "Search" row.
+    '''
+    def document(row: str) -> str:
+        text = " || ' ' || ".join(f'COALESCE({row}."{column}", \'\')' for column in body) if body else "''"
+        return f'''INSERT INTO "SearchDocument"("kind", "key") SELECT '{kind}', {row}."id" WHERE {row}."id" IS NOT NULL;
+            INSERT INTO "Search"("rowid", "title", "body")
+                SELECT "docid", COALESCE({row}."{title}", ''), {text} FROM "SearchDocument"
+                WHERE "kind" = '{kind}' and "key" = {row}."id";'''
+
+    def remove(row: str) -> str:
+        return f'''DELETE FROM "Search"
+                WHERE "rowid" = (SELECT "docid" FROM "SearchDocument" WHERE "kind" = '{kind}' and "key" = {row}."id");
+            DELETE FROM "SearchDocument" WHERE "kind" = '{kind}' and "key" = {row}."id";'''
+
+    columns = ', '.join(f'"{column}"' for column in ["id", title, *body])
+    triggers = [
+        f'''CREATE TRIGGER IF NOT EXISTS "{tblname}_insert_search"
+            AFTER INSERT ON "{tblname}"
+            BEGIN
+            {document("new")}
+            END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS "{tblname}_delete_search"
+            AFTER DELETE ON "{tblname}"
+            BEGIN
+            {remove("old")}
+            END;''',
+        f'''CREATE TRIGGER IF NOT EXISTS "{tblname}_update_search"
+            AFTER UPDATE OF {columns} ON "{tblname}"
+            BEGIN
+            {remove("old")}
+            {document("new")}
+            END;''',
+    ]
+    text = " || ' ' || ".join(f'COALESCE("{tblname}"."{column}", \'\')' for column in body) if body else "''"
+    fill = [
+        f'''INSERT INTO "SearchDocument"("kind", "key")
+            SELECT '{kind}', "id" FROM "{tblname}" WHERE "id" IS NOT NULL;''',
+        f'''INSERT INTO "Search"("rowid", "title", "body")
+            SELECT "SearchDocument"."docid", COALESCE("{tblname}"."{title}", ''), {text}
+            FROM "SearchDocument"
+            INNER JOIN "{tblname}"
+                ON "{tblname}"."id" = "SearchDocument"."key"
+            WHERE "SearchDocument"."kind" = '{kind}';''',
+    ]
+    return triggers, fill
+
+#The entities in the search index: their table, their kind in the index, the column used as a hit's title and the columns searched along with it
+SEARCHABLE = [
+    ("Student", "student", "name", []),
+    ("Class", "class", "name", []),
+    ("CCA", "cca", "name", ["type"]),
+    ("Activity", "activity", "name", ["description", "category", "award"]),
+]
+
+#The tables whose changes are counted in "TableVersion"
+VERSIONED = ["Student", "Class", "Subject", "CCA", "Activity", "StudentActivity", "StudentCCA", "StudentSubject"]
+
+def _version_triggers(tblname: str) -> list[str]:
+    '''
+    Builds the triggers that bump a table's version in "TableVersion" whenever one of its rows is inserted, updated or deleted
+    '''
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS "{tblname}_{event.lower()}_version"
+            AFTER {event} ON "{tblname}"
+            BEGIN
+            UPDATE "TableVersion" SET "version" = "version" + 1 WHERE "name" = '{tblname}';
+            END;'''
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+MIGRATIONS = [
+    Migration(1, "Create the base tables", [
+        ("Create the entity tables", [
+            '''CREATE TABLE IF NOT EXISTS "Student"(
+                "id" TEXT UNIQUE,
+                "name" TEXT,
+                "student_age" INT,
+                "year_enrolled" INT,
+                "graduating_year" INT,
+                "class_id" TEXT,
+                Primary Key("id")
+                Foreign Key("class_id") REFERENCES Class("id")
+                );''',
+            '''CREATE TABLE IF NOT EXISTS "Class"(
+                "id" TEXT UNIQUE,
+                "name" TEXT,
+                "level" TEXT,
+                Primary Key("id")
+                );''',
+            '''CREATE TABLE IF NOT EXISTS "Subject"(
+                "id" TEXT UNIQUE,
+                "name" TEXT,
+                "level" TEXT,
+                Primary Key("id")
+                );''',
+            '''CREATE TABLE IF NOT EXISTS "CCA"(
+                "id" TEXT UNIQUE,
+                "name" TEXT,
+                "type" TEXT,
+                Primary Key("id")
+                );''',
+            '''CREATE TABLE IF NOT EXISTS "Activity"(
+                "id" TEXT UNIQUE,
+                "name" TEXT,
+                "start_date" TEXT,
+                "end_date" TEXT,
+                "description" TEXT,
+                "category" TEXT,
+                "role" TEXT,
+                "award" TEXT,
+                "hours" INT,
+                "cca_id" TEXT,
+                Primary Key("id")
+                Foreign Key("cca_id") REFERENCES CCA("id")
+                );''',
+        ]),
+        ("Create the junction tables", [
+            '''CREATE TABLE IF NOT EXISTS "StudentActivity"(
+                "student_id" TEXT,
+                "activity_id" TEXT,
+                Foreign Key("student_id") REFERENCES Student("id")
+                Foreign Key("activity_id") REFERENCES Activity("id")
+                );''',
+            '''CREATE TABLE IF NOT EXISTS "StudentCCA"(
+                "student_id" TEXT,
+                "cca_id" TEXT,
+                Foreign Key("student_id") REFERENCES Student("id")
+                Foreign Key("cca_id") REFERENCES CCA("id")
+                );''',
+            '''CREATE TABLE IF NOT EXISTS "StudentSubject"(
+                "student_id" TEXT,
+                "subject_id" TEXT,
+                Foreign Key("student_id") REFERENCES Student("id")
+                Foreign Key("subject_id") REFERENCES Subject("id")
+                );''',
+        ]),
+    ]),
+    Migration(2, "Key the junction tables and index every join column",
+        _rekey_junction("StudentCCA", "student_id", "Student", "cca_id", "CCA")
+        + _rekey_junction("StudentActivity", "student_id", "Student", "activity_id", "Activity")
+        + _rekey_junction("StudentSubject", "student_id", "Student", "subject_id", "Subject")
+        + [
+            ('Index "Activity" on "cca_id"', [
+                '''CREATE INDEX IF NOT EXISTS "Activity_cca_id"
+                    ON "Activity"("cca_id");''',
+            ]),
+            ('Index "Student" on "class_id"', [
+                '''CREATE INDEX IF NOT EXISTS "Student_class_id"
+                    ON "Student"("class_id", "id", "name");''',
+            ]),
+            ("Refresh the query planner statistics", [
+                'ANALYZE;',
+            ]),
+        ]),
+    Migration(3, "Index the numeric display order of every entity", [
+        (f'Index "{tblname}" on (ABS("id"), "id")', [
+            f'''CREATE INDEX IF NOT EXISTS "{tblname}_order"
+                ON "{tblname}"(ABS("id"), "id");''',
+        ])
+        for tblname in ("Student", "Class", "Subject", "CCA", "Activity")
+    ] + [
+        ("Refresh the query planner statistics", [
+            'ANALYZE;',
+        ]),
+    ]),
+    Migration(4, "Keep trigger-maintained summaries of memberships, class sizes and activity hours", [
+        ("Create the summary tables", [
+            '''CREATE TABLE IF NOT EXISTS "ClassSummary"(
+                "id" TEXT NOT NULL,
+                "students" INT NOT NULL,
+                Primary Key("id")
+                ) WITHOUT ROWID;''',
+            '''CREATE TABLE IF NOT EXISTS "CCASummary"(
+                "id" TEXT NOT NULL,
+                "students" INT NOT NULL,
+                "activities" INT NOT NULL,
+                Primary Key("id")
+                ) WITHOUT ROWID;''',
+            '''CREATE TABLE IF NOT EXISTS "StudentSummary"(
+                "id" TEXT NOT NULL,
+                "activities" INT NOT NULL,
+                "hours" REAL NOT NULL,
+                Primary Key("id")
+                ) WITHOUT ROWID;''',
+        ]),
+        ("Create the summary triggers", _CLASS_TRIGGERS + _CCA_TRIGGERS + _STUDENT_TRIGGERS),
+    ] + [
+        (f'Fill "{tblname}"', [
+            f'INSERT INTO "{tblname}" {query}',
+        ])
+        for tblname, (_, query) in SUMMARIES.items()
+    ]),
+    Migration(5, "Index names and descriptions for full-text search", [
+        ("Create the search index", [
+            '''CREATE TABLE IF NOT EXISTS "SearchDocument"(
+                "docid" INTEGER PRIMARY KEY,
+                "kind" TEXT NOT NULL,
+                "key" TEXT NOT NULL,
+                UNIQUE("kind", "key")
+                );''',
+            '''CREATE VIRTUAL TABLE IF NOT EXISTS "Search" USING fts5(
+                "title",
+                "body",
+                tokenize = "unicode61 remove_diacritics 2",
+                prefix = "2 3"
+                );''',
+        ]),
+    ] + [
+        (f'Index "{tblname}" for search', fill + triggers)
+        for (tblname, *_), (triggers, fill) in zip(SEARCHABLE, (_search_index(*entity) for entity in SEARCHABLE))
+    ]),
+    Migration(6, "Count the changes made to every table, for conditional GETs", [
+        ("Create the version table", [
+            '''CREATE TABLE IF NOT EXISTS "TableVersion"(
+                "name" TEXT NOT NULL,
+                "version" INT NOT NULL,
+                Primary Key("name")
+                ) WITHOUT ROWID;''',
+            f'''INSERT OR IGNORE INTO "TableVersion"
+                VALUES {", ".join(f"('{tblname}', 0)" for tblname in VERSIONED)};''',
+        ]),
+        ("Create the version triggers", [trigger for tblname in VERSIONED for trigger in _version_triggers(tblname)]),
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+#===========================================================================================================================================
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    '''
+    Returns the schema version recorded in the database's PRAGMA user_version
+    '''
+    return conn.execute('PRAGMA user_version;').fetchone()[0]
+
+def migrate(pool, target: int = SCHEMA_VERSION) -> list[dict]:
+    '''
+    Upgrades the database in place to the target schema version.
+    Each migration runs in its own transaction on the pool's serialized writer, so an interrupted upgrade resumes from the
+    last migration that completed. The version is re-read inside the transaction, so concurrent processes never apply a
+    migration twice. A database already at the target version is only read, which takes no write lock.
+
+    Parameter:
+    pool: ConnectionPool -> The pool of the database to upgrade
+    target: int -> The schema version to stop at. Defaults to the latest version.
+
+    Return:
+    Returns a list of step reports (version, step, rows, seconds) for every step that was run
+    '''
+    with pool.connection(pin=False) as conn:
+        if schema_version(conn) >= target:
+            return []
+
+    report = []
+    for migration in MIGRATIONS:
+        if migration.version > target:
+            break
+
+        def work(conn: sqlite3.Connection) -> list[dict]:
+            if schema_version(conn) >= migration.version:
+                return []
+            return migration.apply(conn)
+
+        report.extend(pool.write(work))
+    return report
+
+def bootstrap(pool) -> Callable[[], None]:
+    '''
+    Defers migrating the database until it is first needed, such as by the first request a server process handles, so
+    starting a process does no database work at all
+
+    Parameter:
+    pool: ConnectionPool -> The pool of the database to upgrade
+
+    Return:
+    Returns a function that migrates the database to the latest version the first time it is called from any thread, and
+    returns straight away on every later call. A failed migration is tried again on the next call.
+    '''
+    lock = threading.Lock()
+    done = False
+
+    def ensure() -> None:
+        nonlocal done
+        if done:
+            return
+        with lock:
+            if not done:
+                migrate(pool)
+                done = True
+    return ensure
+
+def rebuild_summaries(pool) -> list[dict]:
+    '''
+    Recomputes every summary table from the tables it summarises, repairing any drift from writes made while the triggers were
+    missing or disabled. Each summary is rebuilt in its own transaction on the pool's serialized writer.
+
+    Parameter:
+    pool: ConnectionPool -> The pool of a database at schema version 4 or later
+
+    Return:
+    Returns one report per summary table, holding its name, the rows it now has, how many of its rows were wrong or missing
+    before the rebuild and the seconds it took
+    '''
+    report = []
+    for tblname, (counts, query) in SUMMARIES.items():
+
+        def work(conn: sqlite3.Connection) -> dict:
+            start = time.perf_counter()
+            rows = {tuple(row) for row in conn.execute(query)}
+            drifted = rows.symmetric_difference(tuple(row) for row in conn.execute(f'SELECT * FROM "{tblname}";'))
+            conn.execute(f'DELETE FROM "{tblname}";')
+            conn.executemany(f'INSERT INTO "{tblname}" VALUES ({",".join("?" * (len(counts) + 1))});', rows)
+            return {
+                "summary": tblname,
+                "rows": len(rows),
+                "drifted": len({row[0] for row in drifted}),
+                "seconds": time.perf_counter() - start,
+            }
+
+        report.append(pool.write(work))
+    return report
+
+if __name__ == '__main__':
+    from storage import ConnectionPool
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    pool = ConnectionPool(args[0] if args else "MyWebApp.db")
+    report = migrate(pool)
+    for step in report:
+        print(f'v{step["version"]}  {step["seconds"] * 1000:9.2f} ms  {step["rows"]:8} rows  {step["step"]}')
+    if '--rebuild-summaries' in sys.argv:
+        for summary in rebuild_summaries(pool):
+            print(f'{summary["seconds"] * 1000:9.2f} ms  {summary["rows"]:8} rows  {summary["drifted"]:8} drifted  {summary["summary"]}')
+    with pool.connection() as conn:
+        print(f'Schema is at version {schema_version(conn)}.')
+    pool.close()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import uuid
+from typing import Optional
+
+from gunicorn.app.base import BaseApplication
+
+class Server(BaseApplication):
+    """
+    Serves the app from a pre-forked pool of worker processes, each running a pool of threads.
+    The master process never imports the app, so every worker builds its own connections, caches and indexes after it is
+    forked, and a graceful reload (kill -HUP on the master) starts workers running the current code before the old workers
+    finish the requests they hold and exit.
+    Attributes:
+    (-) dbname: str -> The path of the database.
+    (-) request_timeout: float -> The seconds a request's queries may run for, or None for no limit.
+    (-) options: dict -> The gunicorn settings.
+    (-) startup: str -> Identifies the release being served, shared by every worker until the next reload.
+    Methods:
+    (+) load_config() -> Applies the settings to gunicorn.
+
+    (+) load() -> Builds the app in a worker.
+    """
+
+    def __init__(self, dbname: str, request_timeout: Optional[float], options: dict) -> None:
+        self._dbname = dbname
+        self._request_timeout = request_timeout
+        self._options = options
+        self._startup = None
+        super().__init__()
+
+    def load_config(self) -> None:
+        '''
+        Applies the settings to gunicorn, and starts a new release on every reload so pages validated by the old code
+        are rendered again
+        '''
+        for name, value in self._options.items():
+            self.cfg.set(name, value)
+        self._startup = uuid.uuid4().hex[:12]
+
+    def load(self):
+        '''
+        Builds the app in a worker
+        '''
+        from main import create_app
+        return create_app(self._dbname,
+                          request_timeout = self._request_timeout,
+                          startup = self._startup)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = "Serve the app with a pool of worker processes. Send SIGHUP to the master to reload gracefully.")
+    parser.add_argument("--bind", "-b", default = os.environ.get("BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", "-w", type = int, default = int(os.environ.get("WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--threads", type = int, default = int(os.environ.get("THREADS", 4)))
+    parser.add_argument("--timeout", type = int, default = 60, help = "seconds a silent worker is given before it is restarted")
+    parser.add_argument("--graceful-timeout", type = int, default = 30, help = "seconds workers are given to finish their requests on reload or shutdown")
+    parser.add_argument("--request-timeout", type = float, default = 30.0, help = "seconds a request's queries may run for, 0 for no limit")
+    parser.add_argument("--db", default = "MyWebApp.db")
+    args = parser.parse_args()
+
+    Server(args.db, args.request_timeout or None, {
+        "bind": args.bind,
+        "workers": max(args.workers, 1),
+        "threads": max(args.threads, 1),
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "preload_app": False,
+    }).run()
@@ -0,0 +1,40 @@
+// Fills the <datalist> of every input with a data-typeahead URL from the server as the user types,
+// so a form only ever holds the handful of options that match instead of the whole catalogue.
+// Each option's value is the record's ID and its label the name, so the form still submits IDs.
+(function () {
+    var DELAY = 150;
+
+    function attach(input) {
+        var list = document.getElementById(input.getAttribute('list'));
+        var timer = null;
+        var latest = 0;
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                var request = ++latest;
+                var query = input.value.trim();
+                if (!query) {
+                    return;
+                }
+                fetch(input.dataset.typeahead + '?q=' + encodeURIComponent(query))
+                    .then(function (response) { return response.ok ? response.json() : []; })
+                    .then(function (records) {
+                        // a slower, older response must not replace the options of a newer one
+                        if (request !== latest) {
+                            return;
+                        }
+                        list.replaceChildren.apply(list, records.map(function (record) {
+                            var option = document.createElement('option');
+                            option.value = record.id;
+                            option.textContent = record.name;
+                            return option;
+                        }));
+                    })
+                    .catch(function () {});
+            }, DELAY);
+        });
+    }
+
+    document.querySelectorAll('input[data-typeahead]').forEach(attach);
+})();
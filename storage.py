@@ -1,5 +1,1034 @@
+import bisect
+import functools
+import inspect
+import json
+import logging
+import re
 import sqlite3
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from queue import Empty, LifoQueue, Queue
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+#Per-record outcomes reported by the bulk insert_many, update_many and delete_many methods
+INSERTED = "inserted"
+UPDATED = "updated"
+DELETED = "deleted"
+DUPLICATE = "duplicate"
+MISSING = "missing"
+FAILED = "failed"
+
+#Marks the start and end of every matched term in the titles and snippets of search hits
+HIGHLIGHT = ("\x02", "\x03")
+
+#Keeps IN (...) lookups under sqlite's default limit of 999 bound parameters
+_LOOKUP_SIZE = 400
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    '''
+    Splits an iterable into lists of at most size items without reading the whole iterable into memory.
+    '''
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _padded(chunk: list) -> list:
+    '''
+    Pads a chunk of lookup keys to the next power of two (at most _LOOKUP_SIZE) by repeating its last key, so IN (...)
+    lookups of similar length share one prepared statement. Repeating a key does not change the result of an IN.
+    '''
+    size = 1
+    while size < len(chunk):
+        size *= 2
+    return chunk + chunk[-1:] * (min(size, _LOOKUP_SIZE) - len(chunk))
+
+def _textkey(key: Any) -> Any:
+    '''
+    Converts a numeric key to the text a TEXT key column stores it as, the way api._key does for single keys, so a key sent
+    as a number is found in the table and tags the same cache entries. Any other key is returned unchanged.
+    '''
+    if isinstance(key, (int, float)) and not isinstance(key, bool):
+        return str(key)
+    return key
+
+def _executemany_or_each(conn: sqlite3.Connection, query: str, rows: list[tuple]) -> list[bool]:
+    '''
+    Runs query for every row with as few executemany calls as possible. sqlite only undoes the statement that failed, so when
+    a row is rejected the rows before it stay applied and the batch carries on from the row after it.
+    No savepoint is needed, which keeps the full-text index from being flushed at every batch.
+
+    Return:
+    Returns a list of booleans, True for every row that was applied
+    '''
+    applied = []
+    while len(applied) < len(rows):
+        sent = 0
+
+        def remaining() -> Iterator[tuple]:
+            nonlocal sent
+            for row in islice(rows, len(applied), None):
+                sent += 1
+                yield row
+
+        try:
+            conn.executemany(query, remaining())
+        except sqlite3.Error:
+            #the last row sent is the one that was rejected
+            applied.extend([True] * (sent - 1))
+            applied.append(False)
+        else:
+            applied.extend([True] * sent)
+    return applied
+
+class SerialWriter:
+    """
+    A single background thread that owns the only write connection and applies queued work one job at a time.
+    Every job runs inside its own BEGIN IMMEDIATE transaction, so writes never interleave and readers never see half a job.
+    Attributes:
+    (-) connect: Callable -> Opens the connection used by the writer thread.
+    (-) checkpoint_idle: float -> Seconds the queue must be idle after a write before the WAL is checkpointed and truncated.
+    (-) error: BaseException -> What stopped the writer thread, if it stopped on its own.
+    (-) last: tuple -> The write connection's data version and the versions of every table after the last job committed.
+    (-) written: dict -> The ranges of "TableVersion" versions of every table that the writer's own jobs committed, as
+                         sorted [after, upto] pairs meaning the versions after to upto were bumped by the writer.
+    Methods:
+    (+) submit(work) -> Queues work(conn) on the writer thread, waits for it and returns its result.
+
+    (+) wrote(table, since, until) -> Returns whether the writer committed every change to a table between two versions.
+
+    (+) close() -> Finishes the queued work, checkpoints the WAL and stops the writer thread.
+    """
+    #How many separate ranges of versions are remembered per table, which only fill up while other connections also write
+    MAX_RANGES = 64
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], checkpoint_idle: float = 1.0) -> None:
+        self._connect = connect
+        self._checkpoint_idle = checkpoint_idle
+        self._queue = Queue()
+        self._thread = None
+        self._conn = None
+        self._error = None
+        self._written = {}
+        self._last = (None, {})
+        self._lock = threading.Lock()
+
+    def _run(self) -> None:
+        '''
+        The writer thread's main loop. Runs queued jobs in order and checkpoints the WAL once the queue goes quiet.
+        If the thread stops for any other reason than close, every job still queued fails instead of waiting forever.
+        '''
+        try:
+            conn = self._conn = self._connect()
+            pending = False
+            while True:
+                try:
+                    item = self._queue.get(timeout=self._checkpoint_idle if pending else None)
+                except Empty:
+                    self._checkpoint(conn)
+                    pending = False
+                    continue
+
+                if item is None:
+                    break
+                work, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    conn.execute('BEGIN IMMEDIATE;')
+                    with conn:
+                        #read inside the job's transaction, so no other connection can commit in between
+                        (data_version,) = conn.execute('PRAGMA data_version;').fetchone()
+                        before = self._last[1] if data_version == self._last[0] else self._versions(conn)
+                        result = work(conn)
+                        after = self._versions(conn)
+                except BaseException as e:
+                    self._last = (None, {})
+                    future.set_exception(e)
+                else:
+                    #the data version only moves when another connection commits, so until it does the next job starts
+                    #from the versions this one left
+                    self._last = (data_version, after)
+                    self._record(before, after)
+                    future.set_result(result)
+                    pending = True
+
+            self._checkpoint(conn)
+            conn.close()
+            self._conn = None
+        except BaseException as e:
+            logger.exception("The sqlite writer thread stopped.")
+            with self._lock:
+                self._error = e
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except Empty:
+                        break
+                    if item is not None and item[1].set_running_or_notify_cancel():
+                        item[1].set_exception(sqlite3.OperationalError(f'The writer thread stopped: {e}'))
+
+    @staticmethod
+    def _versions(conn: sqlite3.Connection) -> dict[str, int]:
+        '''
+        A helper function that reads the version of every table, or nothing if the database has no "TableVersion" yet
+        '''
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        try:
+            return dict(cursor.execute('SELECT "name", "version" FROM "TableVersion";'))
+        except sqlite3.OperationalError:
+            return {}
+
+    def _record(self, before: dict[str, int], after: dict[str, int]) -> None:
+        '''
+        A helper function that adds the versions a committed job bumped to the ranges the writer has written, merging a range
+        into the one before it when no other connection committed in between
+        '''
+        with self._lock:
+            for table, upto in after.items():
+                since = before.get(table)
+                if since is None or since == upto:
+                    continue
+                ranges = self._written.setdefault(table, [])
+                if ranges and ranges[-1][1] == since:
+                    ranges[-1][1] = upto
+                else:
+                    ranges.append([since, upto])
+                    #nothing asks about the oldest ranges if the versions are never read, and forgetting one only makes
+                    #its changes look like another connection's
+                    del ranges[:-self.MAX_RANGES]
+
+    def wrote(self, table: str, since: int, until: int) -> bool:
+        '''
+        Returns whether every change to a table's version from since to until was committed by the writer's own jobs, and
+        forgets the ranges up to until, so each version is only asked about once
+
+        Parameter:
+        table: str -> The name of the table
+        since: int -> The version the caller last read
+        until: int -> The version the caller reads now
+
+        Return:
+        Returns True if the writer bumped every version after since up to until, and False if any other connection did
+        '''
+        with self._lock:
+            ranges = self._written.get(table, [])
+            covered = since
+            for after, upto in ranges:
+                if after <= covered < upto:
+                    covered = upto
+            self._written[table] = [pair for pair in ranges if pair[1] > until]
+        return covered >= until
+
+    @staticmethod
+    def _checkpoint(conn: sqlite3.Connection) -> None:
+        '''
+        A helper function that checkpoints and truncates the WAL. A checkpoint that fails, such as while another process is
+        writing, is only logged, since the next one will catch up.
+        '''
+        try:
+            conn.execute('PRAGMA wal_checkpoint(TRUNCATE);')
+        except sqlite3.Error:
+            logger.warning("Could not checkpoint the WAL.", exc_info=True)
+
+    def submit(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        '''
+        Queues a unit of work for the writer thread and blocks until it has been committed or rolled back.
+        Work submitted from inside another job runs straight away as part of that job's transaction.
+
+        Parameter:
+        work: Callable -> A function that receives the write connection and issues its DML on it
+
+        Return:
+        Returns whatever work returned. Exceptions raised by work are re-raised in the calling thread, and
+        sqlite3.OperationalError is raised straight away if the writer thread has stopped.
+        '''
+        if threading.current_thread() is self._thread:
+            return work(self._conn)
+        future = Future()
+        with self._lock:
+            if self._error is not None:
+                raise sqlite3.OperationalError(f'The writer thread stopped: {self._error}')
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+            #queued under the lock, so a thread that stops either runs this job or fails it
+            self._queue.put((work, future))
+        return future.result()
+
+    def close(self) -> None:
+        '''
+        Lets the writer thread finish everything already queued, then checkpoints the WAL and closes the write connection.
+        '''
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        #joined outside the lock, which a thread that fails while closing needs to fail what is still queued
+        if thread is not None:
+            thread.join()
+
+#===========================================================================================================================================
+
+class ConnectionPool:
+    """
+    A bounded pool of long-lived sqlite3 connections that is shared by every collection.
+    Reads run on pooled connections; every write is handed to a single SerialWriter.
+    In WAL journal mode this means readers keep running at full speed while a write is in progress.
+    Attributes:
+    (-) dbname: str -> The name of the database.
+    (-) maxsize: int -> The maximum number of read connections the pool will ever open.
+    (-) timeout: float -> Seconds a thread waits for a free connection before giving up.
+    (-) journal_mode: str -> The journal mode of the database, "wal" by default.
+    (-) busy_timeout: int -> Milliseconds a connection waits on a lock held by another process.
+    (-) pragmas: dict -> PRAGMA settings applied once to every new connection.
+    (-) cached_statements: int -> The number of prepared statements each connection keeps for reuse.
+    (-) writer: SerialWriter -> The single writer that all DML is queued on.
+    Methods:
+    (+) connection() -> Lends the calling thread a connection for the duration of a with block.
+
+    (+) write(work) -> Runs work(conn) on the serialized writer inside one transaction.
+
+    (+) set_deadline(seconds) -> Interrupts the calling thread's queries once the given number of seconds has passed.
+
+    (+) observe(callback) -> Calls callback(table, method, seconds) after every query a collection runs through the pool.
+
+    (+) wrote(table, since, until) -> Returns whether the pool's own writer committed every change to a table between two versions.
+
+    (+) close() -> Closes every connection opened by the pool.
+    """
+    DEFAULT_PRAGMAS = {
+        "cache_size": -16000,
+        "temp_store": "MEMORY",
+    }
+    #How many virtual machine steps sqlite runs between checks of the deadline
+    PROGRESS_STEPS = 10000
+    WAL_PRAGMAS = {
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,
+        "journal_size_limit": 67108864,
+        "wal_autocheckpoint": 1000,
+    }
+
+    def __init__(self, dbname: str, maxsize: int = 8, timeout: float = 10.0, pragmas: Optional[dict] = None,
+                 journal_mode: str = "wal", busy_timeout: int = 5000, checkpoint_idle: float = 1.0,
+                 cached_statements: int = 256) -> None:
+        self._dbname = dbname
+        self._maxsize = maxsize
+        self._timeout = timeout
+        self._journal_mode = journal_mode.lower()
+        self._busy_timeout = busy_timeout
+        self._cached_statements = cached_statements
+        self._pragmas = dict(self.DEFAULT_PRAGMAS)
+        if self._journal_mode == "wal":
+            self._pragmas.update(self.WAL_PRAGMAS)
+        self._pragmas["busy_timeout"] = busy_timeout
+        if pragmas is not None:
+            self._pragmas.update(pragmas)
+
+        self._slots = threading.BoundedSemaphore(maxsize)
+        self._idle = LifoQueue()
+        self._local = threading.local()
+        self._journal_lock = threading.Lock()
+        self._journal_set = False
+        self._closed = False
+        self._observers = []
+        self._writer = SerialWriter(self._connect, checkpoint_idle)
+
+    def _connect(self) -> sqlite3.Connection:
+        '''
+        A helper function that opens a new connection and applies the pool's pragmas to it.
+        The first connection opened also switches the database to the configured journal mode, which sqlite remembers in the file.
+
+        Return:
+        conn: sqlite3.Connection -> a connection that can be used from any thread
+        '''
+        conn = sqlite3.connect(self._dbname, timeout=self._busy_timeout / 1000, check_same_thread=False,
+                               cached_statements=self._cached_statements)
+        conn.row_factory = sqlite3.Row
+        with self._journal_lock:
+            if not self._journal_set:
+                conn.execute(f'PRAGMA journal_mode = {self._journal_mode};')
+                self._journal_set = True
+        for name, value in self._pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value};')
+        conn.set_progress_handler(self._expired, self.PROGRESS_STEPS)
+        return conn
+
+    def _expired(self) -> bool:
+        '''
+        A helper function that sqlite calls every PROGRESS_STEPS steps of a query, which interrupts the query once the deadline
+        of the thread running it has passed
+        '''
+        deadline = getattr(self._local, "deadline", None)
+        return deadline is not None and time.monotonic() > deadline
+
+    def observe(self, callback: Callable[[str, str, float], None]) -> None:
+        '''
+        Registers a callback that is told how long the queries of every collection method decorated with timed took, such as
+        to keep latency metrics. Queries are only timed once a callback is registered.
+
+        Parameter:
+        callback: Callable -> Called as callback(table, method, seconds), where method is the collection method that ran the query
+        '''
+        self._observers.append(callback)
+
+    def set_deadline(self, seconds: Optional[float]) -> None:
+        '''
+        Sets how long the calling thread's queries may keep running, such as for the rest of a request. A query that is still
+        running at the deadline is interrupted and raises sqlite3.OperationalError("interrupted"). Writes run on the writer's
+        thread, so they are never interrupted half way.
+
+        Parameter:
+        seconds: float -> Seconds from now until the deadline, or None to remove the deadline
+        '''
+        self._local.deadline = time.monotonic() + seconds if seconds is not None else None
+
+    @contextmanager
+    def connection(self, pin: bool = True) -> Iterator[sqlite3.Connection]:
+        '''
+        Lends a connection to the calling thread. Nested calls from the same thread reuse the connection it already holds.
+        The most recently returned connection is handed out first, so a busy thread keeps getting the same warm connection.
+
+        Parameter:
+        pin: bool -> Whether nested calls from this thread should reuse the connection. Generators that may be resumed
+                     from another thread pass False, so the connection is never tied to the thread that created them.
+
+        Return:
+        conn: sqlite3.Connection -> a pooled connection, returned to the pool when the with block exits
+        '''
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot use a closed connection pool.")
+        if not self._slots.acquire(timeout=self._timeout):
+            raise sqlite3.OperationalError("Timed out waiting for a pooled connection.")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                conn = self._connect()
+
+            if pin:
+                self._local.conn = conn
+            try:
+                yield conn
+            finally:
+                if pin:
+                    self._local.conn = None
+                if conn.in_transaction:
+                    conn.rollback()
+                if self._closed:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def write(self, work: Callable[[sqlite3.Connection], Any]) -> Any:
+        '''
+        Runs a unit of DML on the serialized writer inside one transaction, which is committed if work returns and rolled back if it raises.
+
+        Parameter:
+        work: Callable -> A function that receives the write connection and issues its DML on it
+
+        Return:
+        Returns whatever work returned
+        '''
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot use a closed connection pool.")
+        return self._writer.submit(work)
+
+    def wrote(self, table: str, since: int, until: int) -> bool:
+        '''
+        Returns whether every change to a table's version in "TableVersion" from since to until was committed through this
+        pool's writer, rather than by another process such as an import or another worker
+
+        Parameter:
+        table: str -> The name of the table
+        since: int -> The version the caller last read
+        until: int -> The version the caller reads now
+
+        Return:
+        Returns True if every change was written through this pool
+        '''
+        return self._writer.wrote(table, since, until)
+
+    def close(self) -> None:
+        '''
+        Stops the writer and closes every idle connection in the pool. Connections that are still lent out are closed when they are returned.
+        '''
+        self._closed = True
+        self._writer.close()
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            conn.close()
+
+#===========================================================================================================================================
+
+#Returned by QueryCache.lookup when the key is not cached, since None is a valid cached result
+_NOTFOUND = object()
+
+class QueryCache:
+    """
+    A bounded, thread-safe LRU cache with a time-to-live, shared by the collections of one database.
+    Every entry is tagged with the rows and tables it was read from, so a write can evict exactly the entries it affects.
+    Tags are tuples: (table,) for any change to a table, (table, column, value) for the rows with that value,
+    and (table, "+") for a new key appearing in a table.
+    Attributes:
+    (-) maxsize: int -> The maximum number of entries kept.
+    (-) ttl: float -> Seconds an entry stays valid after it was stored.
+    (-) maxbytes: int -> The most bytes the entries may take up, as measured by sizeof, or None for no limit.
+    (-) sizeof: Callable -> Returns the number of bytes a value takes up, when maxbytes is set.
+    (+) hits: int -> The number of lookups answered from the cache.
+    (+) misses: int -> The number of lookups that had to go to the database.
+    (+) evictions: int -> The number of entries dropped to stay within maxsize and maxbytes.
+    (+) invalidations: int -> The number of entries dropped because a write touched them.
+    Methods:
+    (+) lookup(key) -> Returns the cached value, or _NOTFOUND, along with a token to hand back to put.
+
+    (+) put(key, value, tags, token) -> Caches a value, unless a write happened since the token was issued.
+
+    (+) invalidate(tags) -> Drops every entry carrying any of the tags.
+
+    (+) invalidate_tables(tables) -> Drops every entry read from any of the tables.
+
+    (+) subscribe(callback) -> Calls callback(tags) after every invalidation, for derived data kept outside the cache.
+
+    (+) record() -> Collects the tags of every value the calling thread looks up or stores inside a with block.
+
+    (+) clear() -> Drops every entry.
+
+    (+) stats() -> Returns the hit and miss counters.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, maxbytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._maxbytes = maxbytes
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._tagged = {}
+        self._generation = 0
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _discard(self, key: Any) -> None:
+        '''
+        A helper function that removes an entry and unlinks it from its tags. The caller must hold the lock.
+        '''
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[3]
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def lookup(self, key: Any) -> tuple[Any, int]:
+        '''
+        Looks up a cached value
+
+        Parameter:
+        key: Any -> The hashable key the value was stored under
+
+        Return:
+        Returns (value, token). value is _NOTFOUND on a miss, and token must be passed to self.put when caching the reloaded value.
+        '''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._recorded(entry[2])
+                    return entry[1], self._generation
+                self._discard(key)
+            self.misses += 1
+            return _NOTFOUND, self._generation
+
+    def put(self, key: Any, value: Any, tags: set, token: int) -> None:
+        '''
+        Caches a value read from the database. If any write was invalidated after the token was issued, the value
+        may already be stale and is not cached.
+
+        Parameter:
+        key: Any -> The hashable key to store the value under
+        value: Any -> The value to cache
+        tags: set -> The tags of the rows and tables the value was read from
+        token: int -> The token returned by the self.lookup that missed
+        '''
+        self._recorded(tags)
+        size = self._sizeof(value) if self._maxbytes is not None and self._sizeof is not None else 0
+        with self._lock:
+            #a value bigger than the whole cache would only evict everything else
+            if token != self._generation or (self._maxbytes is not None and size > self._maxbytes):
+                return
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self._ttl, value, tags, size)
+            self._bytes += size
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self._maxsize or (self._maxbytes is not None and self._bytes > self._maxbytes):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags: Iterable[tuple]) -> None:
+        '''
+        Drops every entry carrying any of the given tags
+
+        Parameter:
+        tags: Iterable[tuple] -> The tags of the rows and tables that a write changed
+        '''
+        tags = set(tags)
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tagged.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(tags)
+
+    def invalidate_tables(self, tables: Iterable[str]) -> None:
+        '''
+        Drops every entry read from any of the given tables, for changes made where their rows are not known, such as by
+        another process. Subscribers are called with a (table,) tag for each table.
+
+        Parameter:
+        tables: Iterable[str] -> The names of the tables that changed
+        '''
+        tables = set(tables)
+        with self._lock:
+            self._generation += 1
+            for tag in [tag for tag in self._tagged if tag[0] in tables]:
+                for key in list(self._tagged.get(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback({(table,) for table in tables})
+
+    def subscribe(self, callback: Callable[[set], None]) -> None:
+        '''
+        Registers a function that is called with the invalidated tags after every write, so data derived from the
+        database outside of the cache can be marked stale too
+
+        Parameter:
+        callback: Callable -> Called as callback(tags) from the thread that made the write
+        '''
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def _recorded(self, tags: set) -> None:
+        '''
+        A helper function that adds the tags of a value looked up or stored to the calling thread's recording, if it has one
+        '''
+        recording = getattr(self._local, "tags", None)
+        if recording is not None:
+            recording |= tags
+
+    @contextmanager
+    def record(self) -> Iterator[set]:
+        '''
+        Collects the tags of every value the calling thread looks up or stores inside the with block, so something derived
+        from several cached reads, such as a rendered page, can be tagged with every row and table it depends on.
+        Recordings can be nested, and an inner recording's tags are added to the outer one.
+
+        Return:
+        Returns the set the tags are collected into
+        '''
+        outer = getattr(self._local, "tags", None)
+        tags = self._local.tags = set()
+        try:
+            yield tags
+        finally:
+            self._local.tags = outer
+            if outer is not None:
+                outer |= tags
+
+    def clear(self) -> None:
+        '''
+        Drops every entry
+        '''
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tagged.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        '''
+        Returns the cache's counters, for tuning maxsize and ttl
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self._maxsize,
+                "bytes": self._bytes,
+                "maxbytes": self._maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+def _copy(value: Any) -> Any:
+    '''
+    Copies a cached record, list of records or page of nested records, so callers can never modify what is in the cache
+    '''
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+def _arguments(method: Callable) -> Callable[[Any, tuple, dict], tuple]:
+    '''
+    A helper function that returns a function normalizing the arguments of a call to a collection method into one positional
+    tuple with every default filled in, so find(key), find(key, ["*"]) and find(key, columns=["*"]) are the same call
+    '''
+    signature = inspect.signature(method)
+    defaults = tuple(parameter.default for parameter in list(signature.parameters.values())[1:])
+
+    def normalize(self, args: tuple, kwargs: dict) -> tuple:
+        #positional calls are the common case, so they skip binding as long as the defaults can fill in the rest
+        if not kwargs and len(args) <= len(defaults):
+            missing = defaults[len(args):]
+            if inspect.Parameter.empty not in missing:
+                return args + missing
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        return bound.args[1:]
+    return normalize
+
+def cached(tagger: Callable[..., set]) -> Callable:
+    '''
+    Decorates a query method of a collection so that its result is read through the collection's QueryCache.
+
+    Parameter:
+    tagger: Callable -> Called as tagger(self, result, *args) to get the tags of the rows and tables the result was read from,
+                        with every argument passed positionally and every default filled in
+    '''
+    def decorator(method: Callable) -> Callable:
+        normalize = _arguments(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._cache is None:
+                return method(self, *args, **kwargs)
+            args = normalize(self, args, kwargs)
+            key = (self._tblname, method.__name__) + tuple(tuple(arg) if isinstance(arg, list) else arg for arg in args)
+            result, token = self._cache.lookup(key)
+            if result is _NOTFOUND:
+                result = method(self, *args)
+                self._cache.put(key, _copy(result), tagger(self, result, *args), token)
+            return _copy(result)
+        return wrapper
+    return decorator
+
+def timed(method: Callable) -> Callable:
+    '''
+    Decorates a collection method that queries the database so the time its queries take is reported to the observers of
+    the collection's pool, under the method's own name. It goes below cached, so answers served from the cache are not counted.
+    '''
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        observers = self._pool._observers
+        if not observers:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _observe(observers, self._tblname, name, time.perf_counter() - start)
+    return wrapper
+
+def _observe(observers: list, table: str, method: str, seconds: float) -> None:
+    '''
+    A helper function that reports how long a collection method's queries took to every observer
+    '''
+    for callback in observers:
+        callback(table, method, seconds)
+
+def _resulttags(result: Optional[list[dict] | dict], tblname: str, column: str) -> set:
+    '''
+    A helper function that returns a tag for each row of a table that a join result was read from
+
+    Parameter:
+    result: list[dict] | dict -> The result of the join, or None if it was empty
+    tblname: str -> The joined table
+    column: str -> The column of the result that holds the joined table's key
+    '''
+    if isinstance(result, dict):
+        result = [result]
+    return {(tblname, "id", record[column]) for record in result or ()}
+
+def invalidates(tagger: Callable[..., set]) -> Callable:
+    '''
+    Decorates a write method of a collection so that a successful write evicts the cache entries it affects.
+
+    Parameter:
+    tagger: Callable -> Called as tagger(self, *args) to get the tags of the rows and tables the write changes, with every
+                        argument passed positionally and every default filled in
+    '''
+    def decorator(method: Callable) -> Callable:
+        normalize = _arguments(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            args = normalize(self, args, kwargs)
+            success = method(self, *args)
+            if success and self._cache is not None:
+                self._cache.invalidate(tagger(self, *args))
+            return success
+        return wrapper
+    return decorator
+
+#===========================================================================================================================================
+
+class Statements:
+    """
+    A registry of the SQL statements of one table. Each statement is generated once from the table's column schema and the
+    same string is reused on every call, so sqlite3's statement cache keeps it prepared on every pooled connection.
+    Attributes:
+    (-) tblname: str -> The name of the table the statements run against.
+    (-) columns: tuple -> The columns of the table, which projected column names are checked against.
+    (-) builders: dict -> The functions that generate each named statement.
+    (-) built: dict -> The statements generated so far, keyed by name and projection.
+    Methods:
+    (+) define(name, build) -> Registers the function that generates a named statement.
+
+    (+) projection(columns) -> Checks column names against the schema and returns them quoted and joined.
+
+    (+) get(name, columns, build) -> Returns the SQL of a named statement, generating it on first use.
+    """
+
+    def __init__(self, tblname: str, columns: tuple) -> None:
+        self._tblname = tblname
+        self._columns = columns
+        self._builders = {}
+        self._built = {}
+
+    def define(self, name: str, build: Callable[..., str]) -> None:
+        '''
+        Registers the function that generates a named statement
+
+        Parameter:
+        name: str -> The name the statement is looked up by
+        build: Callable -> Returns the SQL. Statements that select a projection are passed the quoted, joined column list.
+        '''
+        self._builders[name] = build
+
+    def projection(self, columns: Iterable[str]) -> str:
+        '''
+        Checks projected column names against the table's schema, so they never reach the SQL unquoted.
+
+        Parameter:
+        columns: Iterable[str] -> The column names to select, or ["*"] for every column
+
+        Return:
+        Returns the quoted columns joined with commas
+        '''
+        columns = list(columns)
+        if columns == ["*"]:
+            return "*"
+        if not columns:
+            raise ValueError(f'No columns selected from "{self._tblname}".')
+        for column in columns:
+            if column not in self._columns:
+                raise ValueError(f'"{self._tblname}" has no column {column!r}.')
+        return ','.join(f'"{column}"' for column in columns)
+
+    def get(self, name: Any, columns: Optional[Iterable[str]] = None, build: Optional[Callable[..., str]] = None) -> str:
+        '''
+        Returns the SQL of a named statement, generating it the first time it is asked for
+
+        Parameter:
+        name: Any -> The hashable name of the statement
+        columns: Iterable[str] -> The projection of statements that select columns, or None for the rest
+        build: Callable -> Generates the statement if it has not been registered with self.define
+
+        Return:
+        Returns the SQL of the statement
+        '''
+        key = (name, tuple(columns) if columns is not None else None)
+        query = self._built.get(key)
+        if query is None:
+            build = build if build is not None else self._builders[name]
+            query = build(self.projection(columns)) if columns is not None else build()
+            self._built[key] = query
+        return query
+
+#===========================================================================================================================================
+
+class Record(tuple):
+    """
+    A compact, read-only row of a query result. A record is the tuple of the row's values and has no per-row dictionary,
+    but it can be read the same way as the dictionaries the rest of the code returns: record["name"], record.get(name),
+    record.keys(), record.values() and record.items(). Like sqlite3.Row, iterating over a record yields its values.
+    Record types are generated once for every set of column names by record_type.
+    Attributes:
+    (-) fields: tuple -> The column names returned by keys() and items(), in order.
+    (-) index: dict -> Maps every column name to the position of its value. Hidden columns such as "_cursor" are indexed
+                       but are not part of fields.
+    Methods:
+    (+) keys() -> Returns the column names.
+
+    (+) values() -> Returns the values of the columns, in the same order.
+
+    (+) items() -> Returns (column name, value) pairs.
+
+    (+) get(name, default) -> Returns the value of a column, or default if the record has no such column.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+
+    def __getitem__(self, name: str | int) -> Any:
+        if isinstance(name, str):
+            return tuple.__getitem__(self, self._index[name])
+        return tuple.__getitem__(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._fields
+
+    def __repr__(self) -> str:
+        return f'Record({", ".join(f"{name}={value!r}" for name, value in self.items())})'
+
+    def get(self, name: str, default: Any = None) -> Any:
+        '''
+        Returns the value of a column, or default if the record has no such column
+        '''
+        index = self._index.get(name)
+        return tuple.__getitem__(self, index) if index is not None else default
+
+    def keys(self) -> tuple:
+        '''
+        Returns the column names of the record
+        '''
+        return self._fields
+
+    def values(self) -> tuple:
+        '''
+        Returns the values of the record's columns, in the same order as self.keys
+        '''
+        return self[:len(self._fields)]
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        '''
+        Returns (column name, value) pairs, in the same order as self.keys
+        '''
+        return zip(self._fields, self)
+
+@functools.lru_cache(maxsize=256)
+def record_type(names: tuple[str, ...]) -> type:
+    '''
+    Generates the Record subclass for rows with the given column names. A trailing "_cursor" column is kept in the record
+    so a Page can read it, but is left out of the record's keys.
+
+    Parameter:
+    names: tuple[str, ...] -> The column names of the query, in order
+
+    Return:
+    Returns a Record subclass that is built from a tuple of the row's values
+    '''
+    fields = names[:-1] if names and names[-1] == "_cursor" else names
+    return type("Record", (Record,), {
+        "__slots__": (),
+        "_fields": fields,
+        "_index": {name: index for index, name in enumerate(names)},
+    })
+
+#===========================================================================================================================================
+
+class Page:
+    """
+    One page of an ordered listing. Records are streamed from the cursor as the page is iterated,
+    and the cursors of the neighbouring pages are known once iteration has finished.
+    Attributes:
+    (-) rows: Iterator[dict] -> The rows of the page, each holding its ordering key under "_cursor".
+    (-) limit: int -> The maximum number of records on the page, or None for the rest of the listing.
+    (-) after: str -> The cursor the page starts after, or None.
+    (-) before: str -> The cursor the page ends before, or None. The rows then arrive in reverse order.
+    (+) prev: str -> The cursor to pass as before= to get the previous page, or None on the first page or an empty page.
+    (+) next: str -> The cursor to pass as after= to get the next page, or None on the last page or an empty page.
+    Methods:
+    (+) __iter__() -> Yields the records of the page as dictionaries, or as Records if the listing is compact.
+    """
+
+    def __init__(self, rows: Iterator[dict], limit: Optional[int], after: Optional[str], before: Optional[str]) -> None:
+        self._rows = rows
+        self._limit = limit
+        self._after = after
+        self._before = before
+        self.prev = None
+        self.next = None
+
+    def __iter__(self) -> Iterator[dict]:
+        rows = self._rows
+        if self._before is not None:
+            #a backwards page is read in reverse, so it has to be collected before it can be put back in order
+            rows = list(rows)
+            more = self._limit is not None and len(rows) > self._limit
+            rows = rows[:self._limit][::-1]
+        else:
+            more = False
+
+        first = last = None
+        count = 0
+        for row in rows:
+            if self._before is None and self._limit is not None and count == self._limit:
+                more = True
+                break
+            last = row.pop("_cursor") if isinstance(row, dict) else row["_cursor"]
+            if first is None:
+                first = last
+            count += 1
+            yield row
+        self._rows.close()
+
+        if first is None:
+            #a cursor past either end of the listing gives an empty page, which has no neighbours to link to
+            self.prev = self.next = None
+        elif self._before is not None:
+            self.prev = first if more else None
+            self.next = last
+        else:
+            self.prev = first if self._after is not None else None
+            self.next = last if more else None
+
+#===========================================================================================================================================
 
 class Collection:
     """
@@ -8,6 +1037,12 @@ class Collection:
     (-) dbname: str -> The name of the database.
     (-) tblname: str -> The name of the table that the class is using.
     (-) key: str -> Primary key for query in the table
+    (-) pool: ConnectionPool -> The connection pool used to reach the database.
+    (-) columns: tuple -> The columns of the table, in the order a record's values are stored.
+    (-) foreignkeys: tuple -> The columns that reference other tables.
+    (-) cache: QueryCache -> The read-through cache shared by the collections, or None to always query the database.
+    (-) statements: Statements -> The registry that generates each of the collection's SQL statements once.
+    (-) summary: tuple -> The trigger-maintained summary table of the collection and the counts of a record it has no row for, or None.
     Methods:
     (+) insert(record) -> Inserts a record into the collection, after checking whether it is present.
     
@@ -15,16 +1050,70 @@ class Collection:
     
     (+) find(key) -> Finds the record with a matching key and returns a copy of it.
 
+    (+) find_many(keys) -> Finds the records with any of the given keys, in one query per chunk of keys.
+
+    (+) summary(key) -> Returns the trigger-maintained counts of the record with a matching key.
+
+    (+) summary_many(keys) -> Returns the trigger-maintained counts of the records with any of the given keys.
+
     (+) findall() -> Returns all the records in the table from the database.
 
+    (+) findpage(after, before, limit) -> Returns one page of the records in the table, using the key as a cursor.
+
+    (+) iterfind() -> Streams the records in the table in batches, without loading the whole table into memory.
+
     (+) delete(key) -> Deletes the record with a matching key.
+
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(keys) -> Deletes many records in one transaction per chunk and reports the outcome of each.
     """
-    def __init__(self, dbname: str, tblname: str, key: str) -> None:
+    def __init__(self, dbname: str, tblname: str, key: str, pool: Optional[ConnectionPool] = None, columns: tuple = (),
+                 foreignkeys: tuple = (), cache: Optional[QueryCache] = None, summary: Optional[tuple[str, dict]] = None) -> None:
         self._dbname = dbname
         self._tblname = tblname
         self._key = key
-
-    def _executedql(self, query: str, type: str, params: tuple) -> Optional[sqlite3.Row]:
+        self._columns = columns
+        self._foreignkeys = foreignkeys
+        self._cache = cache
+        self._summary = summary
+        self._pool = pool if pool is not None else ConnectionPool(dbname)
+        self._statements = Statements(tblname, columns)
+        self._define_statements()
+
+    def _define_statements(self) -> None:
+        '''
+        A helper function that registers the statements every collection shares, generated from the table's columns
+        '''
+        table = f'"{self._tblname}"'
+        key = f'"{self._key}"'
+        placeholders = ','.join('?' * len(self._columns))
+        assignments = ', '.join(f'"{column}" = ?' for column in self._columns)
+
+        self._statements.define("find", lambda projection: f'''SELECT {projection} FROM {table}
+                    WHERE {key} = ?;''')
+        self._statements.define("findall", lambda projection: f'''SELECT {projection} FROM {table}
+                    ORDER BY ABS({key}), {key};''')
+        self._statements.define("iterfind", lambda projection: f'''SELECT {projection}, {key} as "_cursor" FROM {table}''')
+        #the insert is skipped by sqlite if the key already exists
+        self._statements.define("insert", lambda: f'''INSERT INTO {table}
+                    VALUES ({placeholders})
+                    ON CONFLICT({key}) DO NOTHING;''')
+        self._statements.define("insert_many", lambda: f'''INSERT INTO {table}
+                    VALUES ({placeholders});''')
+        self._statements.define("update", lambda: f'''UPDATE {table}
+                    SET {assignments}
+                    WHERE {key} = ?;''')
+        self._statements.define("delete", lambda: f'''DELETE FROM {table}
+                    WHERE {key} = ?;''')
+        if self._summary is not None:
+            summary, counts = self._summary
+            self._statements.define("summary", lambda: f'''SELECT {', '.join(f'"{count}"' for count in counts)} FROM "{summary}"
+                    WHERE "id" = ?;''')
+
+    def _executedql(self, query: str, type: str, params: tuple, compact: bool = False) -> Optional[sqlite3.Row]:
         '''
         A helper function that is used by self.find and self.findall to execute the Data Query Language in sqlite3
 
@@ -32,13 +1121,15 @@ class Collection:
         query: str -> SQL query to execute
         type: str -> Specifies the type of Search Query to execute
         Params: tuple -> Parameterised values to be used in query
+        compact: bool -> Whether to return the rows as Records instead of sqlite3.Row
         
         Return:
         result: sqlite3.Row -> the sql query result based on the query and type provided.
         '''
-        with sqlite3.connect(self._dbname) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._pool.connection() as conn:
             cur = conn.cursor()
+            if compact:
+                cur.row_factory = None
             result = None
             #finding one entry in the table
             if type == 'one':
@@ -54,24 +1145,104 @@ class Collection:
                 cur.execute(query, params)
                 result = cur.fetchall()
 
-            #conn.close()
+            if compact and result is not None:
+                rowtype = record_type(tuple(column[0] for column in cur.description))
+                result = rowtype(result) if type == "one" else list(map(rowtype, result))
             return result
 
-    def _executedml(self, query: str, params: tuple) -> None:
+    def _iterdql(self, query: str, params: tuple | dict, batchsize: int = 500, compact: bool = False,
+                 label: Optional[str] = None) -> Iterator[dict | Record]:
+        '''
+        A helper function that streams the result of a Data Query Language query in batches instead of fetching it all at once.
+        The connection stays lent out until the generator is exhausted or closed. When a label is given, the time spent in
+        sqlite is reported to the pool's observers under it once the generator finishes, leaving out the time in between
+        batches that the caller spends on the rows.
+
+        Parameters:
+        query: str -> SQL query to execute
+        params: tuple | dict -> Parameterised values to be used in query
+        batchsize: int -> The number of rows fetched from sqlite at a time
+        compact: bool -> Whether to yield the rows as Records instead of dictionaries
+        label: str -> The name of the collection method the query is timed under, or None to leave it untimed
+
+        Return:
+        Yields each row of the result as a dictionary, or as a Record if compact is True
+        '''
+        start = time.perf_counter()
+        seconds = 0.0
+        with self._pool.connection(pin=False) as conn:
+            cur = conn.cursor()
+            if compact:
+                cur.row_factory = None
+            try:
+                cur.execute(query, params)
+                rowtype = record_type(tuple(column[0] for column in cur.description)) if compact else dict
+                while True:
+                    rows = cur.fetchmany(batchsize)
+                    seconds += time.perf_counter() - start
+                    if not rows:
+                        break
+                    yield from map(rowtype, rows)
+                    start = time.perf_counter()
+            finally:
+                cur.close()
+                if label is not None and self._pool._observers:
+                    _observe(self._pool._observers, self._tblname, label, seconds)
+
+    def _executedml(self, query: str, params: tuple | dict) -> int:
         '''
         A helper function used to execute by self.insert, self.update, self.delete to execute Data Manipulation Lanaguage in sqlite3
 
         Parameter:
         query: str -> sqlite3 query to be executed
-        params: tuple -> Paramterised values to be used in the query
+        params: tuple | dict -> Paramterised values to be used in the query
+
+        Return:
+        rowcount: int -> the number of rows the statement changed
         '''
-        with sqlite3.connect(self._dbname) as conn:
+        def work(conn: sqlite3.Connection) -> int:
             cur = conn.cursor()
             cur.execute(query, params)
-            conn.commit()
-            #conn.close()
-        return
+            return cur.rowcount
+
+        return self._pool.write(work)
+
+    def _rowtags(self, key: str, record: Optional[dict] = None) -> set:
+        '''
+        A helper function that returns the cache tags a write to one record affects
+
+        Parameter:
+        key: str -> The key of the record before the write
+        record: dict -> The record after the write, or None if it was deleted
+
+        Return:
+        Returns the set of tags to invalidate
+        '''
+        tags = {(self._tblname,), (self._tblname, self._key, key)}
+        if record is not None:
+            values = dict(zip(self._columns, record.values()))
+            if values.get(self._key, key) != key:
+                tags.add((self._tblname, self._key, values[self._key]))
+                tags.add((self._tblname, "+"))
+            for column in self._foreignkeys:
+                tags.add((self._tblname, column, values.get(column)))
+        return tags
+
+    def _inserttags(self, record: dict) -> set:
+        '''
+        A helper function that returns the cache tags an insert affects
+        '''
+        key = dict(zip(self._columns, record.values())).get(self._key)
+        return self._rowtags(key, record) | {(self._tblname, "+")}
 
+    def _invalidate(self, tags: set) -> None:
+        '''
+        A helper function that evicts the cache entries affected by a write, if the collection has a cache
+        '''
+        if self._cache is not None and tags:
+            self._cache.invalidate(tags)
+
+    @timed
     def insert(self, record: dict) -> bool:
         '''
         Inserts a record into the collection, after checking whether it is present.
@@ -85,6 +1256,7 @@ class Collection:
     
         raise NotImplementedError
     
+    @timed
     def update(self, key: str, record: dict) -> bool:
         '''
         Updates the record with the matching name, by replacing its elements with the given record.
@@ -98,6 +1270,8 @@ class Collection:
         '''
         raise NotImplementedError
     
+    @cached(lambda self, result, key, columns=["*"]: {(self._tblname, self._key, key)})
+    @timed
     def find(self, key: str, columns: list[str] = ["*"]) -> Optional[dict]:
         '''
         Finds the record with a matching key and returns a copy of it.
@@ -109,34 +1283,121 @@ class Collection:
         Return:
         Returns the record of the entity in the form of a dictionary if found, else returns None
         '''
-        querycolumns = ','.join(columns)
-        query = f'''
-                SELECT {querycolumns} FROM "{self._tblname}"
-                WHERE "{self._key}" =?;
-        '''
+        query = self._statements.get("find", columns)
         result = self._executedql(query, "one", (key,))
         if result is not None:
             return dict(result)
         else:
             return None
 
-    def findall(self, columns: list[str] = ["*"]) -> Optional[list[dict]]:
+    def _loaddetail(self, query: str, key: str, parts: dict[str, str]) -> Optional[dict]:
+        '''
+        A helper function used by the viewdetail loaders. The query selects the record along with JSON sub-aggregates of
+        everything joined to it, so the whole page is read by one statement and can never mix rows from before and after a write.
+
+        Parameters:
+        query: str -> SQL query that selects the record's columns followed by the JSON columns
+        key: str -> Primary key of the record
+        parts: dict[str, str] -> Maps each JSON column of the query to the name it is returned under
+
+        Return:
+        Returns a dictionary holding the "record" and every part, with empty lists returned as None, or None if the record does not exist
+        '''
+        result = self._executedql(query, "one", (key,))
+        if result is None:
+            return None
+        record = dict(result)
+        detail = {"record": record}
+        for column, name in parts.items():
+            value = record.pop(column)
+            value = json.loads(value) if value is not None else None
+            detail[name] = value if value != [] else None
+        return detail
+
+    @timed
+    def find_many(self, keys: Iterable[str], columns: list[str] = ["*"]) -> dict[str, dict]:
+        '''
+        Finds the records with any of the given keys, in one query per chunk of keys instead of one query per key.
+
+        Parameter:
+        keys: Iterable[str] -> Primary keys of the records to find. Keys that are repeated are only looked up once.
+        columns: list[str] -> Argument used to select which columns in a table to be returned. Defaults to returning all column in a table.
+
+        Return:
+        Returns a dictionary mapping the key of every record that was found to a copy of the record. Keys that are not found are left out.
+        '''
+        found = {}
+        with self._pool.connection() as conn:
+            for chunk in _chunked(set(keys), _LOOKUP_SIZE):
+                chunk = _padded(chunk)
+                query = self._statements.get(("find_many", len(chunk)), columns, build = lambda projection: f'''
+                        SELECT {projection}, "{self._key}" as "_key" FROM "{self._tblname}"
+                        WHERE "{self._key}" IN ({','.join('?' * len(chunk))});''')
+                for row in conn.execute(query, chunk):
+                    record = dict(row)
+                    found[record.pop("_key")] = record
+        return found
+
+    @timed
+    def summary(self, key: str) -> dict:
+        '''
+        Returns the counts the summary triggers keep for a record, which is one primary key lookup however many rows
+        the counts are made up of
+
+        Parameter:
+        key: str -> Primary key of the record
+
+        Return:
+        Returns a dictionary of the record's counts. A record that nothing refers to, or that does not exist, has counts of zero.
+        '''
+        if self._summary is None:
+            raise ValueError(f'"{self._tblname}" has no summary table.')
+        result = self._executedql(self._statements.get("summary"), "one", (key,))
+        return dict(result) if result is not None else dict(self._summary[1])
+
+    @timed
+    def summary_many(self, keys: Iterable[str]) -> dict[str, dict]:
+        '''
+        Returns the counts the summary triggers keep for many records, in one query per chunk of keys
+
+        Parameter:
+        keys: Iterable[str] -> Primary keys of the records
+
+        Return:
+        Returns a dictionary mapping every key to the counts of its record, the same as self.summary
+        '''
+        if self._summary is None:
+            raise ValueError(f'"{self._tblname}" has no summary table.')
+        summary, counts = self._summary
+        found = {key: dict(counts) for key in keys}
+        with self._pool.connection() as conn:
+            for chunk in _chunked(found, _LOOKUP_SIZE):
+                chunk = _padded(chunk)
+                query = self._statements.get(("summary_many", len(chunk)), build = lambda: f'''
+                        SELECT "id" as "_key", {', '.join(f'"{count}"' for count in counts)} FROM "{summary}"
+                        WHERE "id" IN ({','.join('?' * len(chunk))});''')
+                for row in conn.execute(query, chunk):
+                    record = dict(row)
+                    found[record.pop("_key")] = record
+        return found
+
+    @timed
+    def findall(self, columns: list[str] = ["*"], compact: bool = False) -> Optional[list[dict]]:
         '''
         Finds all entities in the table
 
         Parameter:
         columns: list[str] -> Argument used to select which columns in a table to be returned. Defaults to returning all column in a table.
+        compact: bool -> Returns the entities as Records, which take far less memory than dictionaries for large tables
 
         Return:
         Returns a list of dictionary storing all entities in the table if the table is not empty, else return None
         '''
-        querycolumns = ','.join(columns)
-        query = f'''
-                SELECT {querycolumns} FROM "{self._tblname}"
-                ORDER BY ABS("{self._key}");
-        '''
-        result = self._executedql(query, "many", (None,))
+        query = self._statements.get("findall", columns)
+        result = self._executedql(query, "many", (None,), compact)
 
+        if compact:
+            return result if result != [] else None
         if result != []:
             lst = []
             for record in result:
@@ -144,8 +1405,92 @@ class Collection:
             return lst
         else:
             return None
-        
 
+    def _page(self, select: str, keycolumn: str, after: Optional[str], before: Optional[str], limit: Optional[int], batchsize: int = 500,
+              compact: bool = False, label: Optional[str] = None) -> Page:
+        '''
+        A helper function used by the paginated queries to stream one page of a listing ordered by ABS(key), key.
+        The cursor is the key of the row the page starts after (or ends before), so the query seeks straight to it on
+        the ordering index and the cost does not grow with how deep the page is.
+
+        Parameters:
+        select: str -> SELECT ... FROM ... clause of the listing, which must select keycolumn as "_cursor"
+        keycolumn: str -> The quoted key column the listing is ordered by
+        after: str -> Key of the last row of the previous page, or None
+        before: str -> Key of the first row of the next page, or None
+        limit: int -> The maximum number of records on the page, or None for the rest of the listing
+        batchsize: int -> The number of rows fetched from sqlite at a time
+        compact: bool -> Whether the page yields Records instead of dictionaries
+        label: str -> The name of the collection method the query is timed under
+
+        Return:
+        Returns a Page that streams the records when iterated
+        '''
+        if before is not None:
+            direction, cursor = "before", before
+        elif after is not None:
+            direction, cursor = "after", after
+        else:
+            direction, cursor = "first", None
+
+        def build() -> str:
+            if direction == "before":
+                condition = f'''WHERE ABS({keycolumn}) <= ABS(:cursor)
+                             AND (ABS({keycolumn}), {keycolumn}) < (ABS(:cursor), :cursor)
+                           ORDER BY ABS({keycolumn}) DESC, {keycolumn} DESC'''
+            elif direction == "after":
+                condition = f'''WHERE ABS({keycolumn}) >= ABS(:cursor)
+                             AND (ABS({keycolumn}), {keycolumn}) > (ABS(:cursor), :cursor)
+                           ORDER BY ABS({keycolumn}), {keycolumn}'''
+            else:
+                condition = f'''ORDER BY ABS({keycolumn}), {keycolumn}'''
+            return f'''{select}
+                    {condition}
+                    LIMIT :limit;'''
+
+        query = self._statements.get(("page", direction, select, keycolumn), build = build)
+        #one row more than the page is fetched to find out whether there is another page after it
+        params = {"cursor": cursor, "limit": limit + 1 if limit is not None else -1}
+        return Page(self._iterdql(query, params, batchsize, compact, label), limit, after, before)
+
+    def iterfind(self, columns: list[str] = ["*"], after: Optional[str] = None, before: Optional[str] = None,
+                 limit: Optional[int] = None, batchsize: int = 500, compact: bool = False) -> Page:
+        '''
+        Streams the entities in the table in the same order as self.findall, without holding the whole table in memory
+
+        Parameter:
+        columns: list[str] -> Argument used to select which columns in a table to be returned. Defaults to returning all column in a table.
+        after: str -> Starts after the record with this key
+        before: str -> Ends before the record with this key
+        limit: int -> The maximum number of records to stream. Defaults to the rest of the table.
+        batchsize: int -> The number of rows fetched from sqlite at a time
+        compact: bool -> Yields Records instead of dictionaries
+
+        Return:
+        Returns a Page that yields each record as a dictionary when iterated
+        '''
+        select = self._statements.get("iterfind", columns)
+        return self._page(select, f'"{self._key}"', after, before, limit, batchsize, compact, "iterfind")
+
+    def findpage(self, columns: list[str] = ["*"], after: Optional[str] = None, before: Optional[str] = None, limit: int = 50) -> dict:
+        '''
+        Finds one page of the entities in the table, in the same order as self.findall
+
+        Parameter:
+        columns: list[str] -> Argument used to select which columns in a table to be returned. Defaults to returning all column in a table.
+        after: str -> Returns the page that starts after the record with this key
+        before: str -> Returns the page that ends before the record with this key
+        limit: int -> The maximum number of records on the page
+
+        Return:
+        Returns a dictionary holding the page's "records" and the "next" and "prev" cursors, which are None at either end
+        '''
+        page = self.iterfind(columns, after, before, limit)
+        records = list(page)
+        return {"records": records, "prev": page.prev, "next": page.next}
+
+    @invalidates(lambda self, key: self._rowtags(key))
+    @timed
     def delete(self, key: str) -> bool:
         '''
         Deletes the record with a matching key
@@ -156,15 +1501,161 @@ class Collection:
         Return:
         returns True if the record has been successfully deleted and False otherwise
         '''
-        if self.find(key) is not None:
-            query = f'''DELETE FROM "{self._tblname}" 
-                    WHERE "{self._key}" = ?;
-                    '''
-            params = (key,)
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        params = (key,)
+        return self._executedml(self._statements.get("delete"), params) > 0
+
+    def _textkeys(self, record: Any) -> Any:
+        '''
+        A helper function used by the bulk methods to convert the key of a record to text, leaving malformed records to be rejected later
+        '''
+        if not isinstance(record, dict) or len(record) != len(self._columns):
+            return record
+        return {name: _textkey(value) if column == self._key else value
+                for (name, value), column in zip(record.items(), self._columns)}
+
+    def _existing(self, conn: sqlite3.Connection, keys: list) -> set:
+        '''
+        A helper function used by the bulk methods to find which of the given keys are already in the table
+
+        Parameter:
+        conn: sqlite3.Connection -> the connection to query on, so the lookup is part of the caller's transaction
+        keys: list -> the primary keys to look up
+
+        Return:
+        Returns the set of keys that were found
+        '''
+        found = set()
+        for chunk in _chunked(set(keys), _LOOKUP_SIZE):
+            chunk = _padded(chunk)
+            query = self._statements.get(("existing", len(chunk)), build = lambda: f'''SELECT "{self._key}" FROM "{self._tblname}"
+                        WHERE "{self._key}" IN ({','.join('?' * len(chunk))});''')
+            found.update(row[0] for row in conn.execute(query, chunk))
+        return found
+
+    @timed
+    def insert_many(self, records: Iterable[dict], chunksize: int = 500) -> list[str]:
+        '''
+        Inserts many records, committing one transaction per chunk instead of one per record.
+
+        Parameter:
+        records: Iterable[dict] -> The records to insert, each laid out the same way as for self.insert
+        chunksize: int -> The number of records written per transaction
+
+        Return:
+        Returns a list with one outcome per record, in order: INSERTED, DUPLICATE if the key already exists, or FAILED
+        if the record is malformed or rejected by the database
+        '''
+        query = self._statements.get("insert_many")
+        keyindex = self._columns.index(self._key)
+
+        def work(conn: sqlite3.Connection, chunk: list[dict]) -> list[str]:
+            rows = []
+            for record in chunk:
+                params = tuple(record.values()) if isinstance(record, dict) else ()
+                rows.append(params if len(params) == len(self._columns) else None)
+            existing = self._existing(conn, [row[keyindex] for row in rows if row is not None])
+
+            outcomes = []
+            pending = []
+            for row in rows:
+                if row is None:
+                    outcomes.append(FAILED)
+                elif row[keyindex] in existing:
+                    outcomes.append(DUPLICATE)
+                else:
+                    existing.add(row[keyindex])
+                    outcomes.append(None)
+                    pending.append(row)
+
+            applied = iter(_executemany_or_each(conn, query, pending))
+            return [outcome or (INSERTED if next(applied) else FAILED) for outcome in outcomes]
+
+        outcomes = []
+        for chunk in _chunked(records, chunksize):
+            chunk = [self._textkeys(record) for record in chunk]
+            applied = self._pool.write(lambda conn: work(conn, chunk))
+            self._invalidate(set().union(*(self._inserttags(record)
+                                           for record, outcome in zip(chunk, applied) if outcome == INSERTED)))
+            outcomes.extend(applied)
+        return outcomes
+
+    @timed
+    def update_many(self, changes: Iterable[tuple[str, dict]], chunksize: int = 500) -> list[str]:
+        '''
+        Updates many records, committing one transaction per chunk instead of one per record.
+
+        Parameter:
+        changes: Iterable[tuple[str, dict]] -> (key, record) pairs, laid out the same way as the arguments of self.update
+        chunksize: int -> The number of records written per transaction
+
+        Return:
+        Returns a list with one outcome per change, in order: UPDATED, MISSING if no record has the key, or FAILED
+        if the record is malformed or rejected by the database
+        '''
+        query = self._statements.get("update")
+
+        def work(conn: sqlite3.Connection, chunk: list[tuple]) -> list[str]:
+            existing = self._existing(conn, [key for key, record in chunk])
+            outcomes = []
+            pending = []
+            for key, record in chunk:
+                params = tuple(record.values()) if isinstance(record, dict) else ()
+                if len(params) != len(self._columns):
+                    outcomes.append(FAILED)
+                elif key not in existing:
+                    outcomes.append(MISSING)
+                else:
+                    outcomes.append(None)
+                    pending.append((*params, key))
+
+            applied = iter(_executemany_or_each(conn, query, pending))
+            return [outcome or (UPDATED if next(applied) else FAILED) for outcome in outcomes]
+
+        outcomes = []
+        for chunk in _chunked(changes, chunksize):
+            chunk = [(_textkey(key), self._textkeys(record)) for key, record in chunk]
+            applied = self._pool.write(lambda conn: work(conn, chunk))
+            self._invalidate(set().union(*(self._rowtags(key, record)
+                                           for (key, record), outcome in zip(chunk, applied) if outcome == UPDATED)))
+            outcomes.extend(applied)
+        return outcomes
+
+    @timed
+    def delete_many(self, keys: Iterable[str], chunksize: int = 500) -> list[str]:
+        '''
+        Deletes many records, committing one transaction per chunk instead of one per record.
+
+        Parameter:
+        keys: Iterable[str] -> Primary keys of the records to delete
+        chunksize: int -> The number of records deleted per transaction
+
+        Return:
+        Returns a list with one outcome per key, in order: DELETED, or MISSING if no record has the key
+        '''
+        query = self._statements.get("delete")
+
+        def work(conn: sqlite3.Connection, chunk: list[str]) -> list[str]:
+            existing = self._existing(conn, chunk)
+            outcomes = []
+            pending = []
+            for key in chunk:
+                if key in existing:
+                    existing.discard(key)
+                    outcomes.append(DELETED)
+                    pending.append((key,))
+                else:
+                    outcomes.append(MISSING)
+            conn.executemany(query, pending)
+            return outcomes
+
+        outcomes = []
+        for chunk in _chunked(keys, chunksize):
+            chunk = [_textkey(key) for key in chunk]
+            applied = self._pool.write(lambda conn: work(conn, chunk))
+            self._invalidate(set().union(*(self._rowtags(key)
+                                           for key, outcome in zip(chunk, applied) if outcome == DELETED)))
+            outcomes.extend(applied)
+        return outcomes
 
 #===========================================================================================================================================
 
@@ -183,10 +1674,26 @@ class StudentCollection(Collection):
     
     (+) find(key) -> Finds the record with a matching key and returns a copy of it.
 
+    (+) find_many(keys) -> Finds the records with any of the given keys, in one query per chunk of keys.
+
+    (+) summary(key) -> Returns the number of activities and total hours of the student with a matching key
+
+    (+) summary_many(keys) -> Returns the same counts for many records, in one query per chunk of keys
+
     (+) findall() -> Returns all the records in the table from the database.
 
+    (+) findpage(after, before, limit) -> Returns one page of the records in the table, using the key as a cursor.
+
+    (+) iterfind() -> Streams the records in the table in batches, without loading the whole table into memory.
+
     (+) delete(key) -> Deletes the record with a matching key.
 
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(keys) -> Deletes many records in one transaction per chunk and reports the outcome of each.
+
     (+) viewactivity(key) -> Returns all activities a given student is involved in
     
     (+) viewclass(key) -> Returns all class info a given student is in
@@ -194,39 +1701,27 @@ class StudentCollection(Collection):
     (+) viewcca(key) -> Return all cca info a given student is in
 
     (+) viewall() -> Returns all information about student and their class
+
+    (+) viewpage(after, before, limit) -> Returns one page of the information about student and their class
+
+    (+) iter_viewall() -> Streams the information about student and their class in batches
+
+    (+) viewdetail(key) -> Returns a student along with their class, activities and ccas, read in one statement
     """
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "Student"
-        super().__init__(self._dbname, self._tblname, "id")
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "id" TEXT UNIQUE,
-                "name" TEXT,
-                "student_age" INT,
-                "year_enrolled" INT,
-                "graduating_year" INT,
-                "class_id" TEXT,
-                Primary Key("id")
-                Foreign Key("class_id") REFERENCES Class("id")
-                );'''
-
-                
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        self._columns = ("id", "name", "student_age", "year_enrolled", "graduating_year", "class_id")
+        self._foreignkeys = ("class_id",)
+        super().__init__(self._dbname, self._tblname, "id", pool, self._columns, self._foreignkeys, cache,
+                         summary = ("StudentSummary", {"activities": 0, "hours": 0.0}))
 
+    @invalidates(lambda self, record: self._inserttags(record))
+    @timed
     def insert(self, record) -> bool:
         '''
-        Inserts a record into the collection, after checking whether it is present.
+        Inserts a record into the collection if no record with the same key is present, in a single statement.
 
         Parameter:
         record: dict -> A dictionary containing the record of the entity to be added to the database
@@ -236,17 +1731,11 @@ class StudentCollection(Collection):
 
         '''
 
-        #checking if the record already exists
-        if self.find(record[self._key]) is None:
-            params = tuple(record.values())
-            query = f'''
-                    INSERT INTO "{self._tblname}"
-                    VALUES (?,?,?,?,?,?);
-                    '''
-            self._executedml(query,params)
-            return True
-        else:
-            return False
+        #the insert is skipped by sqlite if the key already exists
+        params = tuple(record.values())
+        return self._executedml(self._statements.get("insert"), params) == 1
+    @invalidates(lambda self, key, record: self._rowtags(key, record))
+    @timed
     def update(self, key: str, record: dict) -> bool:
         '''
         Updates the record with the matching name, by replacing its elements with the given record.
@@ -259,22 +1748,12 @@ class StudentCollection(Collection):
         Returns True if the record has successfully been added, False otherwise
         '''
 
-        if self.find(key) is not None:
-            params = (*tuple(record.values()), key)
-            query = f'''UPDATE "{self._tblname}"
-                    SET "{self._key}" = ?,
-                        "name" = ?,
-                        "student_age" = ?,
-                        "year_enrolled" = ?,
-                        "graduating_year" = ?,
-                        "class_id" = ?
-                    WHERE {self._key} = ?;
-            '''
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        params = (*tuple(record.values()), key)
+        return self._executedml(self._statements.get("update"), params) > 0
 
+    @cached(lambda self, result, key: {("Student", "id", key), ("StudentActivity", "student_id", key), ("Activity", "+")}
+                                            | _resulttags(result, "Activity", "activity_id"))
+    @timed
     def viewactivity(self, key: str) -> Optional[list[dict]]:
         '''
         Views all of the activities of the record with the matching name.
@@ -286,7 +1765,7 @@ class StudentCollection(Collection):
         Returns a list of dictionary for the activities that the student took part in if they exists, else return None
         '''
 
-        query = f'''SELECT "Activity"."id" as "activity_id",
+        query = self._statements.get("viewactivity", build = lambda: f'''SELECT "Activity"."id" as "activity_id",
                            "Activity"."name" as "activity_name",
                            "Activity"."start_date" as "start_date",
                            "Activity"."end_date" as "end_date",
@@ -297,8 +1776,8 @@ class StudentCollection(Collection):
                     INNER JOIN "Activity"
                         ON "StudentActivity"."activity_id" = "Activity"."id"
                     WHERE "Student"."id" = ?                  
-                    ORDER BY ABS("Activity"."id");
-                '''
+                    ORDER BY ABS("Activity"."id"), "Activity"."id";
+                ''')
         result = self._executedql(query, "join", (key,))
         if result != []:
             lst = []
@@ -308,6 +1787,8 @@ class StudentCollection(Collection):
         else:
             return None
 
+    @cached(lambda self, result, key: {("Student", "id", key), ("Class", "+")} | _resulttags(result, "Class", "class_id"))
+    @timed
     def viewclass(self, key: str) -> Optional[dict]:
         '''
         Returns all class info a given student is in
@@ -319,19 +1800,22 @@ class StudentCollection(Collection):
         Returns the class of the given student if it exists, else returns None
         '''
 
-        query = f'''
+        query = self._statements.get("viewclass", build = lambda: f'''
                 SELECT "Class"."id" as "class_id", "Class"."name" as "class_name"
                 FROM "{self._tblname}"
                 INNER JOIN "Class"
                         ON "Class"."id" = "{self._tblname}"."class_id" 
                 WHERE "{self._tblname}"."{self._key}" = ?;
-                '''
+                ''')
         result = self._executedql(query, "one", (key,))
         if result is not None:
             return dict(result)
         else:
             return None
             
+    @cached(lambda self, result, key: {("Student", "id", key), ("StudentCCA", "student_id", key), ("CCA", "+")}
+                                            | _resulttags(result, "CCA", "CCA_id"))
+    @timed
     def viewcca(self, key: str) -> Optional[str]:
         '''
         Returns all cca info a given student is in
@@ -343,7 +1827,7 @@ class StudentCollection(Collection):
         Returns the ccas of the given student if it exists, else returns None
         '''
 
-        query = f'''
+        query = self._statements.get("viewcca", build = lambda: f'''
                 SELECT "CCA"."id" as "CCA_id", "CCA"."name" as "CCA_name"
                 FROM "StudentCCA"
                 INNER JOIN "{self._tblname}"
@@ -351,8 +1835,8 @@ class StudentCollection(Collection):
                 INNER JOIN "CCA"
                        ON "StudentCCA"."cca_id" = "CCA"."id"
                 WHERE "{self._tblname}"."{self._key}" = ?
-                ORDER BY ABS("CCA"."id");
-                '''
+                ORDER BY ABS("CCA"."id"), "CCA"."id";
+                ''')
         result = self._executedql(query, "join", (key,))
         if result != []:
             lst = []
@@ -362,34 +1846,132 @@ class StudentCollection(Collection):
         else:
             return None
 
-    def viewall(self) -> Optional[dict]:
+    @timed
+    def viewall(self, compact: bool = False) -> Optional[dict]:
         '''
         Returns all info about every student
+
+        Parameter:
+        compact: bool -> Returns the students as Records, which take far less memory than dictionaries
         '''
 
-        query = f'''
-                SELECT "{self._tblname}"."id" as "student_id",
-                       "{self._tblname}"."name" as "student_name", 
-                       "{self._tblname}"."student_age" as "student_age", 
-                       "{self._tblname}"."year_enrolled" as "student_year_enrolled", 
-                       "{self._tblname}"."graduating_year" as "student_graduating_year", 
-                       "Class"."id" as "class_id",
-                       "Class"."name" as "class_name"
-                FROM "{self._tblname}"
-                INNER JOIN "Class"
-                       ON "Class"."id" = "Student"."class_id" 
-                ORDER BY ABS("{self._tblname}"."{self._key}");
-                '''
-        result = self._executedql(query, "many", (None,))
+        query = self._statements.get("viewall", build = lambda: f'''
+                SELECT "{self._tblname}"."id" as "student_id",
+                       "{self._tblname}"."name" as "student_name", 
+                       "{self._tblname}"."student_age" as "student_age", 
+                       "{self._tblname}"."year_enrolled" as "student_year_enrolled", 
+                       "{self._tblname}"."graduating_year" as "student_graduating_year", 
+                       "Class"."id" as "class_id",
+                       "Class"."name" as "class_name"
+                FROM "{self._tblname}"
+                INNER JOIN "Class"
+                       ON "Class"."id" = "Student"."class_id" 
+                ORDER BY ABS("{self._tblname}"."{self._key}"), "{self._tblname}"."{self._key}";
+                ''')
+        result = self._executedql(query, "many", (None,), compact)
+
+        if compact:
+            return result if result != [] else None
+        if result != []:
+            lst = []
+            for record in result:
+                lst.append(dict(record))
+            return lst
+        else:
+            return None
+
+    def iter_viewall(self, after: Optional[str] = None, before: Optional[str] = None, limit: Optional[int] = None, batchsize: int = 500,
+                     compact: bool = False) -> Page:
+        '''
+        Streams the info about every student in the same order as self.viewall, without holding every student in memory
+
+        Parameter:
+        after: str -> Starts after the student with this id
+        before: str -> Ends before the student with this id
+        limit: int -> The maximum number of students to stream. Defaults to the rest of the students.
+        batchsize: int -> The number of rows fetched from sqlite at a time
+        compact: bool -> Yields Records instead of dictionaries
+
+        Return:
+        Returns a Page that yields each student as a dictionary when iterated
+        '''
+        select = self._statements.get("iter_viewall", build = lambda: f'''
+                SELECT "{self._tblname}"."id" as "student_id",
+                       "{self._tblname}"."name" as "student_name", 
+                       "{self._tblname}"."student_age" as "student_age", 
+                       "{self._tblname}"."year_enrolled" as "student_year_enrolled", 
+                       "{self._tblname}"."graduating_year" as "student_graduating_year", 
+                       "Class"."id" as "class_id",
+                       "Class"."name" as "class_name",
+                       "{self._tblname}"."{self._key}" as "_cursor"
+                FROM "{self._tblname}"
+                INNER JOIN "Class"
+                       ON "Class"."id" = "Student"."class_id"''')
+        return self._page(select, f'"{self._tblname}"."{self._key}"', after, before, limit, batchsize, compact, "iter_viewall")
+
+    def viewpage(self, after: Optional[str] = None, before: Optional[str] = None, limit: int = 50) -> dict:
+        '''
+        Returns one page of the info about every student, in the same order as self.viewall
+
+        Parameter:
+        after: str -> Returns the page that starts after the student with this id
+        before: str -> Returns the page that ends before the student with this id
+        limit: int -> The maximum number of students on the page
+
+        Return:
+        Returns a dictionary holding the page's "records" and the "next" and "prev" cursors, which are None at either end
+        '''
+        page = self.iter_viewall(after, before, limit)
+        records = list(page)
+        return {"records": records, "prev": page.prev, "next": page.next}
+
+    @cached(lambda self, result, key: {("Student", "id", key), ("Class", "+"), ("StudentActivity", "student_id", key), ("Activity", "+"),
+                     ("StudentCCA", "student_id", key), ("CCA", "+")}
+                    | _resulttags(result and result["class"], "Class", "class_id")
+                    | _resulttags(result and result["activities"], "Activity", "activity_id")
+                    | _resulttags(result and result["ccas"], "CCA", "CCA_id"))
+    @timed
+    def viewdetail(self, key: str) -> Optional[dict]:
+        '''
+        Returns a student along with the class, activities and ccas that /view/student shows, read in one statement
+
+        Parameter:
+        key: str -> used to identify the original entity
+
+        Return:
+        Returns a dictionary holding the "record", "class", "activities" and "ccas" of the student, in the same form as self.find,
+        self.viewclass, self.viewactivity and self.viewcca, or None if the student does not exist
+        '''
+        query = self._statements.get("viewdetail", build = lambda: f'''SELECT "{self._tblname}".*,
+                           (SELECT json_object('class_id', "Class"."id", 'class_name', "Class"."name")
+                            FROM "Class"
+                            WHERE "Class"."id" = "{self._tblname}"."class_id") as "_class",
+                           (SELECT json_group_array(json_object('activity_id', "activity_id",
+                                                       'activity_name', "activity_name",
+                                                       'start_date', "start_date",
+                                                       'end_date', "end_date",
+                                                       'hours', "hours"))
+                            FROM (SELECT "Activity"."id" as "activity_id",
+                                         "Activity"."name" as "activity_name",
+                                         "Activity"."start_date" as "start_date",
+                                         "Activity"."end_date" as "end_date",
+                                         "Activity"."hours" as "hours"
+                                  FROM "StudentActivity"
+                                  INNER JOIN "Activity"
+                                      ON "StudentActivity"."activity_id" = "Activity"."id"
+                                  WHERE "StudentActivity"."student_id" = "{self._tblname}"."{self._key}"
+                                  ORDER BY ABS("Activity"."id"), "Activity"."id")) as "_activities",
+                           (SELECT json_group_array(json_object('CCA_id', "CCA_id", 'CCA_name', "CCA_name"))
+                            FROM (SELECT "CCA"."id" as "CCA_id", "CCA"."name" as "CCA_name"
+                                  FROM "StudentCCA"
+                                  INNER JOIN "CCA"
+                                      ON "StudentCCA"."cca_id" = "CCA"."id"
+                                  WHERE "StudentCCA"."student_id" = "{self._tblname}"."{self._key}"
+                                  ORDER BY ABS("CCA"."id"), "CCA"."id")) as "_ccas"
+                    FROM "{self._tblname}"
+                    WHERE "{self._tblname}"."{self._key}" = ?;''')
+        return self._loaddetail(query, key, {"_class": "class", "_activities": "activities", "_ccas": "ccas"})
 
-        if result != []:
-            lst = []
-            for record in result:
-                lst.append(dict(record))
-            return lst
-        else:
-            return None
-        
 #===========================================================================================================================================
 
 class ClassCollection(Collection):
@@ -407,39 +1989,43 @@ class ClassCollection(Collection):
     
     (+) find(key) -> Finds the record with a matching key and returns a copy of it.
 
+    (+) find_many(keys) -> Finds the records with any of the given keys, in one query per chunk of keys.
+
+    (+) summary(key) -> Returns the number of students in the class with a matching key
+
+    (+) summary_many(keys) -> Returns the same counts for many records, in one query per chunk of keys
+
     (+) findall() -> Returns all the records in the table from the database.
 
+    (+) findpage(after, before, limit) -> Returns one page of the records in the table, using the key as a cursor.
+
+    (+) iterfind() -> Streams the records in the table in batches, without loading the whole table into memory.
+
     (+) delete(key) -> Deletes the record with a matching key.
 
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(keys) -> Deletes many records in one transaction per chunk and reports the outcome of each.
+
     (+) viewstudent(key) -> Returns all the records of student from a class
+
+    (+) viewdetail(key) -> Returns a class along with its students, read in one statement
     """
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "Class"
-        super().__init__(self._dbname, self._tblname, "id")
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "id" TEXT UNIQUE,
-                "name" TEXT,
-                "level" TEXT,
-                Primary Key("id")
-                );'''
-                
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        self._columns = ("id", "name", "level")
+        super().__init__(self._dbname, self._tblname, "id", pool, self._columns, cache = cache,
+                         summary = ("ClassSummary", {"students": 0}))
 
+    @invalidates(lambda self, record: self._inserttags(record))
+    @timed
     def insert(self, record) -> bool:
         '''
-        Inserts a record into the collection, after checking whether it is present.
+        Inserts a record into the collection if no record with the same key is present, in a single statement.
 
         Parameter:
         record: dict -> A dictionary containing the record of the entity to be added to the database
@@ -449,17 +2035,11 @@ class ClassCollection(Collection):
 
         '''
 
-        #checking if the record already exists
-        if self.find(record[self._key]) is None:
-            params = tuple(record.values())
-            query = f'''
-                    INSERT INTO "{self._tblname}"
-                    VALUES (?,?,?);
-                    '''
-            self._executedml(query,params)
-            return True
-        else:
-            return False
+        #the insert is skipped by sqlite if the key already exists
+        params = tuple(record.values())
+        return self._executedml(self._statements.get("insert"), params) == 1
+    @invalidates(lambda self, key, record: self._rowtags(key, record))
+    @timed
     def update(self, key: str, record: dict) -> bool:
         '''
         Updates the record with the matching name, by replacing its elements with the given record.
@@ -472,19 +2052,12 @@ class ClassCollection(Collection):
         Returns True if the record has successfully been added, False otherwise
         '''
 
-        if self.find(key) is not None:
-            params = (*tuple(record.values()), key)
-            query = f'''UPDATE "{self._tblname}"
-                    SET "{self._key}" = ?,
-                        "name" = ?,
-                        "level" = ?
-                    WHERE {self._key} = ?;
-            '''
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        params = (*tuple(record.values()), key)
+        return self._executedml(self._statements.get("update"), params) > 0
             
+    @cached(lambda self, result, key: {("Class", "id", key), ("Student", "class_id", key)}
+                                            | _resulttags(result, "Student", "student_id"))
+    @timed
     def viewstudent(self, key: str) -> Optional[list[dict]]:
         '''
         Views all the student record with the matching class id.
@@ -495,15 +2068,15 @@ class ClassCollection(Collection):
         Return:
         Returns a list of dictionary for the students that are in a class if they exists, else return None
         '''
-        query = f'''SELECT "Student"."id" as "student_id",
+        query = self._statements.get("viewstudent", build = lambda: f'''SELECT "Student"."id" as "student_id",
                            "Student"."name" as "student_name",
                            "{self._tblname}"."name" as "class"
                     FROM "{self._tblname}"
                     INNER JOIN "Student"
                         ON "{self._tblname}"."{self._key}" = "Student"."class_id" 
                     WHERE "{self._tblname}"."{self._key}" = ?
-                    ORDER BY ABS("Student"."id");                    
-                '''
+                    ORDER BY ABS("Student"."id"), "Student"."id";                    
+                ''')
         result = self._executedql(query, "join", (key,))
         if result != []:
             lst = []
@@ -512,7 +2085,35 @@ class ClassCollection(Collection):
             return lst
         else:
             return None
-        
+
+    @cached(lambda self, result, key: {("Class", "id", key), ("Student", "class_id", key)}
+                    | _resulttags(result and result["students"], "Student", "student_id"))
+    @timed
+    def viewdetail(self, key: str) -> Optional[dict]:
+        '''
+        Returns a class along with the students that /view/class shows, read in one statement
+
+        Parameter:
+        key: str -> used to identify the original entity
+
+        Return:
+        Returns a dictionary holding the "record" and "students" of the class, in the same form as self.find and
+        self.viewstudent, or None if the class does not exist
+        '''
+        query = self._statements.get("viewdetail", build = lambda: f'''SELECT "{self._tblname}".*,
+                           (SELECT json_group_array(json_object('student_id', "student_id",
+                                                       'student_name', "student_name",
+                                                       'class', "class"))
+                            FROM (SELECT "Student"."id" as "student_id",
+                                         "Student"."name" as "student_name",
+                                         "{self._tblname}"."name" as "class"
+                                  FROM "Student"
+                                  WHERE "Student"."class_id" = "{self._tblname}"."{self._key}"
+                                  ORDER BY ABS("Student"."id"), "Student"."id")) as "_students"
+                    FROM "{self._tblname}"
+                    WHERE "{self._tblname}"."{self._key}" = ?;''')
+        return self._loaddetail(query, key, {"_students": "students"})
+
 #===========================================================================================================================================
 
 class SubjectCollection(Collection):
@@ -530,37 +2131,34 @@ class SubjectCollection(Collection):
     
     (+) find(key) -> Finds the record with a matching key and returns a copy of it.
 
+    (+) find_many(keys) -> Finds the records with any of the given keys, in one query per chunk of keys.
+
     (+) findall() -> Returns all the records in the table from the database.
 
+    (+) findpage(after, before, limit) -> Returns one page of the records in the table, using the key as a cursor.
+
+    (+) iterfind() -> Streams the records in the table in batches, without loading the whole table into memory.
+
     (+) delete(key) -> Deletes the record with a matching key.
+
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(keys) -> Deletes many records in one transaction per chunk and reports the outcome of each.
     """
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "Subject"
-        super().__init__(self._dbname, self._tblname, "id")
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "id" TEXT UNIQUE,
-                "name" TEXT,
-                "level" TEXT,
-                Primary Key("id")
-                );'''
-                
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        self._columns = ("id", "name", "level")
+        super().__init__(self._dbname, self._tblname, "id", pool, self._columns, cache = cache)
 
+    @invalidates(lambda self, record: self._inserttags(record))
+    @timed
     def insert(self, record) -> bool:
         '''
-        Inserts a record into the collection, after checking whether it is present.
+        Inserts a record into the collection if no record with the same key is present, in a single statement.
 
         Parameter:
         record: dict -> A dictionary containing the record of the entity to be added to the database
@@ -570,18 +2168,12 @@ class SubjectCollection(Collection):
 
         '''
 
-        #checking if the record already exists
-        if self.find(record[self._key]) is None:
-            params = tuple(record.values())
-            query = f'''
-                    INSERT INTO "{self._tblname}"
-                    VALUES (?,?,?);
-                    '''
-            self._executedml(query,params)
-            return True
-        else:
-            return False
+        #the insert is skipped by sqlite if the key already exists
+        params = tuple(record.values())
+        return self._executedml(self._statements.get("insert"), params) == 1
             
+    @invalidates(lambda self, key, record: self._rowtags(key, record))
+    @timed
     def update(self, key: str, record: dict) -> bool:
         '''
         Updates the record with the matching name, by replacing its elements with the given record.
@@ -594,18 +2186,8 @@ class SubjectCollection(Collection):
         Returns True if the record has successfully been added, False otherwise
         '''
 
-        if self.find(key) is not None:
-            params = (*tuple(record.values()), key)
-            query = f'''UPDATE "{self._tblname}"
-                    SET "{self._key}" = ?,
-                        "name" = ?,
-                        "level" = ?
-                    WHERE {self._key} = ?;
-            '''
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        params = (*tuple(record.values()), key)
+        return self._executedml(self._statements.get("update"), params) > 0
 
 
 #===========================================================================================================================================
@@ -624,42 +2206,45 @@ class CCACollection(Collection):
     
     (+) find(key) -> Finds the record with a matching key and returns a copy of it.
 
+    (+) find_many(keys) -> Finds the records with any of the given keys, in one query per chunk of keys.
+
+    (+) summary(key) -> Returns the number of students and activities of the CCA with a matching key
+
+    (+) summary_many(keys) -> Returns the same counts for many records, in one query per chunk of keys
+
     (+) findall() -> Returns all the records in the table from the database.
 
+    (+) findpage(after, before, limit) -> Returns one page of the records in the table, using the key as a cursor.
+
+    (+) iterfind() -> Streams the records in the table in batches, without loading the whole table into memory.
+
     (+) delete(key) -> Deletes the record with a matching key.
 
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(keys) -> Deletes many records in one transaction per chunk and reports the outcome of each.
+
     (+) viewstudent(key) -> Returns all the records of students with a matching CCA
 
     (+) viewactivity(key) -> Returns all the records of activity with a matching CCA
+
+    (+) viewdetail(key) -> Returns a CCA along with its students and activities, read in one statement
     """
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "CCA"
-        super().__init__(self._dbname, self._tblname, "id")
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "id" TEXT UNIQUE,
-                "name" TEXT,
-                "type" TEXT,
-                Primary Key("id")
-                );'''
-                
-                
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        self._columns = ("id", "name", "type")
+        super().__init__(self._dbname, self._tblname, "id", pool, self._columns, cache = cache,
+                         summary = ("CCASummary", {"students": 0, "activities": 0}))
 
+    @invalidates(lambda self, record: self._inserttags(record))
+    @timed
     def insert(self, record) -> bool:
         '''
-        Inserts a record into the collection, after checking whether it is present.
+        Inserts a record into the collection if no record with the same key is present, in a single statement.
 
         Parameter:
         record: dict -> A dictionary containing the record of the entity to be added to the database
@@ -669,17 +2254,11 @@ class CCACollection(Collection):
 
         '''
 
-        #checking if the record already exists
-        if self.find(record[self._key]) is None:
-            params = tuple(record.values())
-            query = f'''
-                    INSERT INTO "{self._tblname}"
-                    VALUES (?,?,?);
-                    '''
-            self._executedml(query,params)
-            return True
-        else:
-            return False
+        #the insert is skipped by sqlite if the key already exists
+        params = tuple(record.values())
+        return self._executedml(self._statements.get("insert"), params) == 1
+    @invalidates(lambda self, key, record: self._rowtags(key, record))
+    @timed
     def update(self, key: str, record: dict) -> bool:
         '''
         Updates the record with the matching name, by replacing its elements with the given record.
@@ -692,19 +2271,12 @@ class CCACollection(Collection):
         Returns True if the record has successfully been added, False otherwise
         '''
 
-        if self.find(key) is not None:
-            params = (*tuple(record.values()), key)
-            query = f'''UPDATE "{self._tblname}"
-                    SET "{self._key}" = ?,
-                        "name" = ?,
-                        "type" = ?
-                    WHERE {self._key} = ?;
-            '''
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        params = (*tuple(record.values()), key)
+        return self._executedml(self._statements.get("update"), params) > 0
 
+    @cached(lambda self, result, key: {("CCA", "id", key), ("StudentCCA", "cca_id", key), ("Student", "+"), ("Class",)}
+                                            | _resulttags(result, "Student", "student_id"))
+    @timed
     def viewstudent(self, key: str) -> Optional[list[dict]]:
         '''
         Views all the student records with a matching CCA
@@ -716,7 +2288,7 @@ class CCACollection(Collection):
         Returns a list of dictionary for the students that are in a CCA if they exists, else return None
         '''
 
-        query = f'''SELECT "Student"."id" as "student_id",
+        query = self._statements.get("viewstudent", build = lambda: f'''SELECT "Student"."id" as "student_id",
                            "Student"."name" as "student_name",
                            "Class"."name" as "class"
                     FROM "StudentCCA"
@@ -727,8 +2299,8 @@ class CCACollection(Collection):
                     INNER JOIN "Class"
                         ON "Student"."class_id" = "Class"."id"
                     WHERE "{self._tblname}"."{self._key}" = ?
-                    ORDER BY ABS("Student"."id");
-                '''
+                    ORDER BY ABS("Student"."id"), "Student"."id";
+                ''')
         result = self._executedql(query, "join", (key,))
         if result != []:
             lst = []
@@ -737,6 +2309,9 @@ class CCACollection(Collection):
             return lst
         else:
             return None
+    @cached(lambda self, result, key: {("CCA", "id", key), ("Activity", "cca_id", key)}
+                                            | _resulttags(result, "Activity", "activity_id"))
+    @timed
     def viewactivity(self, key: str) -> Optional[list[dict]]:
         '''
         Views all of the activity records with a matching CCA 
@@ -748,7 +2323,7 @@ class CCACollection(Collection):
         Returns a list of dictionary for the activities that this CCA has organised, else return None
         '''
 
-        query = f'''SELECT "Activity"."id" as "activity_id",
+        query = self._statements.get("viewactivity", build = lambda: f'''SELECT "Activity"."id" as "activity_id",
                            "Activity"."name" as "activity_name",
                            "Activity"."start_date" as "start_date",
                            "Activity"."end_date" as "end_date",
@@ -757,8 +2332,8 @@ class CCACollection(Collection):
                            INNER JOIN "Activity"
                                ON "Activity"."cca_id" = "{self._tblname}"."{self._key}"
                             WHERE "{self._tblname}"."{self._key}" = ?
-                            ORDER BY ABS("Activity"."id");
-        '''
+                            ORDER BY ABS("Activity"."id"), "Activity"."id";
+        ''')
         result = self._executedql(query, "join", (key,))
         if result != []:
             lst = []
@@ -767,6 +2342,53 @@ class CCACollection(Collection):
             return lst
         else:
             return None
+
+    @cached(lambda self, result, key: {("CCA", "id", key), ("StudentCCA", "cca_id", key), ("Student", "+"), ("Class",), ("Activity", "cca_id", key)}
+                    | _resulttags(result and result["students"], "Student", "student_id")
+                    | _resulttags(result and result["activities"], "Activity", "activity_id"))
+    @timed
+    def viewdetail(self, key: str) -> Optional[dict]:
+        '''
+        Returns a CCA along with the students and activities that /view/cca shows, read in one statement
+
+        Parameter:
+        key: str -> used to identify the original entity
+
+        Return:
+        Returns a dictionary holding the "record", "students" and "activities" of the CCA, in the same form as self.find,
+        self.viewstudent and self.viewactivity, or None if the CCA does not exist
+        '''
+        query = self._statements.get("viewdetail", build = lambda: f'''SELECT "{self._tblname}".*,
+                           (SELECT json_group_array(json_object('student_id', "student_id",
+                                                       'student_name', "student_name",
+                                                       'class', "class"))
+                            FROM (SELECT "Student"."id" as "student_id",
+                                         "Student"."name" as "student_name",
+                                         "Class"."name" as "class"
+                                  FROM "StudentCCA"
+                                  INNER JOIN "Student"
+                                      ON "StudentCCA"."student_id" = "Student"."id"
+                                  INNER JOIN "Class"
+                                      ON "Student"."class_id" = "Class"."id"
+                                  WHERE "StudentCCA"."cca_id" = "{self._tblname}"."{self._key}"
+                                  ORDER BY ABS("Student"."id"), "Student"."id")) as "_students",
+                           (SELECT json_group_array(json_object('activity_id', "activity_id",
+                                                       'activity_name', "activity_name",
+                                                       'start_date', "start_date",
+                                                       'end_date', "end_date",
+                                                       'hours', "hours"))
+                            FROM (SELECT "Activity"."id" as "activity_id",
+                                         "Activity"."name" as "activity_name",
+                                         "Activity"."start_date" as "start_date",
+                                         "Activity"."end_date" as "end_date",
+                                         "Activity"."hours" as "hours"
+                                  FROM "Activity"
+                                  WHERE "Activity"."cca_id" = "{self._tblname}"."{self._key}"
+                                  ORDER BY ABS("Activity"."id"), "Activity"."id")) as "_activities"
+                    FROM "{self._tblname}"
+                    WHERE "{self._tblname}"."{self._key}" = ?;''')
+        return self._loaddetail(query, key, {"_students": "students", "_activities": "activities"})
+
 #===========================================================================================================================================
 
 class ActivityCollection(Collection):
@@ -784,47 +2406,39 @@ class ActivityCollection(Collection):
     
     (+) find(key) -> Finds the record with a matching key and returns a copy of it.
 
+    (+) find_many(keys) -> Finds the records with any of the given keys, in one query per chunk of keys.
+
     (+) findall() -> Returns all the records in the table from the database.
 
+    (+) findpage(after, before, limit) -> Returns one page of the records in the table, using the key as a cursor.
+
+    (+) iterfind() -> Streams the records in the table in batches, without loading the whole table into memory.
+
     (+) delete(key) -> Deletes the record with a matching key.
 
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(keys) -> Deletes many records in one transaction per chunk and reports the outcome of each.
+
     (+) viewstudent(key) -> Returns all students given an activity
+
+    (+) viewdetail(key) -> Returns an activity along with its CCA and students, read in one statement
     """
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "Activity"
-        super().__init__(self._dbname, self._tblname, "id")
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "id" TEXT UNIQUE,
-                "name" TEXT,
-                "start_date" TEXT,
-                "end_date" TEXT,
-                "description" TEXT,
-                "category" TEXT,
-                "role" TEXT,
-                "award" TEXT,
-                "hours" INT,
-                "cca_id" TEXT,
-                Primary Key("id")
-                Foreign Key("cca_id") REFERENCES CCA("id")
-                );'''
-                
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        self._columns = ("id", "name", "start_date", "end_date", "description", "category", "role", "award", "hours", "cca_id")
+        self._foreignkeys = ("cca_id",)
+        super().__init__(self._dbname, self._tblname, "id", pool, self._columns, self._foreignkeys, cache)
 
+    @invalidates(lambda self, record: self._inserttags(record))
+    @timed
     def insert(self, record) -> bool:
         '''
-        Inserts a record into the collection, after checking whether it is present.
+        Inserts a record into the collection if no record with the same key is present, in a single statement.
 
         Parameter:
         record: dict -> A dictionary containing the record of the entity to be added to the database
@@ -834,17 +2448,11 @@ class ActivityCollection(Collection):
 
         '''
 
-        #checking if the record already exists
-        if self.find(record[self._key]) is None:
-            params = tuple(record.values())
-            query = f'''
-                    INSERT INTO "{self._tblname}"
-                    VALUES (?,?,?,?,?,?,?,?,?,?);
-                    '''
-            self._executedml(query,params)
-            return True
-        else:
-            return False
+        #the insert is skipped by sqlite if the key already exists
+        params = tuple(record.values())
+        return self._executedml(self._statements.get("insert"), params) == 1
+    @invalidates(lambda self, key, record: self._rowtags(key, record))
+    @timed
     def update(self, key: str, record: dict) -> bool:
         '''
         Updates the record with the matching name, by replacing its elements with the given record.
@@ -857,26 +2465,12 @@ class ActivityCollection(Collection):
         Returns True if the record has successfully been added, False otherwise
         '''
 
-        if self.find(key) is not None:
-            params = (*tuple(record.values()), key)
-            query = f'''UPDATE "{self._tblname}"
-                    SET "{self._key}" = ?,
-                        "name" = ?,
-                        "start_date" = ?,
-                        "end_date" = ?,
-                        "description" = ?,
-                        "category" = ?,
-                        "role" = ?,
-                        "award" = ?,
-                        "hours" = ?,
-                        "cca_id" = ?
-                    WHERE {self._key} = ?;
-            '''
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        params = (*tuple(record.values()), key)
+        return self._executedml(self._statements.get("update"), params) > 0
 
+    @cached(lambda self, result, key: {("Activity", "id", key), ("StudentActivity", "activity_id", key), ("Student", "+"), ("Class",)}
+                                            | _resulttags(result, "Student", "student_id"))
+    @timed
     def viewstudent(self, key: str) -> Optional[list[dict]]:
         '''
         Views all the student record with the matching activity name.
@@ -888,7 +2482,7 @@ class ActivityCollection(Collection):
         Returns a list of dictionary for the students that took part in an activity if they exists, else return None
         '''
 
-        query = f'''SELECT "Student"."id" as "student_id",
+        query = self._statements.get("viewstudent", build = lambda: f'''SELECT "Student"."id" as "student_id",
                            "Student"."name" as "student_name",
                            "Class"."name" as "class"
                     FROM "StudentActivity"
@@ -899,8 +2493,8 @@ class ActivityCollection(Collection):
                     INNER JOIN "Class"
                         ON "Student"."class_id" = "Class"."id"
                     WHERE "{self._tblname}"."{self._key}" = ?
-                    ORDER BY ABS("Student"."id");
-                '''
+                    ORDER BY ABS("Student"."id"), "Student"."id";
+                ''')
         result = self._executedql(query, "join", (key,))
         if result != []:
             lst = []
@@ -909,8 +2503,43 @@ class ActivityCollection(Collection):
             return lst
         else:
             return None
-        
-            
+
+    @cached(lambda self, result, key: {("Activity", "id", key), ("CCA", "+"), ("StudentActivity", "activity_id", key), ("Student", "+"), ("Class",)}
+                    | _resulttags(result and result["cca"], "CCA", "id")
+                    | _resulttags(result and result["students"], "Student", "student_id"))
+    @timed
+    def viewdetail(self, key: str) -> Optional[dict]:
+        '''
+        Returns an activity along with the CCA and students that /view/activity shows, read in one statement
+
+        Parameter:
+        key: str -> used to identify the original entity
+
+        Return:
+        Returns a dictionary holding the "record", "students" and "cca" of the activity, in the same form as self.find,
+        self.viewstudent and CCACollection.find(key, ["id", "name"]), or None if the activity does not exist
+        '''
+        query = self._statements.get("viewdetail", build = lambda: f'''SELECT "{self._tblname}".*,
+                           (SELECT json_group_array(json_object('student_id', "student_id",
+                                                       'student_name', "student_name",
+                                                       'class', "class"))
+                            FROM (SELECT "Student"."id" as "student_id",
+                                         "Student"."name" as "student_name",
+                                         "Class"."name" as "class"
+                                  FROM "StudentActivity"
+                                  INNER JOIN "Student"
+                                      ON "StudentActivity"."student_id" = "Student"."id"
+                                  INNER JOIN "Class"
+                                      ON "Student"."class_id" = "Class"."id"
+                                  WHERE "StudentActivity"."activity_id" = "{self._tblname}"."{self._key}"
+                                  ORDER BY ABS("Student"."id"), "Student"."id")) as "_students",
+                           (SELECT json_object('id', "CCA"."id", 'name', "CCA"."name")
+                            FROM "CCA"
+                            WHERE "CCA"."id" = "{self._tblname}"."cca_id") as "_cca"
+                    FROM "{self._tblname}"
+                    WHERE "{self._tblname}"."{self._key}" = ?;''')
+        return self._loaddetail(query, key, {"_students": "students", "_cca": "cca"})
+
 #===========================================================================================================================================
 
 class Junctiontable:
@@ -922,23 +2551,71 @@ class Junctiontable:
     (-) tblname: str -> The name of the junction table
     (-) leftkey: str -> The key of the left table in the junction table
     (-) rightkey: str -> The key of the right table in the junction table
+    (-) pool: ConnectionPool -> The connection pool used to reach the database
+    (-) cache: QueryCache -> The cache whose entries are evicted when the junction table changes, or None
+    (-) statements: Statements -> The registry that generates each of the junction table's SQL statements once
 
     Methods:
     (+) find(record) -> check if a certain record exists
+
+    (+) find_many(records) -> Returns which of the given records exist, in one query per chunk of records.
     
     (+) insert(record) -> Inserts a record into the junction table, after checking whether it is present.
 
     (+) update(old_record, new_record) -> Updates a record in the junction table, after checking whether it is present and if there are any conflicting records. 
 
     (+) delete(record) -> Delete a record in the junction table, after checking whether it is present.
+
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(records) -> Deletes many records in one transaction per chunk and reports the outcome of each.
     
     '''
 
-    def __init__(self, dbname: str, tblname: str, left_key: str, right_key: str):
+    def __init__(self, dbname: str, tblname: str, left_key: str, right_key: str, pool: Optional[ConnectionPool] = None,
+                 cache: Optional[QueryCache] = None):
         self._dbname = dbname
         self._tblname = tblname
         self._leftkey = left_key
         self._rightkey = right_key
+        self._pool = pool if pool is not None else ConnectionPool(dbname)
+        self._cache = cache
+        self._statements = Statements(tblname, (left_key, right_key))
+        self._define_statements()
+
+    def _define_statements(self) -> None:
+        '''
+        A helper function that registers the junction table's statements
+        '''
+        table = f'"{self._tblname}"'
+        left = f'"{self._leftkey}"'
+        right = f'"{self._rightkey}"'
+
+        self._statements.define("find", lambda: f'''SELECT 1 FROM {table}
+                    WHERE {left} = ? and {right} = ?;''')
+        #a single conditional statement, so two concurrent inserts of the same record cannot both succeed
+        self._statements.define("insert", lambda: f'''INSERT INTO {table}
+                    SELECT :left, :right
+                    WHERE NOT EXISTS (SELECT 1 FROM {table}
+                                      WHERE {left} = :left and {right} = :right);''')
+        self._statements.define("insert_many", lambda: f'''INSERT INTO {table}
+                    VALUES(?,?);''')
+        self._statements.define("update", lambda: f'''UPDATE {table}
+                    SET {left} = :new_left,
+                        {right} = :new_right
+                    WHERE {left} = :old_left and
+                          {right} = :old_right and
+                          NOT EXISTS (SELECT 1 FROM {table}
+                                      WHERE {left} = :new_left and {right} = :new_right);''')
+        self._statements.define("update_many", lambda: f'''UPDATE {table}
+                    SET {left} = ?,
+                        {right} = ?
+                    WHERE {left} = ? and
+                          {right} = ?;''')
+        self._statements.define("delete", lambda: f'''DELETE FROM {table}
+                    WHERE {left} = ? and {right} = ?;''')
 
     def _executedql(self, query: str, type: str, params: tuple) -> Optional[sqlite3.Row]:
         '''
@@ -952,8 +2629,7 @@ class Junctiontable:
         Return:
         result: sqlite3.Row -> the sql query result based on the query and type provided.
         '''
-        with sqlite3.connect(self._dbname) as conn:
-            conn.row_factory = sqlite3.Row
+        with self._pool.connection() as conn:
             cur = conn.cursor()
             result = None
             #finding one entry in the table
@@ -970,24 +2646,45 @@ class Junctiontable:
                 cur.execute(query, params)
                 result = cur.fetchall()
 
-            #conn.close()
             return result
 
-    def _executedml(self, query: str, params: tuple) -> None:
+    def _executedml(self, query: str, params: tuple | dict) -> int:
         '''
         A helper function used to execute by self.insert, self.update, self.delete to execute Data Manipulation Lanaguage in sqlite3
 
         Parameter:
         query: str -> sqlite3 query to be executed
-        params: tuple -> Paramterised values to be used in the query
+        params: tuple | dict -> Paramterised values to be used in the query
+
+        Return:
+        rowcount: int -> the number of rows the statement changed
         '''
-        with sqlite3.connect(self._dbname) as conn:
+        def work(conn: sqlite3.Connection) -> int:
             cur = conn.cursor()
             cur.execute(query, params)
-            conn.commit()
-            #conn.close()
-        return
+            return cur.rowcount
+
+        return self._pool.write(work)
 
+    def _pairtags(self, *records: dict) -> set:
+        '''
+        A helper function that returns the cache tags a write to the given (left, right) records affects
+        '''
+        tags = {(self._tblname,)} if records else set()
+        for record in records:
+            left, right = record.values()
+            tags.add((self._tblname, self._leftkey, left))
+            tags.add((self._tblname, self._rightkey, right))
+        return tags
+
+    def _invalidate(self, tags: set) -> None:
+        '''
+        A helper function that evicts the cache entries affected by a write, if the junction table has a cache
+        '''
+        if self._cache is not None and tags:
+            self._cache.invalidate(tags)
+
+    @timed
     def find(self, record: dict) -> bool:
         '''
         Checks if a certain record exists within the junction table given the record
@@ -998,15 +2695,29 @@ class Junctiontable:
         Return:
         Returns True if the record is found, False if it is not found
         '''
-        query = f'''SELECT * FROM {self._tblname}
-                    WHERE {self._leftkey} = ? and {self._rightkey} = ?;'''
         key = tuple(record.values())
-        result = self._executedql(query, "one", key)
+        result = self._executedql(self._statements.get("find"), "one", key)
         if result is not None:
             return True
         return False
 
+    @timed
+    def find_many(self, records: Iterable[dict]) -> set[tuple]:
+        '''
+        Checks which of the given records exist within the junction table, in one query per chunk of records instead of one per record
+
+        Parameter:
+        records: Iterable[dict] -> The records to be checked, each laid out the same way as for self.find
+
+        Return:
+        Returns the set of (left key, right key) pairs that were found
+        '''
+        pairs = [tuple(record.values()) for record in records]
+        with self._pool.connection() as conn:
+            return self._existing(conn, [pair for pair in pairs if len(pair) == 2])
 
+    @invalidates(lambda self, record: self._pairtags(record))
+    @timed
     def insert(self, record: dict) -> bool:
         '''
         Inserts a record into the collection, after checking whether it is present.
@@ -1017,16 +2728,11 @@ class Junctiontable:
         Return:
         Returns True if the record has successfully been added, False otherwise
         '''
-        if self.find(record) is not True:
-            query = f'''INSERT INTO "{self._tblname}"
-                        VALUES(?,?);'''
-    
-            params = tuple(record.values())
-            self._executedml(query, params)
-            return True
-        else:
-            return False
+        left, right = record.values()
+        return self._executedml(self._statements.get("insert"), {"left": left, "right": right}) == 1
         
+    @invalidates(lambda self, old_record, new_record: self._pairtags(old_record, new_record))
+    @timed
     def update(self, old_record: dict, new_record: dict) -> bool:
         '''
         Updates a record into the collection, after checking whether it is present and if there are any conflicting records.
@@ -1038,19 +2744,13 @@ class Junctiontable:
         Return:
         Returns True if the record has successfully been updated, False otherwise
         '''
-        if self.find(old_record) is True and self.find(new_record) is False:
-            values = tuple(new_record.values()) + tuple(old_record.values())
-            query = f'''UPDATE "{self._tblname}"
-                        SET "{self._leftkey}" = ?,
-                            "{self._rightkey}" = ?
-                        WHERE "{self._leftkey}" = ? and
-                              "{self._rightkey}" = ?;
-                        '''
-            self._executedml(query, values)
-            return True
-        else:
-            return False
+        old_left, old_right = old_record.values()
+        new_left, new_right = new_record.values()
+        values = {"old_left": old_left, "old_right": old_right, "new_left": new_left, "new_right": new_right}
+        return self._executedml(self._statements.get("update"), values) > 0
 
+    @invalidates(lambda self, record: self._pairtags(record))
+    @timed
     def delete(self, record: dict) -> bool:
         '''
         Updates a record into the collection, after checking whether it is present.
@@ -1063,15 +2763,165 @@ class Junctiontable:
         Returns True if the record has successfully been deleted, False otherwise
         '''
         
-        if self.find(record):
-            values = tuple(record.values())
-            query = f'''DELETE FROM "{self._tblname}"
-                        WHERE {self._leftkey} = ? and {self._rightkey} = ?;
-                        '''
-            self._executedml(query, values)
-            return True
-        else:
-            return False
+        values = tuple(record.values())
+        return self._executedml(self._statements.get("delete"), values) > 0
+
+    def _textkeys(self, record: Any) -> Any:
+        '''
+        A helper function used by the bulk methods to convert both keys of a record to text, leaving malformed records to be rejected later
+        '''
+        if not isinstance(record, dict):
+            return record
+        return {name: _textkey(value) for name, value in record.items()}
+
+    def _existing(self, conn: sqlite3.Connection, pairs: list[tuple]) -> set:
+        '''
+        A helper function used by the bulk methods to find which of the given (left, right) pairs are already in the table
+
+        Parameter:
+        conn: sqlite3.Connection -> the connection to query on, so the lookup is part of the caller's transaction
+        pairs: list[tuple] -> the (left key, right key) pairs to look up
+
+        Return:
+        Returns the set of pairs that were found
+        '''
+        found = set()
+        for chunk in _chunked(set(pairs), _LOOKUP_SIZE):
+            chunk = _padded(chunk)
+            #joining from the VALUES keeps one primary key lookup per pair, where a row-value IN (...) of this size is planned as a table scan
+            query = self._statements.get(("existing", len(chunk)), build = lambda: f'''SELECT "{self._tblname}"."{self._leftkey}", "{self._tblname}"."{self._rightkey}"
+                        FROM (VALUES {','.join(['(?,?)'] * len(chunk))}) as "pairs"
+                        INNER JOIN "{self._tblname}"
+                            ON "{self._tblname}"."{self._leftkey}" = "pairs"."column1" and "{self._tblname}"."{self._rightkey}" = "pairs"."column2";''')
+            params = [key for pair in chunk for key in pair]
+            found.update(tuple(row) for row in conn.execute(query, params))
+        return found
+
+    @timed
+    def insert_many(self, records: Iterable[dict], chunksize: int = 500) -> list[str]:
+        '''
+        Inserts many records, committing one transaction per chunk instead of one per record.
+
+        Parameter:
+        records: Iterable[dict] -> The records to insert, each laid out the same way as for self.insert
+        chunksize: int -> The number of records written per transaction
+
+        Return:
+        Returns a list with one outcome per record, in order: INSERTED, DUPLICATE if the pair already exists, or FAILED
+        if the record is malformed or rejected by the database
+        '''
+        query = self._statements.get("insert_many")
+
+        def work(conn: sqlite3.Connection, chunk: list[dict]) -> list[str]:
+            pairs = []
+            for record in chunk:
+                pair = tuple(record.values()) if isinstance(record, dict) else ()
+                pairs.append(pair if len(pair) == 2 else None)
+            existing = self._existing(conn, [pair for pair in pairs if pair is not None])
+
+            outcomes = []
+            pending = []
+            for pair in pairs:
+                if pair is None:
+                    outcomes.append(FAILED)
+                elif pair in existing:
+                    outcomes.append(DUPLICATE)
+                else:
+                    existing.add(pair)
+                    outcomes.append(None)
+                    pending.append(pair)
+
+            applied = iter(_executemany_or_each(conn, query, pending))
+            return [outcome or (INSERTED if next(applied) else FAILED) for outcome in outcomes]
+
+        outcomes = []
+        for chunk in _chunked(records, chunksize):
+            chunk = [self._textkeys(record) for record in chunk]
+            applied = self._pool.write(lambda conn: work(conn, chunk))
+            self._invalidate(self._pairtags(*(record for record, outcome in zip(chunk, applied) if outcome == INSERTED)))
+            outcomes.extend(applied)
+        return outcomes
+
+    @timed
+    def update_many(self, changes: Iterable[tuple[dict, dict]], chunksize: int = 500) -> list[str]:
+        '''
+        Updates many records, committing one transaction per chunk instead of one per record.
+        Whether a change conflicts depends on the changes before it, so the rows of a chunk are applied one statement at a time.
+
+        Parameter:
+        changes: Iterable[tuple[dict, dict]] -> (old_record, new_record) pairs, laid out the same way as the arguments of self.update
+        chunksize: int -> The number of records written per transaction
+
+        Return:
+        Returns a list with one outcome per change, in order: UPDATED, MISSING if the old record does not exist,
+        DUPLICATE if the new record already exists, or FAILED if a record is malformed
+        '''
+        query = self._statements.get("update_many")
+
+        def work(conn: sqlite3.Connection, chunk: list[tuple]) -> list[str]:
+            outcomes = []
+            for old_record, new_record in chunk:
+                old = tuple(old_record.values())
+                new = tuple(new_record.values())
+                if len(old) != 2 or len(new) != 2:
+                    outcomes.append(FAILED)
+                elif not self._existing(conn, [old]):
+                    outcomes.append(MISSING)
+                elif self._existing(conn, [new]):
+                    outcomes.append(DUPLICATE)
+                else:
+                    conn.execute(query, new + old)
+                    outcomes.append(UPDATED)
+            return outcomes
+
+        outcomes = []
+        for chunk in _chunked(changes, chunksize):
+            chunk = [(self._textkeys(old_record), self._textkeys(new_record)) for old_record, new_record in chunk]
+            applied = self._pool.write(lambda conn: work(conn, chunk))
+            self._invalidate(self._pairtags(*(record for change, outcome in zip(chunk, applied) if outcome == UPDATED
+                                              for record in change)))
+            outcomes.extend(applied)
+        return outcomes
+
+    @timed
+    def delete_many(self, records: Iterable[dict], chunksize: int = 500) -> list[str]:
+        '''
+        Deletes many records, committing one transaction per chunk instead of one per record.
+
+        Parameter:
+        records: Iterable[dict] -> The records to delete
+        chunksize: int -> The number of records deleted per transaction
+
+        Return:
+        Returns a list with one outcome per record, in order: DELETED, MISSING if the pair does not exist, or FAILED
+        if the record is malformed
+        '''
+        query = self._statements.get("delete")
+
+        def work(conn: sqlite3.Connection, chunk: list[dict]) -> list[str]:
+            pairs = [tuple(record.values()) for record in chunk]
+            existing = self._existing(conn, [pair for pair in pairs if len(pair) == 2])
+            outcomes = []
+            pending = []
+            for pair in pairs:
+                if len(pair) != 2:
+                    outcomes.append(FAILED)
+                elif pair in existing:
+                    existing.discard(pair)
+                    outcomes.append(DELETED)
+                    pending.append(pair)
+                else:
+                    outcomes.append(MISSING)
+            conn.executemany(query, pending)
+            return outcomes
+
+        outcomes = []
+        for chunk in _chunked(records, chunksize):
+            chunk = [self._textkeys(record) for record in chunk]
+            applied = self._pool.write(lambda conn: work(conn, chunk))
+            self._invalidate(self._pairtags(*(record for record, outcome in zip(chunk, applied) if outcome == DELETED)))
+            outcomes.extend(applied)
+        return outcomes
 #===========================================================================================================================================
 
 class StudentActivity(Junctiontable):
@@ -1086,38 +2936,28 @@ class StudentActivity(Junctiontable):
 
     Methods:
     (+) find(record) -> check if a certain record exists
+
+    (+) find_many(records) -> Returns which of the given records exist, in one query per chunk of records.
     
     (+) insert(record) -> Inserts a record into the junction table, after checking whether it is present.
 
     (+) update(old_record, new_record) -> Updates a record in the junction table, after checking whether it is present and if there are any conflicting records. 
 
     (+) delete(record) -> Delete a record in the junction table, after checking whether it is present.
+
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(records) -> Deletes many records in one transaction per chunk and reports the outcome of each.
     '''
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "StudentActivity"
         keys = ("student_id", "activity_id")
 
-        super().__init__(self._dbname, self._tblname, keys[0], keys[1])
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "student_id" TEXT,
-                "activity_id" TEXT,
-                Foreign Key("student_id") REFERENCES Student("id")
-                Foreign Key("activity_id") REFERENCES Activity("id")
-                );'''
-
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        super().__init__(self._dbname, self._tblname, keys[0], keys[1], pool, cache)
 
 #===========================================================================================================================================
 
@@ -1134,38 +2974,28 @@ class StudentCCA(Junctiontable):
 
     Methods:
     (+) find(record) -> check if a certain record exists
+
+    (+) find_many(records) -> Returns which of the given records exist, in one query per chunk of records.
     
     (+) insert(record) -> Inserts a record into the junction table, after checking whether it is present.
 
     (+) update(old_record, new_record) -> Updates a record in the junction table, after checking whether it is present and if there are any conflicting records. 
 
     (+) delete(record) -> Delete a record in the junction table, after checking whether it is present.
+
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(records) -> Deletes many records in one transaction per chunk and reports the outcome of each.
     '''
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "StudentCCA"
         keys = ("student_id", "cca_id")
 
-        super().__init__(self._dbname, self._tblname, keys[0], keys[1])
-        self._create_table()
-
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "student_id" TEXT,
-                "cca_id" TEXT,
-                Foreign Key("student_id") REFERENCES Student("id")
-                Foreign Key("cca_id") REFERENCES CCA("id")
-                );'''
-
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
+        super().__init__(self._dbname, self._tblname, keys[0], keys[1], pool, cache)
 #===========================================================================================================================================
 
 class StudentSubject(Junctiontable):
@@ -1180,36 +3010,296 @@ class StudentSubject(Junctiontable):
 
     Methods:
     (+) find(record) -> check if a certain record exists
+
+    (+) find_many(records) -> Returns which of the given records exist, in one query per chunk of records.
     
     (+) insert(record) -> Inserts a record into the junction table, after checking whether it is present.
 
     (+) update(old_record, new_record) -> Updates a record in the junction table, after checking whether it is present and if there are any conflicting records. 
 
     (+) delete(record) -> Delete a record in the junction table, after checking whether it is present.
+
+    (+) insert_many(records) -> Inserts many records in one transaction per chunk and reports the outcome of each.
+
+    (+) update_many(changes) -> Updates many records in one transaction per chunk and reports the outcome of each.
+
+    (+) delete_many(records) -> Deletes many records in one transaction per chunk and reports the outcome of each.
     '''
 
-    def __init__(self):
+    def __init__(self, pool: Optional[ConnectionPool] = None, cache: Optional[QueryCache] = None):
         self._dbname = "MyWebApp.db"
         self._tblname = "StudentSubject"
         keys = ("student_id", "subject_id")
 
-        super().__init__(self._dbname, self._tblname, keys[0], keys[1])
-        self._create_table()
+        super().__init__(self._dbname, self._tblname, keys[0], keys[1], pool, cache)
+#===========================================================================================================================================
 
-    def _create_table(self):
-        """
-        A helper function used to create the table in the database for the entity collection if it does not already exists
-        """
-        
-        query = f'''CREATE TABLE IF NOT EXISTS "{self._tblname}"(
-                "student_id" TEXT,
-                "subject_id" TEXT,
-                Foreign Key("student_id") REFERENCES Student("id")
-                Foreign Key("subject_id") REFERENCES Subject("id")
-                );'''
-
-        with sqlite3.connect(self._dbname) as conn:
-            cur = conn.cursor()
-            cur.execute(query)
-            #conn.close()
-#===========================================================================================================================================
\ No newline at end of file
+#===========================================================================================================================================
+
+class SearchIndex:
+    """
+    Full-text search over the names and descriptions of students, classes, CCAs and activities, backed by the FTS5 "Search"
+    table that the schema's triggers keep in sync with the entity tables.
+    Attributes:
+    (-) pool: ConnectionPool -> The connection pool used to reach the database.
+    Methods:
+    (+) search(query, offset, limit) -> Returns one page of the entities matching a query, best match first.
+    """
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        self._pool = pool
+
+    @staticmethod
+    def _match(query: str) -> Optional[str]:
+        '''
+        A helper function that turns what a user typed into an FTS5 query matching every word, each as a prefix, so that
+        quotes and operators in the input are searched for instead of raising a syntax error
+        '''
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> dict:
+        '''
+        Searches every entity type at once, ranking hits by bm25 with matches in the name weighted above the rest
+
+        Parameter:
+        query: str -> The words to search for. An entity matches if it contains every word, or a word starting with it.
+        offset: int -> The number of hits to skip
+        limit: int -> The maximum number of hits on the page
+
+        Return:
+        Returns a dictionary holding the page's "records" and the "next" and "prev" offsets, which are None at either end.
+        Each hit has the "kind" and "id" of its entity, and a "title" and "snippet" with matched terms wrapped in HIGHLIGHT.
+        '''
+        match = self._match(query)
+        if match is None:
+            return {"records": [], "prev": None, "next": None}
+        start, end = HIGHLIGHT
+        with self._pool.connection() as conn:
+            result = conn.execute('''SELECT "SearchDocument"."kind" as "kind",
+                           "SearchDocument"."key" as "id",
+                           highlight("Search", 0, ?, ?) as "title",
+                           snippet("Search", 1, ?, ?, '...', 16) as "snippet"
+                    FROM "Search"
+                    INNER JOIN "SearchDocument"
+                        ON "SearchDocument"."docid" = "Search"."rowid"
+                    WHERE "Search" MATCH ?
+                    ORDER BY bm25("Search", 4.0, 1.0)
+                    LIMIT ? OFFSET ?;''', (start, end, start, end, match, limit + 1, offset)).fetchall()
+        records = [dict(row) for row in result[:limit]]
+        return {
+            "records": records,
+            "prev": max(offset - limit, 0) if offset > 0 else None,
+            "next": offset + limit if len(result) > limit else None,
+        }
+
+#===========================================================================================================================================
+
+class NameIndex:
+    """
+    An in-memory index of the names in a collection, sorted case-insensitively, that answers typeahead lookups without
+    reading the table. It is rebuilt on the first lookup after a write to the collection, which it hears about from the QueryCache,
+    or, when it is given the TableVersions, after the table's version moves, which also covers writes from other processes.
+    Attributes:
+    (-) collection: Collection -> The collection whose records are indexed by name.
+    (-) versions: TableVersions -> The versions checked before every lookup, if any.
+    (-) version: int -> The version of the table the index was built from.
+    (-) entries: list -> (folded name, name, key) for every record, in order of folded name.
+    (-) text: str -> Every folded name joined by newlines, so substrings are found by one scan in C.
+    (-) offsets: list -> Where each entry's name starts in text.
+    (-) stale: bool -> Whether the collection has been written to since the index was built.
+    Methods:
+    (+) lookup(text, limit) -> Returns the records whose name starts with the text, followed by those whose name contains it.
+    """
+
+    def __init__(self, collection: Collection, cache: Optional[QueryCache] = None, versions: Optional["TableVersions"] = None) -> None:
+        self._collection = collection
+        self._versions = versions
+        self._version = None
+        self._entries = []
+        self._text = ""
+        self._offsets = []
+        self._stale = True
+        self._lock = threading.Lock()
+        if cache is not None:
+            cache.subscribe(self._invalidate)
+
+    def _invalidate(self, tags: set) -> None:
+        '''
+        A helper function subscribed to the QueryCache, which marks the index as stale after a write to its collection
+        '''
+        if any(tag[0] == self._collection._tblname for tag in tags):
+            self._stale = True
+
+    def _build(self) -> None:
+        '''
+        A helper function that reads every key and name in the collection and sorts them into the index
+        '''
+        self._stale = False
+        records = self._collection.findall([self._collection._key, "name"], compact = True) or []
+        self._entries = sorted(((name or "").casefold(), name or "", key) for key, name in records)
+        self._offsets = []
+        offset = 0
+        for folded, _, _ in self._entries:
+            self._offsets.append(offset)
+            offset += len(folded) + 1
+        self._text = "\n".join(folded for folded, _, _ in self._entries)
+
+    def lookup(self, text: str, limit: int = 10) -> list[dict]:
+        '''
+        Finds records by name, ignoring case
+
+        Parameter:
+        text: str -> What the user has typed so far
+        limit: int -> The maximum number of records to return
+
+        Return:
+        Returns a list of {key: ..., "name": ...} dictionaries, with names that start with the text first and names that
+        only contain it after, each in alphabetical order
+        '''
+        text = text.strip().casefold()
+        if not text or limit < 1:
+            return []
+        with self._lock:
+            if self._versions is not None:
+                #read before building, so a write that lands during the build moves the version past the one recorded
+                (version,) = self._versions.get((self._collection._tblname,))
+                if version != self._version:
+                    self._stale = True
+                    self._version = version
+            if self._stale:
+                self._build()
+            entries, names, offsets = self._entries, self._text, self._offsets
+
+        found = []
+        start = bisect.bisect_left(entries, (text,))
+        index = start
+        while index < len(entries) and len(found) < limit and entries[index][0].startswith(text):
+            found.append(index)
+            index += 1
+        prefixed = range(start, index)
+
+        position = names.find(text)
+        while position != -1 and len(found) < limit:
+            index = bisect.bisect_right(offsets, position) - 1
+            if index not in prefixed:
+                found.append(index)
+            #skip to the next name, so a name holding the text twice is only returned once
+            position = names.find(text, offsets[index + 1]) if index + 1 < len(offsets) else -1
+
+        key = self._collection._key
+        return [{key: entries[index][2], "name": entries[index][1]} for index in found]
+
+#===========================================================================================================================================
+
+class TableVersions:
+    """
+    The version of every table, which the triggers of schema version 6 bump in "TableVersion" on every row a write changes.
+    Pages that are only read from a few tables use the versions of those tables as their validator, so an unchanged page
+    can be answered with 304 Not Modified before it is queried or rendered.
+    The versions are only re-read after PRAGMA data_version reports that another connection has committed, which takes
+    no page reads, so checking a validator usually costs no query at all. Commits from other processes count too.
+    Attributes:
+    (-) pool: ConnectionPool -> The connection pool used to reach the database.
+    (-) conn: sqlite3.Connection -> The connection PRAGMA data_version is read on, opened on first use and never pooled,
+                                   since the counter is only comparable on the connection it came from.
+    (-) data_version: int -> The data version the versions were last read at.
+    (-) versions: dict -> The version of every table, as last read.
+    (-) subscribers: list -> The callbacks told which tables another connection changed whenever the versions are re-read.
+    Methods:
+    (+) get(tables) -> Returns the current versions of the given tables.
+
+    (+) refresh() -> Re-reads the versions if anything has committed since they were last read.
+
+    (+) subscribe(callback) -> Calls callback(tables) with the tables another connection changed, every time the versions are re-read.
+
+    (+) close() -> Closes the connection the data version is read on.
+    """
+
+    def __init__(self, pool: ConnectionPool) -> None:
+        self._pool = pool
+        self._conn = None
+        self._data_version = None
+        self._versions = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def get(self, tables: Iterable[str]) -> tuple[int, ...]:
+        '''
+        Returns the current versions of the given tables
+
+        Parameter:
+        tables: Iterable[str] -> The names of the tables
+
+        Return:
+        Returns one version per table, in the order given. A table that is not versioned is always at version 0.
+        '''
+        with self._lock:
+            changed = self._refresh()
+            versions = tuple(self._versions.get(table, 0) for table in tables)
+        self._notify(changed)
+        return versions
+
+    def refresh(self) -> None:
+        '''
+        Re-reads the versions if any connection, in this process or another, has committed since they were last read, and
+        tells the subscribers which tables were changed by something other than the pool's own writer. Calling it before
+        serving anything from a cache keeps the cache from serving rows another process has since changed.
+        '''
+        with self._lock:
+            changed = self._refresh()
+        self._notify(changed)
+
+    def subscribe(self, callback: Callable[[set], None]) -> None:
+        '''
+        Registers a callback that is called with the names of the tables whose version moved, every time the versions are
+        re-read, such as to drop what a cache read from those tables. The first read of the versions changes nothing, and
+        neither do the pool's own writes, since the collections already evict exactly what those change.
+
+        Parameter:
+        callback: Callable -> Called as callback(tables) with a set of table names
+        '''
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def _refresh(self) -> set[str]:
+        '''
+        A helper function that re-reads the versions if another connection has committed since they were last read. It must
+        be called holding the lock.
+
+        Return:
+        Returns the tables whose version was moved by another connection than the pool's writer
+        '''
+        if self._conn is None:
+            self._conn = self._pool._connect()
+        (data_version,) = self._conn.execute('PRAGMA data_version;').fetchone()
+        if data_version == self._data_version:
+            return set()
+        versions = dict(tuple(row) for row in self._conn.execute('SELECT "name", "version" FROM "TableVersion";'))
+        changed = set()
+        if self._data_version is not None:
+            changed = {table for table, version in versions.items() if self._versions.get(table) != version
+                       and not (table in self._versions and self._pool.wrote(table, self._versions[table], version))}
+        self._versions = versions
+        self._data_version = data_version
+        return changed
+
+    def _notify(self, changed: set[str]) -> None:
+        '''
+        A helper function that tells every subscriber which tables changed, outside the lock so they may read the versions
+        '''
+        if changed:
+            for callback in list(self._subscribers):
+                callback(changed)
+
+    def close(self) -> None:
+        '''
+        Closes the connection the data version is read on. It is reopened, and every version re-read, if get is called again.
+        '''
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._data_version = None
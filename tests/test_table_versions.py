@@ -0,0 +1,76 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import create_app
+
+class TestOwnWrites(unittest.TestCase):
+    """
+    Checks that the caches only drop whole tables for commits made outside the app's own connection pool.
+    """
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._dbname = os.path.join(self._dir.name, "test.db")
+        self._app = create_app(self._dbname)
+        self._client = self._app.test_client()
+        self._resources = self._app.extensions["mywebapp"]
+        self._client.get('/healthz')
+        self._resources["classCollection"].insert({"id": "1", "name": "C1", "level": "J1"})
+        self._resources["ccaCollection"].insert({"id": "1", "name": "Chess", "type": "Club"})
+        for key in range(1, 6):
+            self._resources["studentCollection"].insert({"id": str(key), "name": f'Student {key}', "student_age": 17,
+                                                         "year_enrolled": 2022, "graduating_year": 2023, "class_id": "1"})
+        for key in range(1, 6):
+            self.assertEqual(self._client.get(f'/view/student?id={key}').status_code, 200)
+
+    def tearDown(self) -> None:
+        self._resources["tableVersions"].close()
+        self._resources["pool"].close()
+        self._dir.cleanup()
+
+    def _cached(self) -> int:
+        return self._resources["pageCache"].stats()["size"]
+
+    def test_own_write_keeps_unrelated_pages(self) -> None:
+        self.assertEqual(self._cached(), 5)
+        self._resources["studentCCACollection"].insert({"student_id": "1", "cca_id": "1"})
+        self.assertEqual(self._cached(), 4)
+        self._client.get('/healthz')
+        self.assertEqual(self._cached(), 4)
+
+    def test_own_write_keeps_unrelated_queries(self) -> None:
+        queries = self._resources["cache"]
+        self._resources["studentCCACollection"].insert({"student_id": "1", "cca_id": "1"})
+        self._client.get('/healthz')
+        self.assertEqual(queries.stats()["size"], 4)
+        hits, misses = queries.stats()["hits"], queries.stats()["misses"]
+        for key in range(2, 6):
+            self._resources["studentCollection"].viewdetail(str(key))
+        self.assertEqual(queries.stats()["hits"], hits + 4)
+        self.assertEqual(queries.stats()["misses"], misses)
+
+    def test_foreign_write_drops_table(self) -> None:
+        conn = sqlite3.connect(self._dbname)
+        with conn:
+            conn.execute('''INSERT INTO "StudentCCA" VALUES ('1', '1');''')
+        conn.close()
+        self._client.get('/healthz')
+        self.assertEqual(self._cached(), 0)
+
+    def test_foreign_write_between_own_writes(self) -> None:
+        self._resources["studentCCACollection"].insert({"student_id": "1", "cca_id": "1"})
+        conn = sqlite3.connect(self._dbname)
+        with conn:
+            conn.execute('''DELETE FROM "StudentCCA" WHERE "student_id" = '1';''')
+        conn.close()
+        self._resources["studentCCACollection"].insert({"student_id": "2", "cca_id": "1"})
+        self._client.get('/healthz')
+        self.assertEqual(self._cached(), 0)
+
+if __name__ == '__main__':
+    unittest.main()